@@ -0,0 +1,102 @@
+"""Throughput of Layer A data signals (_build_data_signals) on large GSC query/page tables.
+
+Builds a synthetic GSC export (Chart, Queries, Pages, Countries, Devices) with N rows in
+the Queries and Pages sheets, registers the full tables in the table store exactly like
+ingestion does, and times _build_data_signals over them.
+
+    python benchmarks/bench_data_signals.py                 # 10k, 100k and 1M rows
+    python benchmarks/bench_data_signals.py --sizes 50000 --repeat 5
+
+Tables are stored under a temporary REPORT_CACHE_DIR, so the run does not touch the
+app's cache.
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _gsc_tables(n: int, seed: int = 0):
+    import numpy as np
+    import pandas as pd
+
+    rng = np.random.default_rng(seed)
+    imps = rng.integers(10, 50_000, n)
+    clicks = (imps * rng.beta(1.2, 40, n)).astype("int64")
+    frames = {
+        "Queries": pd.DataFrame({
+            "Top queries": [f"query {i}" for i in range(n)],
+            "Clicks": clicks,
+            "Impressions": imps,
+            "CTR": clicks / imps,
+            "Position": rng.gamma(2.0, 6.0, n).round(2),
+        }),
+        "Pages": pd.DataFrame({
+            "Top pages": [f"https://example.com/p/{i}" for i in range(n)],
+            "Clicks": clicks[::-1].copy(),
+            "Impressions": imps[::-1].copy(),
+            "CTR": (clicks / imps)[::-1].copy(),
+            "Position": rng.gamma(2.0, 6.0, n).round(2),
+        }),
+        "Chart": pd.DataFrame({
+            "Date": pd.date_range("2026-01-01", periods=31).strftime("%Y-%m-%d"),
+            "Clicks": rng.integers(100, 5_000, 31),
+            "Impressions": rng.integers(5_000, 90_000, 31),
+        }),
+        "Countries": pd.DataFrame({"Country": [f"C{i}" for i in range(200)], "Clicks": rng.integers(0, 900, 200), "Impressions": rng.integers(100, 9_000, 200)}),
+        "Devices": pd.DataFrame({"Device": ["Desktop", "Mobile", "Tablet"], "Clicks": [900, 1200, 40], "Impressions": [20_000, 35_000, 900]}),
+    }
+    return frames
+
+
+def _supporting_context(frames, label: str):
+    from report_engine.ingest import _df_preview
+    from report_engine.signals import _detect_gsc_table_kind
+    from report_engine.tables import put_table, table_ref
+
+    name = f"gsc-{label}.xlsx"
+    tables = []
+    for sheet, df in frames.items():
+        preview = _df_preview(df)
+        ref = put_table(table_ref(f"bench-{label}", "xlsx", sheet), df)
+        tables.append({
+            "filename": name, "type": "xlsx", "sheet": sheet, "table": preview,
+            "_gsc_kind": _detect_gsc_table_kind(sheet, preview.get("headers") or []), "table_ref": ref,
+        })
+    return {"tables": tables, "_by_file": {name: {"tables": tables}}}
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    ap.add_argument("--repeat", type=int, default=3, help="Timed runs per size (best is reported).")
+    args = ap.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix="rb-bench-") as tmp:
+        os.environ["REPORT_CACHE_DIR"] = tmp
+        from report_engine.signals import _build_data_signals
+        from report_engine.tables import _TABLE_STORE
+
+        print(f"{'rows':>10}  {'best ms':>9}  {'rows/s':>12}  top_q  opp_q  opp_p")
+        for n in args.sizes:
+            sc = _supporting_context(_gsc_tables(n), str(n))
+            times = []
+            for _ in range(max(1, args.repeat)):
+                # Each run resolves the tables from the store again (memory or mmap'd Arrow file).
+                t0 = time.perf_counter()
+                ds = _build_data_signals(sc)
+                times.append(time.perf_counter() - t0)
+            best = min(times)
+            rows = 2 * n  # Queries + Pages
+            print(f"{n:>10,}  {best * 1000:>9.1f}  {rows / best:>12,.0f}  {len(ds['top_queries']):>5}  "
+                  f"{len(ds['opportunity_queries']):>5}  {len(ds['opportunity_pages']):>5}")
+            _TABLE_STORE.clear_memory()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
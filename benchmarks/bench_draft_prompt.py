@@ -0,0 +1,185 @@
+"""Draft prompt size and latency: full insight payload vs the compact insight digest.
+
+For each scale it builds a synthetic client's insight model (stub model, as in
+bench_pipeline.py) and, for every verbosity level and both prompt formats
+(report_engine.digest: "full" = insight_payload as indented JSON, "compact" = the
+digest), measures:
+
+    chars, est_tokens      system + user prompt text (packing.estimate_tokens: tiktoken
+                           when installed, else the local estimate)
+    build_ms               building the prompt (median of --repeat)
+
+With --model-server (responses_server.py) or --live (OPENAI_API_KEY, the real API) it
+also sends each draft through gpt_generate_email --calls times and records latency and
+the input/output tokens reported by the API. --stream uses gpt_generate_email_stream
+instead and also records the time to the first completed section (first_field_ms):
+
+    python benchmarks/bench_draft_prompt.py                                  # prompt sizes only
+    python benchmarks/responses_server.py --port 8765 --latency-ms 800 --input-ms-per-1k 60 &
+    python benchmarks/bench_draft_prompt.py --model-server http://127.0.0.1:8765/v1 --calls 5
+    python benchmarks/bench_draft_prompt.py --model-server http://127.0.0.1:8765/v1 --stream   # with --stream-chunk-ms on the server
+    OPENAI_API_KEY=sk-... python benchmarks/bench_draft_prompt.py --live --model gpt-5.2 --scales s --calls 3
+
+The stand-in only models latency (fixed + per input token); --live gives real numbers.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from typing import Dict, Optional, List, Any
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import synthetic  # noqa: E402
+from bench_pipeline import SCALES, _corpus, _environment, _server_client, _uploads  # noqa: E402
+
+VERBOSITY_LEVELS = ("Quick scan", "Standard", "Deep dive")
+PROMPT_FORMATS = ("full", "compact")
+BENCH_VERSION = "1"
+
+
+def _payload(corpus: Dict[str, Any], insight: Dict[str, Any], verbosity: str) -> Dict[str, Any]:
+    return {
+        "client_name": "Synthetic Client",
+        "website": "example.com",
+        "month_label": "January 2026",
+        "dashthis_url": "https://dashthis.example/report",
+        "omni_notes": corpus["notes"],
+        "insight_payload": insight,
+        "verbosity_level": verbosity,
+        "special_instructions": "",
+    }
+
+
+def _prompt_sizes(payload: Dict[str, Any], prompt_format: str, repeat: int) -> Dict[str, Any]:
+    from report_engine.drafting import build_draft_prompt
+    from report_engine.packing import estimate_tokens
+
+    times = []
+    for _ in range(max(1, repeat)):
+        t0 = time.perf_counter()
+        system, prompt = build_draft_prompt(payload, prompt_format)
+        times.append((time.perf_counter() - t0) * 1000.0)
+    return {
+        "chars": len(system) + len(prompt),
+        "est_tokens": estimate_tokens(system) + estimate_tokens(prompt),
+        "build_ms": round(statistics.median(times), 2),
+    }
+
+
+def _model_runs(client: Any, model: str, payload: Dict[str, Any], shots: List[Any], prompt_format: str, calls: int,
+                stream: bool = False) -> Dict[str, Any]:
+    from report_engine.drafting import gpt_generate_email, gpt_generate_email_stream
+    from report_engine.usage import usage_meter
+
+    latencies, first_fields, input_tokens, output_tokens, failures = [], [], [], [], 0
+    for _ in range(max(1, calls)):
+        with usage_meter("bench_draft") as meter:
+            t0 = time.perf_counter()
+            first: List[float] = []
+            try:
+                if stream:
+                    data, _raw = gpt_generate_email_stream(
+                        client, model, payload, shots, prompt_format=prompt_format,
+                        on_field=lambda k, v: first or first.append((time.perf_counter() - t0) * 1000.0),
+                    )
+                else:
+                    data, _raw = gpt_generate_email(client, model, payload, shots, prompt_format=prompt_format)
+                failures += 1 if data.get("_parse_failed") else 0
+            except Exception:
+                failures += 1
+            latencies.append((time.perf_counter() - t0) * 1000.0)
+            first_fields.extend(first[:1])
+        s = meter.summary()
+        input_tokens.append(s["input_tokens"])
+        output_tokens.append(s["output_tokens"])
+    return {
+        "calls": len(latencies),
+        "failures": failures,
+        "latency_ms_median": round(statistics.median(latencies), 1),
+        "latency_ms_min": round(min(latencies), 1),
+        "first_field_ms_median": round(statistics.median(first_fields), 1) if first_fields else None,
+        "input_tokens_median": int(statistics.median(input_tokens)),
+        "output_tokens_median": int(statistics.median(output_tokens)),
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--scales", nargs="+", default=["s", "m", "l"], choices=list(SCALES))
+    ap.add_argument("--repeat", type=int, default=5, help="Prompt builds per measurement (median is reported).")
+    ap.add_argument("--model-server", default="", help="Base URL of responses_server.py; also measures draft call latency.")
+    ap.add_argument("--live", action="store_true", help="Measure draft calls against the real API (OPENAI_API_KEY).")
+    ap.add_argument("--model", default="", help="Model for --live/--model-server (default: report_engine.DEFAULT_MODEL).")
+    ap.add_argument("--calls", type=int, default=3, help="Draft calls per format and verbosity with a model.")
+    ap.add_argument("--stream", action="store_true", help="Stream the draft calls (gpt_generate_email_stream).")
+    ap.add_argument("--out", default="bench_draft_prompt.json", help="Where to write the JSON results.")
+    args = ap.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix="rb-bench-") as tmp:
+        os.environ["REPORT_CACHE_DIR"] = tmp
+        from report_engine import DEFAULT_MODEL
+        from report_engine.ingest import build_supporting_context
+        from report_engine.insight import build_insight_model
+
+        model = args.model or DEFAULT_MODEL
+        client = None
+        if args.model_server:
+            client = _server_client(args.model_server)
+        elif args.live:
+            from openai import OpenAI
+
+            client = OpenAI()
+
+        results: List[Dict[str, Any]] = []
+        for scale in args.scales:
+            corpus = _corpus(SCALES[scale], seed=1)
+            sc = build_supporting_context(_uploads(corpus))
+            insight = build_insight_model(
+                client=synthetic.StubModelClient(), model="stub-model", omni_notes=corpus["notes"],
+                supporting_context=sc, image_triplets=corpus["screenshots"],
+            )
+            rows = []
+            print(f"\n== scale {scale} {SCALES[scale]}")
+            for verbosity in VERBOSITY_LEVELS:
+                payload = _payload(corpus, insight, verbosity)
+                row: Dict[str, Any] = {"verbosity": verbosity}
+                for fmt in PROMPT_FORMATS:
+                    row[fmt] = _prompt_sizes(payload, fmt, args.repeat)
+                    if client is not None:
+                        row[fmt]["model"] = _model_runs(client, model, payload, corpus["screenshots"], fmt, args.calls, args.stream)
+                row["token_reduction"] = round(1.0 - row["compact"]["est_tokens"] / max(1, row["full"]["est_tokens"]), 3)
+                rows.append(row)
+                line = (f"  {verbosity:<11} est tokens {row['full']['est_tokens']:>7} -> {row['compact']['est_tokens']:>6}"
+                        f"  ({row['token_reduction']:.0%} fewer)   build {row['full']['build_ms']:.1f} -> {row['compact']['build_ms']:.1f} ms")
+                if client is not None:
+                    full, compact = row["full"]["model"], row["compact"]["model"]
+                    line += (f"   call {full['latency_ms_median']:.0f} -> {compact['latency_ms_median']:.0f} ms"
+                             f", input tokens {full['input_tokens_median']} -> {compact['input_tokens_median']}")
+                    if args.stream:
+                        line += f", first section {full['first_field_ms_median'] or 0:.0f} -> {compact['first_field_ms_median'] or 0:.0f} ms"
+                print(line)
+            results.append({"scale": scale, "params": dict(SCALES[scale]), "rows": rows})
+
+        report = {
+            "suite": "draft_prompt",
+            "version": BENCH_VERSION,
+            "generated_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "environment": _environment(),
+            "config": {"scales": args.scales, "repeat": args.repeat, "model_server": args.model_server or None,
+                       "live": args.live, "stream": args.stream, "model": model if client is not None else None, "calls": args.calls},
+            "results": results,
+        }
+    with open(args.out, "w", encoding="utf-8") as fh:
+        json.dump(report, fh, indent=2)
+    print(f"\nWrote {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,300 @@
+"""End-to-end pipeline benchmark on synthetic corpora at several scales, with a stub model.
+
+For each scale it generates a client's uploads (GSC workbook, GA4 CSV, DashThis PDF
+with and without embedded text, screenshots, Omni notes; see synthetic.py) and times
+every stage of the pipeline:
+
+    build_supporting_context        parse all uploads (xlsx, csv, both PDFs)
+    pdf_section_tables[text]        _extract_pdf_section_tables on the text PDF
+    pdf_section_tables[scanned]     ... on the image-only PDF (OCR path)
+    data_signals                    _build_data_signals
+    omni_work_context               _parse_work_context_from_omni
+    insight_model                   build_insight_model (screenshot summaries via the stub)
+    interpretive_links              _build_interpretive_links
+    draft                           generate_monthly_email_draft (stub)
+    render_email_html               template render with screenshots placed
+    build_eml                       .eml with inline images
+    html_to_pdf_bytes               Playwright PDF (recorded as an error when unavailable)
+
+Each repeat uses a fresh seed, so every run is a cold run: nothing is served from the
+parse, table or summary caches. Caches live in a temporary REPORT_CACHE_DIR. Import
+costs are paid up front by a warm-up run on the smallest scale, which is not recorded.
+
+    python benchmarks/bench_pipeline.py                       # scales s, m, l -> bench_pipeline.json
+    python benchmarks/bench_pipeline.py --scales s m --repeat 5 --model-latency-ms 800 --no-pdf --out /tmp/run.json
+    python benchmarks/bench_pipeline.py --model-server http://127.0.0.1:8765/v1   # real SDK against responses_server.py
+
+The JSON has per-scale stage timings (all runs, best, median) and, per stage, a scaling
+curve: (size, median ms) points over the scales plus the fitted growth exponent
+(log-log slope: ~1 linear, ~2 quadratic).
+"""
+
+import argparse
+import json
+import math
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from typing import Dict, Optional, List, Tuple, Any
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import synthetic  # noqa: E402
+
+
+# rows: GSC Queries/Pages rows and GA4 CSV rows; pages: PDF pages (each of the two PDFs);
+# screenshots: PNG uploads; tasks: Omni work items.
+SCALES: Dict[str, Dict[str, int]] = {
+    "xs": {"rows": 200, "pages": 1, "screenshots": 1, "tasks": 6},
+    "s": {"rows": 2_000, "pages": 3, "screenshots": 2, "tasks": 15},
+    "m": {"rows": 20_000, "pages": 6, "screenshots": 4, "tasks": 45},
+    "l": {"rows": 100_000, "pages": 12, "screenshots": 8, "tasks": 120},
+    "xl": {"rows": 500_000, "pages": 24, "screenshots": 16, "tasks": 300},
+}
+
+# Which scale parameter a stage's cost is expected to follow (x axis of its curve).
+STAGE_SIZE = {
+    "build_supporting_context": "rows",
+    "pdf_section_tables[text]": "pages",
+    "pdf_section_tables[scanned]": "pages",
+    "data_signals": "rows",
+    "omni_work_context": "tasks",
+    "insight_model": "rows",
+    "interpretive_links": "tasks",
+    "draft": "screenshots",
+    "render_email_html": "screenshots",
+    "build_eml": "screenshots",
+    "html_to_pdf_bytes": "screenshots",
+}
+
+BENCH_VERSION = "1"
+
+
+def _corpus(params: Dict[str, int], seed: int) -> Dict[str, Any]:
+    rows, pages = params["rows"], params["pages"]
+    files = [
+        ("gsc-performance.xlsx", synthetic.gsc_workbook(rows, seed)),
+        ("ga4-traffic.csv", synthetic.ga4_csv(rows, seed)),
+        ("dashthis.pdf", synthetic.dashthis_pdf(pages, text=True, seed=seed)),
+        ("dashthis-scanned.pdf", synthetic.dashthis_pdf(pages, text=False, seed=seed)),
+    ]
+    shots = [(f"screenshot-{i + 1}.png", synthetic.screenshot_png(i, seed), "image/png") for i in range(params["screenshots"])]
+    return {"files": files, "screenshots": shots, "notes": synthetic.omni_notes(params["tasks"], seed)}
+
+
+def _uploads(corpus: Dict[str, Any]) -> List[synthetic.NamedUpload]:
+    return [synthetic.NamedUpload(name, data) for name, data in corpus["files"]] + [
+        synthetic.NamedUpload(name, data) for name, data, _ in corpus["screenshots"]
+    ]
+
+
+def _run_once(corpus: Dict[str, Any], client: Any, model: str, pdf: bool = True) -> Dict[str, Dict[str, Any]]:
+    """One cold pass over every stage. Returns {stage: {"ms": float} or {"error": str}}."""
+    from report_engine.drafting import generate_monthly_email_draft
+    from report_engine.ingest import build_supporting_context
+    from report_engine.insight import _build_interpretive_links, _parse_work_context_from_omni, build_insight_model
+    from report_engine.pdf import _extract_pdf_section_tables
+    from report_engine.pdf_export import html_to_pdf_bytes
+    from report_engine.render import _derive_top_opportunities_from_insight, build_eml, render_email_html, seed_image_placement
+    from report_engine.signals import _build_data_signals
+
+    out: Dict[str, Dict[str, Any]] = {}
+    state: Dict[str, Any] = {}
+
+    def stage(name: str, fn: Any) -> None:
+        t0 = time.perf_counter()
+        try:
+            state[name] = fn()
+            out[name] = {"ms": round((time.perf_counter() - t0) * 1000.0, 2)}
+        except Exception as e:
+            out[name] = {"error": f"{type(e).__name__}: {str(e).splitlines()[0] if str(e) else ''}"}
+
+    pdfs = dict(corpus["files"])
+    shots = corpus["screenshots"]
+    stage("build_supporting_context", lambda: build_supporting_context(_uploads(corpus)))
+    sc = state.get("build_supporting_context") or {"tables": [], "documents": []}
+    stage("pdf_section_tables[text]", lambda: _extract_pdf_section_tables(pdfs["dashthis.pdf"], enable_ocr=True))
+    stage("pdf_section_tables[scanned]", lambda: _extract_pdf_section_tables(pdfs["dashthis-scanned.pdf"], enable_ocr=True))
+    stage("data_signals", lambda: _build_data_signals(sc))
+    stage("omni_work_context", lambda: _parse_work_context_from_omni(corpus["notes"]))
+    stage("insight_model", lambda: build_insight_model(
+        client=client, model=model, omni_notes=corpus["notes"], supporting_context=sc, image_triplets=shots,
+    ))
+    insight = state.get("insight_model") or {}
+    stage("interpretive_links", lambda: _build_interpretive_links(
+        state.get("omni_work_context") or {}, state.get("data_signals") or {}, insight.get("seo_observations") or {},
+    ))
+    payload = {
+        "client_name": "Synthetic Client",
+        "website": "example.com",
+        "month_label": "January 2026",
+        "dashthis_url": "",
+        "omni_notes": corpus["notes"],
+        "insight_payload": insight,
+        "verbosity_level": "Standard",
+    }
+    stage("draft", lambda: generate_monthly_email_draft(client=client, model=model, payload=payload, image_triplets=shots))
+    email_json = (state.get("draft") or ({}, ""))[0] or {}
+
+    def _render() -> Dict[str, Any]:
+        assignments: Dict[str, str] = {}
+        captions: Dict[str, str] = {}
+        seed_image_placement(email_json, assignments, captions)
+        sections = {k: email_json.get(k) for k in ("monthly_overview", "dashthis_line", "key_highlights", "main_kpis",
+                                                   "wins_progress", "blockers", "completed_tasks", "outstanding_tasks")}
+        sections["top_opportunities"] = _derive_top_opportunities_from_insight(insight, max_items=5)
+        return render_email_html(
+            sections,
+            client_name=payload["client_name"],
+            month_label=payload["month_label"],
+            website=payload["website"],
+            images={name: b for name, b, _ in shots},
+            image_assignments=assignments,
+            image_captions=captions,
+        )
+
+    stage("render_email_html", _render)
+    rendered = state.get("render_email_html") or {"html": "", "preview_html": "", "image_parts": []}
+    stage("build_eml", lambda: build_eml(email_json.get("subject", ""), rendered["html"], rendered["image_parts"]))
+    if pdf:
+        stage("html_to_pdf_bytes", lambda: html_to_pdf_bytes(rendered["preview_html"]))
+    return out
+
+
+def _growth_exponent(points: List[Tuple[float, float]]) -> Optional[float]:
+    """Least-squares slope of log(ms) over log(size); None with fewer than two distinct sizes."""
+    pts = [(math.log(x), math.log(y)) for x, y in points if x > 0 and y > 0]
+    if len({x for x, _ in pts}) < 2:
+        return None
+    mx = statistics.fmean(x for x, _ in pts)
+    my = statistics.fmean(y for _, y in pts)
+    sxx = sum((x - mx) ** 2 for x, _ in pts)
+    return round(sum((x - mx) * (y - my) for x, y in pts) / sxx, 3)
+
+
+def _environment() -> Dict[str, Any]:
+    from report_engine.lazy import optional_module
+    from report_engine.pdf_export import PLAYWRIGHT_AVAILABLE
+
+    versions = {}
+    for name in ("pandas", "numpy", "pyarrow", "openpyxl", "python_calamine", "fitz", "pdfplumber", "pytesseract", "PIL"):
+        mod = optional_module(name)
+        versions[name] = getattr(mod, "__version__", getattr(mod, "VersionBind", "installed")) if mod is not None else None
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "packages": versions,
+        "playwright_available": bool(PLAYWRIGHT_AVAILABLE),
+    }
+
+
+def _server_client(base_url: str) -> Any:
+    from openai import OpenAI
+
+    client = OpenAI(base_url=base_url.rstrip("/"), api_key=os.getenv("OPENAI_API_KEY") or "local-stand-in")
+    client.stats_url = base_url.rstrip("/") + "/stats"
+    return client
+
+
+def _model_calls(client: Any) -> Dict[str, int]:
+    """Model calls so far per kind: the stub's counters, or the stand-in server's /stats."""
+    stats_url = getattr(client, "stats_url", None)
+    if not stats_url:
+        return dict(getattr(client, "calls", {}) or {})
+    from urllib.request import urlopen
+
+    try:
+        with urlopen(stats_url, timeout=5) as resp:
+            return dict(json.loads(resp.read()).get("by_kind") or {})
+    except Exception:
+        return {}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--scales", nargs="+", default=["s", "m", "l"], choices=list(SCALES))
+    ap.add_argument("--repeat", type=int, default=3, help="Cold runs per scale (fresh corpus each run).")
+    ap.add_argument("--model-latency-ms", type=float, default=0.0, help="Simulated latency of each stub model call.")
+    ap.add_argument("--model-server", default="", help="Base URL of a Responses API stand-in (responses_server.py); "
+                    "model calls then go through the openai SDK over HTTP instead of the in-process stub.")
+    ap.add_argument("--no-pdf", action="store_true", help="Skip the html_to_pdf_bytes stage.")
+    ap.add_argument("--out", default="bench_pipeline.json", help="Where to write the JSON results.")
+    args = ap.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix="rb-bench-") as tmp:
+        os.environ["REPORT_CACHE_DIR"] = tmp
+        model = "stub-model"
+        if args.model_server:
+            client = _server_client(args.model_server)
+        else:
+            client = synthetic.StubModelClient(latency_s=args.model_latency_ms / 1000.0)
+
+        # Warm-up: pay import and first-use costs outside the measurements.
+        _run_once(_corpus(SCALES["xs"], seed=10_000), client, model, pdf=not args.no_pdf)
+
+        results: List[Dict[str, Any]] = []
+        for scale in args.scales:
+            params = SCALES[scale]
+            runs: List[Dict[str, Dict[str, Any]]] = []
+            calls_before = _model_calls(client)
+            corpus_ms: List[float] = []
+            for r in range(max(1, args.repeat)):
+                t0 = time.perf_counter()
+                corpus = _corpus(params, seed=r + 1)
+                corpus_ms.append(round((time.perf_counter() - t0) * 1000.0, 2))
+                runs.append(_run_once(corpus, client, model, pdf=not args.no_pdf))
+            stages: Dict[str, Dict[str, Any]] = {}
+            for name in STAGE_SIZE:
+                if not any(name in run for run in runs):
+                    continue
+                ms = [run[name]["ms"] for run in runs if "ms" in run.get(name, {})]
+                errors = sorted({run[name]["error"] for run in runs if "error" in run.get(name, {})})
+                entry: Dict[str, Any] = {"size": params[STAGE_SIZE[name]], "runs_ms": ms}
+                if ms:
+                    entry["best_ms"] = min(ms)
+                    entry["median_ms"] = round(statistics.median(ms), 2)
+                if errors:
+                    entry["errors"] = errors
+                stages[name] = entry
+            upload_bytes = sum(len(b) for _, b in corpus["files"]) + sum(len(b) for _, b, _ in corpus["screenshots"])
+            results.append({
+                "scale": scale,
+                "params": dict(params),
+                "upload_bytes": upload_bytes,
+                "corpus_build_ms": corpus_ms,
+                "model_calls": {k: v - calls_before.get(k, 0) for k, v in _model_calls(client).items() if v - calls_before.get(k, 0)},
+                "stages": stages,
+            })
+            print(f"\n== scale {scale} {params} ({upload_bytes / 1e6:.1f} MB of uploads)")
+            for name, entry in stages.items():
+                shown = f"{entry['median_ms']:>10.1f} ms" if "median_ms" in entry else f"{'error':>13}"
+                print(f"  {name:<30} {shown}" + (f"   {entry['errors'][0]}" if entry.get("errors") and "median_ms" not in entry else ""))
+
+        curves: Dict[str, Dict[str, Any]] = {}
+        for name, size_key in STAGE_SIZE.items():
+            points = [(res["stages"][name]["size"], res["stages"][name]["median_ms"]) for res in results if "median_ms" in res["stages"].get(name, {})]
+            curves[name] = {"x": size_key, "points": points, "growth_exponent": _growth_exponent(points)}
+
+        report = {
+            "suite": "pipeline",
+            "version": BENCH_VERSION,
+            "generated_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "environment": _environment(),
+            "config": {"scales": args.scales, "repeat": args.repeat, "model_latency_ms": args.model_latency_ms,
+                       "model_server": args.model_server or None, "pdf": not args.no_pdf},
+            "results": results,
+            "curves": curves,
+        }
+    with open(args.out, "w", encoding="utf-8") as fh:
+        json.dump(report, fh, indent=2)
+    print(f"\nWrote {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,387 @@
+"""Local stand-in for the OpenAI Responses API (POST /v1/responses), for offline load testing.
+
+Point the real SDK at it and every model call in the app, the batch runner or a
+benchmark goes through HTTP exactly as in production (SDK parsing, timeouts,
+_responses_create retries, the shared model-call gate), without a key or cost:
+
+    python benchmarks/responses_server.py --port 8765 --latency-ms 1500 --jitter-ms 800 --rate-429 0.05
+    OPENAI_BASE_URL=http://127.0.0.1:8765/v1 OPENAI_API_KEY=local streamlit run monthly_report_builder_app.py
+    OPENAI_BASE_URL=http://127.0.0.1:8765/v1 OPENAI_API_KEY=local python -m report_engine.batch manifest.json --out runs/test
+
+Responses carry schema-valid canned JSON for screenshot summaries, evidence
+extraction and email drafts (synthetic.canned_output), plus a usage block. Knobs:
+
+    --latency-ms / --jitter-ms      delay per call: latency + uniform(0, jitter)
+    --draft-latency-ms              separate base latency for draft calls (they are the slow ones)
+    --input-ms-per-1k               extra latency per 1k input tokens (prompt processing; makes
+                                    latency follow prompt size)
+    --rate-429 / --rate-5xx         share of calls failed with 429 (with Retry-After) or 500/502/503
+    --tokens-per-char               input/output token estimate from text length (default 0.25)
+    --image-tokens                  input tokens billed per input_image
+    --output-tokens                 fixed output tokens per call (0 = estimate from the text)
+    --cached-fraction               share of input tokens reported as cached
+
+Requests with "stream": true get a server-sent event stream (response.created, one
+response.output_text.delta per --stream-chunk-chars, response.completed). The base
+latency is then the time to the first delta; --stream-chunk-ms paces the deltas, and
+--rate-malformed injects a stray fragment into that share of streams (status
+"200 malformed" in /stats) to exercise early detection and retry.
+
+GET /stats returns counters (requests per kind and status, peak concurrency, token
+totals, latency percentiles); GET /stats?reset=1 returns them and starts over.
+"""
+
+import argparse
+import json
+import math
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, List, Tuple, Any
+from urllib.parse import parse_qs, urlparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import synthetic  # noqa: E402
+
+
+class StandInConfig:
+    """Behaviour of the stand-in (see the module docstring for each knob)."""
+
+    def __init__(
+        self,
+        latency_ms: float = 0.0,
+        jitter_ms: float = 0.0,
+        draft_latency_ms: Optional[float] = None,
+        input_ms_per_1k: float = 0.0,
+        rate_429: float = 0.0,
+        rate_5xx: float = 0.0,
+        retry_after_s: float = 1.0,
+        tokens_per_char: float = 0.25,
+        image_tokens: int = 765,
+        output_tokens: int = 0,
+        cached_fraction: float = 0.0,
+        stream_chunk_chars: int = 24,
+        stream_chunk_ms: float = 0.0,
+        rate_malformed: float = 0.0,
+        seed: Optional[int] = None,
+    ):
+        self.latency_ms = float(latency_ms)
+        self.jitter_ms = float(jitter_ms)
+        self.draft_latency_ms = None if draft_latency_ms is None else float(draft_latency_ms)
+        self.input_ms_per_1k = float(input_ms_per_1k)
+        self.rate_429 = float(rate_429)
+        self.rate_5xx = float(rate_5xx)
+        self.retry_after_s = float(retry_after_s)
+        self.tokens_per_char = float(tokens_per_char)
+        self.image_tokens = int(image_tokens)
+        self.output_tokens = int(output_tokens)
+        self.cached_fraction = min(1.0, max(0.0, float(cached_fraction)))
+        self.stream_chunk_chars = max(1, int(stream_chunk_chars))
+        self.stream_chunk_ms = float(stream_chunk_ms)
+        self.rate_malformed = float(rate_malformed)
+        self.seed = seed
+
+    def as_dict(self) -> Dict[str, Any]:
+        return dict(self.__dict__)
+
+
+class _Stats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        self.started_at = time.time()
+        self.requests = 0
+        self.by_kind: Dict[str, int] = {}
+        self.by_status: Dict[str, int] = {}
+        self.inflight = 0
+        self.max_inflight = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.latencies_ms: List[float] = []
+
+    def enter(self) -> None:
+        with self._lock:
+            self.requests += 1
+            self.inflight += 1
+            self.max_inflight = max(self.max_inflight, self.inflight)
+
+    def leave(self, kind: str, status: Any, ms: float, usage: Optional[Dict[str, int]] = None) -> None:
+        with self._lock:
+            self.inflight -= 1
+            self.by_kind[kind] = self.by_kind.get(kind, 0) + 1
+            self.by_status[str(status)] = self.by_status.get(str(status), 0) + 1
+            self.latencies_ms.append(ms)
+            if usage:
+                self.input_tokens += usage["input_tokens"]
+                self.output_tokens += usage["output_tokens"]
+
+    def snapshot(self, reset: bool = False) -> Dict[str, Any]:
+        with self._lock:
+            lat = sorted(self.latencies_ms)
+
+            def pct(p: float) -> Optional[float]:
+                return round(lat[min(len(lat) - 1, int(p * len(lat)))], 1) if lat else None
+
+            snap = {
+                "elapsed_s": round(time.time() - self.started_at, 3),
+                "requests": self.requests,
+                "by_kind": dict(self.by_kind),
+                "by_status": dict(self.by_status),
+                "inflight": self.inflight,
+                "max_inflight": self.max_inflight,
+                "usage": {"input_tokens": self.input_tokens, "output_tokens": self.output_tokens},
+                "latency_ms": {"p50": pct(0.5), "p90": pct(0.9), "p99": pct(0.99), "max": lat[-1] if lat else None},
+            }
+            if reset:
+                inflight = self.inflight
+                self.reset()
+                self.inflight = inflight
+            return snap
+
+
+def _usage(request: Dict[str, Any], text: str, config: StandInConfig) -> Dict[str, Any]:
+    chars = 0
+    images = 0
+    for msg in request.get("input") or []:
+        content = msg.get("content") if isinstance(msg, dict) else None
+        if isinstance(content, str):
+            chars += len(content)
+        elif isinstance(content, list):
+            for part in content:
+                if not isinstance(part, dict):
+                    continue
+                if part.get("type") == "input_image":
+                    images += 1
+                else:
+                    chars += len(str(part.get("text") or ""))
+    input_tokens = int(math.ceil(chars * config.tokens_per_char)) + images * config.image_tokens
+    output_tokens = config.output_tokens or int(math.ceil(len(text) * config.tokens_per_char))
+    return {
+        "input_tokens": input_tokens,
+        "input_tokens_details": {"cached_tokens": int(input_tokens * config.cached_fraction)},
+        "output_tokens": output_tokens,
+        "output_tokens_details": {"reasoning_tokens": 0},
+        "total_tokens": input_tokens + output_tokens,
+    }
+
+
+def _response_body(request: Dict[str, Any], text: str, usage: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "id": f"resp_{uuid.uuid4().hex}",
+        "object": "response",
+        "created_at": int(time.time()),
+        "status": "completed",
+        "model": request.get("model") or "",
+        "output": [{
+            "type": "message",
+            "id": f"msg_{uuid.uuid4().hex}",
+            "status": "completed",
+            "role": "assistant",
+            "content": [{"type": "output_text", "text": text, "annotations": []}],
+        }],
+        "parallel_tool_calls": True,
+        "tool_choice": "auto",
+        "tools": [],
+        "temperature": request.get("temperature"),
+        "top_p": None,
+        "error": None,
+        "incomplete_details": None,
+        "instructions": None,
+        "metadata": {},
+        "usage": usage,
+    }
+
+
+def _make_handler(config: StandInConfig, stats: _Stats, rnd: random.Random, rnd_lock: threading.Lock):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        quiet = True
+
+        def log_message(self, fmt: str, *args: Any) -> None:
+            if not self.quiet:
+                super().log_message(fmt, *args)
+
+        def _send_json(self, status: int, body: Dict[str, Any], headers: Optional[Dict[str, str]] = None) -> None:
+            data = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            for k, v in (headers or {}).items():
+                self.send_header(k, v)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _send_stream(self, request: Dict[str, Any], text: str, usage: Dict[str, Any]) -> Any:
+            """Send text as a Responses event stream. Returns 200, or "200 aborted" if the client hung up."""
+            body = _response_body(request, text, usage)
+            item_id = body["output"][0]["id"]
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Cache-Control", "no-cache")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            self.close_connection = True
+            seq = 0
+
+            def event(payload: Dict[str, Any]) -> None:
+                nonlocal seq
+                payload["sequence_number"] = seq
+                seq += 1
+                self.wfile.write(f"event: {payload['type']}\ndata: {json.dumps(payload)}\n\n".encode("utf-8"))
+                self.wfile.flush()
+
+            try:
+                event({"type": "response.created", "response": {**body, "status": "in_progress", "output": [], "usage": None}})
+                for chunk in synthetic.text_chunks(text, config.stream_chunk_chars):
+                    event({"type": "response.output_text.delta", "item_id": item_id, "output_index": 0,
+                           "content_index": 0, "delta": chunk, "logprobs": []})
+                    if config.stream_chunk_ms > 0:
+                        time.sleep(config.stream_chunk_ms / 1000.0)
+                event({"type": "response.completed", "response": body})
+            except (BrokenPipeError, ConnectionResetError):
+                return "200 aborted"
+            return 200
+
+        def do_GET(self) -> None:
+            url = urlparse(self.path)
+            if url.path.rstrip("/") in ("/stats", "/v1/stats"):
+                reset = parse_qs(url.query).get("reset", ["0"])[0] not in ("0", "", "false")
+                self._send_json(200, {"config": config.as_dict(), **stats.snapshot(reset=reset)})
+            elif url.path.rstrip("/") in ("/healthz", "/v1/models"):
+                self._send_json(200, {"ok": True, "object": "list", "data": []})
+            else:
+                self._send_json(404, {"error": {"message": f"Unknown path {url.path}", "type": "invalid_request_error"}})
+
+        def do_POST(self) -> None:
+            url = urlparse(self.path)
+            length = int(self.headers.get("Content-Length") or 0)
+            raw = self.rfile.read(length) if length else b""
+            if url.path.rstrip("/") not in ("/v1/responses", "/responses"):
+                self._send_json(404, {"error": {"message": f"Unknown path {url.path}", "type": "invalid_request_error"}})
+                return
+            t0 = time.perf_counter()
+            stats.enter()
+            kind, status, usage = "invalid", 400, None
+            try:
+                try:
+                    request = json.loads(raw or b"{}")
+                except ValueError:
+                    self._send_json(400, {"error": {"message": "Request body is not JSON", "type": "invalid_request_error"}})
+                    return
+                kind, text = synthetic.canned_output(request)
+                with rnd_lock:
+                    roll = rnd.random()
+                    jitter = rnd.uniform(0, config.jitter_ms) if config.jitter_ms > 0 else 0.0
+                    err_5xx = rnd.choice((500, 502, 503))
+                base = config.draft_latency_ms if (kind == "draft" and config.draft_latency_ms is not None) else config.latency_ms
+                billed = _usage(request, text, config)
+                delay_s = max(0.0, base + jitter + billed["input_tokens"] / 1000.0 * config.input_ms_per_1k) / 1000.0
+                if roll < config.rate_429:
+                    time.sleep(delay_s * 0.1)
+                    status = 429
+                    self._send_json(429, {"error": {"message": "Rate limit reached (injected by stand-in)", "type": "rate_limit_error",
+                                                    "code": "rate_limit_exceeded"}},
+                                    headers={"Retry-After": f"{config.retry_after_s:g}"})
+                    return
+                if roll < config.rate_429 + config.rate_5xx:
+                    time.sleep(delay_s)
+                    status = err_5xx
+                    self._send_json(status, {"error": {"message": f"Upstream error {status} (injected by stand-in)", "type": "server_error"}})
+                    return
+                time.sleep(delay_s)
+                usage = billed
+                status = 200
+                if request.get("stream"):
+                    malformed = roll < config.rate_429 + config.rate_5xx + config.rate_malformed
+                    status = self._send_stream(request, synthetic.corrupt_json_text(text) if malformed else text, usage)
+                    if malformed and status == 200:
+                        status = "200 malformed"
+                    return
+                self._send_json(200, _response_body(request, text, usage))
+            finally:
+                stats.leave(kind, status, (time.perf_counter() - t0) * 1000.0, usage)
+
+    return Handler
+
+
+def make_server(host: str = "127.0.0.1", port: int = 0, config: Optional[StandInConfig] = None,
+                verbose: bool = False) -> ThreadingHTTPServer:
+    """A ThreadingHTTPServer serving the stand-in (port 0 picks a free port); .stats and .config are attached."""
+    config = config or StandInConfig()
+    stats = _Stats()
+    handler = _make_handler(config, stats, random.Random(config.seed), threading.Lock())
+    handler.quiet = not verbose
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    server.config = config
+    server.stats = stats
+    return server
+
+
+def serve_in_thread(config: Optional[StandInConfig] = None, host: str = "127.0.0.1", port: int = 0) -> Tuple[ThreadingHTTPServer, str]:
+    """Start the stand-in on a daemon thread. Returns (server, base_url) for OpenAI(base_url=...)."""
+    server = make_server(host, port, config)
+    threading.Thread(target=server.serve_forever, name="responses-stand-in", daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}/v1"
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--latency-ms", type=float, default=0.0)
+    ap.add_argument("--jitter-ms", type=float, default=0.0)
+    ap.add_argument("--draft-latency-ms", type=float, default=None)
+    ap.add_argument("--input-ms-per-1k", type=float, default=0.0)
+    ap.add_argument("--rate-429", type=float, default=0.0)
+    ap.add_argument("--rate-5xx", type=float, default=0.0)
+    ap.add_argument("--retry-after-s", type=float, default=1.0)
+    ap.add_argument("--tokens-per-char", type=float, default=0.25)
+    ap.add_argument("--image-tokens", type=int, default=765)
+    ap.add_argument("--output-tokens", type=int, default=0)
+    ap.add_argument("--cached-fraction", type=float, default=0.0)
+    ap.add_argument("--stream-chunk-chars", type=int, default=24)
+    ap.add_argument("--stream-chunk-ms", type=float, default=0.0)
+    ap.add_argument("--rate-malformed", type=float, default=0.0)
+    ap.add_argument("--seed", type=int, default=None, help="Seed for jitter and error injection (reproducible runs).")
+    ap.add_argument("--verbose", action="store_true", help="Log every request.")
+    args = ap.parse_args(argv)
+
+    config = StandInConfig(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        draft_latency_ms=args.draft_latency_ms,
+        input_ms_per_1k=args.input_ms_per_1k,
+        rate_429=args.rate_429,
+        rate_5xx=args.rate_5xx,
+        retry_after_s=args.retry_after_s,
+        tokens_per_char=args.tokens_per_char,
+        image_tokens=args.image_tokens,
+        output_tokens=args.output_tokens,
+        cached_fraction=args.cached_fraction,
+        stream_chunk_chars=args.stream_chunk_chars,
+        stream_chunk_ms=args.stream_chunk_ms,
+        rate_malformed=args.rate_malformed,
+        seed=args.seed,
+    )
+    server = make_server(args.host, args.port, config, verbose=args.verbose)
+    print(f"Responses API stand-in on http://{args.host}:{server.server_address[1]}/v1  (stats: /stats)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
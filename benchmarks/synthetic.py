@@ -0,0 +1,305 @@
+"""Synthetic inputs and a stub model client for the benchmarks.
+
+Everything is generated from a seed, so a given (scale, seed) always produces the same
+bytes, and different seeds produce different content hashes (i.e. cold parse and
+summary caches).
+
+    gsc_workbook(rows)       GSC performance export (Chart/Queries/Pages/Countries/Devices/Filters)
+    ga4_csv(rows)            GA4 exploration CSV with '#' metadata blocks and a second section
+    dashthis_pdf(pages)      DashThis-style dashboard PDF; text=False rasterizes every page
+                             (no embedded text, so section tables need OCR)
+    screenshot_png(i)        GSC-like chart screenshot
+    omni_notes(tasks)        Omni work summary in the numbered-heading format
+    canned_output(request)   schema-valid canned JSON for a Responses API request
+    text_chunks(text)        stream deltas for a response text (corrupt_json_text: a malformed one)
+    StubModelClient          in-process stand-in for openai.OpenAI returning canned_output()
+"""
+
+import io
+import json
+import threading
+import time
+from typing import Dict, List, Tuple, Any
+
+
+class NamedUpload(io.BytesIO):
+    """In-memory upload with a .name, like Streamlit's UploadedFile."""
+
+    def __init__(self, name: str, data: bytes):
+        super().__init__(data)
+        self.name = name
+
+
+def gsc_workbook(rows: int, seed: int = 0) -> bytes:
+    import numpy as np
+    import pandas as pd
+
+    rng = np.random.default_rng(seed)
+    imps = rng.integers(10, 50_000, rows)
+    clicks = (imps * rng.beta(1.2, 40, rows)).astype("int64")
+    sheets = {
+        "Chart": pd.DataFrame({
+            "Date": pd.date_range("2026-01-01", periods=31).strftime("%Y-%m-%d"),
+            "Clicks": rng.integers(100, 5_000, 31),
+            "Impressions": rng.integers(5_000, 90_000, 31),
+            "CTR": rng.random(31).round(4),
+            "Position": (rng.random(31) * 20).round(1),
+        }),
+        "Queries": pd.DataFrame({
+            "Top queries": [f"query {seed}-{i}" for i in range(rows)],
+            "Clicks": clicks,
+            "Impressions": imps,
+            "CTR": (clicks / imps).round(4),
+            "Position": rng.gamma(2.0, 6.0, rows).round(2),
+        }),
+        "Pages": pd.DataFrame({
+            "Top pages": [f"https://example.com/p/{seed}/{i}" for i in range(rows)],
+            "Clicks": clicks[::-1].copy(),
+            "Impressions": imps[::-1].copy(),
+            "CTR": (clicks / imps)[::-1].round(4),
+            "Position": rng.gamma(2.0, 6.0, rows).round(2),
+        }),
+        "Countries": pd.DataFrame({"Country": [f"Country {i}" for i in range(200)], "Clicks": rng.integers(0, 900, 200), "Impressions": rng.integers(100, 9_000, 200)}),
+        "Devices": pd.DataFrame({"Device": ["Desktop", "Mobile", "Tablet"], "Clicks": [900, 1200, 40], "Impressions": [20_000, 35_000, 900]}),
+        "Filters": pd.DataFrame({"Filter": ["Search type", "Date"], "Value": ["Web", "Last 28 days"]}),
+    }
+    buf = io.BytesIO()
+    with pd.ExcelWriter(buf) as writer:
+        for name, df in sheets.items():
+            df.to_excel(writer, sheet_name=name, index=False)
+    return buf.getvalue()
+
+
+def ga4_csv(rows: int, seed: int = 0) -> bytes:
+    import numpy as np
+    import pandas as pd
+
+    rng = np.random.default_rng(seed)
+    channels = ["Organic Search", "Direct", "Referral", "Paid Search", "Email", "Organic Social"]
+    main = pd.DataFrame({
+        "Session source / medium": [f"{channels[i % len(channels)].lower().replace(' ', '')}-{seed}-{i} / organic" for i in range(rows)],
+        "Sessions": rng.integers(1, 5_000, rows),
+        "Engaged sessions": rng.integers(0, 3_000, rows),
+        "Key events": rng.integers(0, 50, rows),
+        "Total revenue": (rng.random(rows) * 900).round(2),
+    })
+    totals = pd.DataFrame({"Date": [f"202601{d:02d}" for d in range(1, 32)], "Sessions": rng.integers(500, 9_000, 31)})
+    head = (
+        "# ----------------------------------------\n"
+        "# Traffic acquisition: Session source / medium\n"
+        f"# Account: Synthetic {seed}\n"
+        "# Start date: 20260101\n"
+        "# End date: 20260131\n"
+        "# ----------------------------------------\n\n"
+    )
+    tail = "\n# ----------------------------------------\n# Sessions by date\n# ----------------------------------------\n\n"
+    return (head + main.to_csv(index=False) + tail + totals.to_csv(index=False)).encode("utf-8")
+
+
+_PDF_PAGES = [
+    ("SITE TRAFFIC", ["NUMBER OF VISITORS", "SESSIONS    TOTAL USERS    CONVERSIONS", "{a:,}    {b:,}    {c:,}"]),
+    ("NUMBER OF ORDERS", ["TRANSACTIONS    PURCHASE REVENUE", "{c:,}    ${a:,}"]),
+    ("CONVERSION RATE", ["CONVERSION RATE    PURCHASE RATE", "{r:.2f}%    {q:.2f}%"]),
+    ("GOOGLE ADS", ["CLICKS    IMPRESSIONS    COST", "{c:,}    {a:,}    ${b:,}"]),
+    ("NOTES", ["TOP QUERIES    CLICKS    IMPRESSIONS"]),
+]
+
+
+def dashthis_pdf(pages: int, text: bool = True, seed: int = 0) -> bytes:
+    """Dashboard-style PDF. With text=False every page is an image only (scanned look)."""
+    import fitz  # PyMuPDF
+    import random
+
+    rnd = random.Random(seed)
+    doc = fitz.open()
+    for p in range(pages):
+        title, lines = _PDF_PAGES[p % len(_PDF_PAGES)]
+        page = doc.new_page(width=842, height=595)
+        vals = {"a": rnd.randint(10_000, 90_000), "b": rnd.randint(1_000, 9_000), "c": rnd.randint(10, 900),
+                "r": rnd.random() * 5, "q": rnd.random() * 3}
+        y = 60
+        page.insert_text((40, y), f"{title}  (page {p + 1})", fontsize=18)
+        for ln in lines:
+            y += 30
+            page.insert_text((40, y), ln.format(**vals), fontsize=12)
+        # Source / medium breakdown rows
+        for i in range(12):
+            y += 20
+            page.insert_text((40, y), f"source{seed}-{p}-{i} / organic    {rnd.randint(10, 9_999):,}    {rnd.uniform(-30, 30):+.1f}%", fontsize=10)
+    if text:
+        return doc.tobytes()
+    scanned = fitz.open()
+    for page in doc:
+        pix = page.get_pixmap(dpi=110)
+        out = scanned.new_page(width=page.rect.width, height=page.rect.height)
+        out.insert_image(out.rect, stream=pix.tobytes("png"))
+    return scanned.tobytes()
+
+
+def screenshot_png(i: int, seed: int = 0, size=(1600, 900)) -> bytes:
+    from PIL import Image, ImageDraw
+    import random
+
+    rnd = random.Random(seed * 1000 + i)
+    img = Image.new("RGB", size, "white")
+    draw = ImageDraw.Draw(img)
+    draw.text((40, 30), f"Search results performance - screenshot {i} ({seed})", fill="black")
+    points = [(60 + x * 20, 700 - rnd.randint(50, 550)) for x in range((size[0] - 120) // 20)]
+    draw.line(points, fill=(26, 115, 232), width=3)
+    for k in range(4):
+        draw.rectangle((60 + k * 380, 80, 400 + k * 380, 160), outline=(180, 180, 180))
+        draw.text((80 + k * 380, 100), f"Metric {k}: {rnd.randint(100, 99_999):,}", fill="black")
+    buf = io.BytesIO()
+    img.save(buf, format="PNG")
+    return buf.getvalue()
+
+
+def omni_notes(tasks: int, seed: int = 0) -> str:
+    buckets = [
+        ("Completed", "Optimized title tags and meta descriptions for /services/{i}"),
+        ("In Progress / Ongoing", "Internal linking update for the {i}th blog cluster"),
+        ("Added but Not Yet Started", "Schema markup for product page {i}"),
+    ]
+    out: List[str] = [f"1. Work Tasks (synthetic {seed})"]
+    per = max(1, tasks // len(buckets))
+    for heading, template in buckets:
+        out.append(heading)
+        out.extend(f"- {template.format(i=i)} (Assignee: Alex)" for i in range(per))
+    out.append("2. Blockers")
+    out.append("- Waiting on developer access to the staging site")
+    out.append("3. Communication")
+    out.append("- Monthly call held; client asked about query movement")
+    return "\n".join(out)
+
+
+SCREENSHOT_FILENAME_PREFIX = "Screenshot filename: "
+
+
+def canned_output(request: Dict[str, Any]) -> Tuple[str, str]:
+    """(call kind, output text) for a Responses API request body: schema-valid canned JSON.
+
+    Call types are told apart by their system prompt: screenshot summary, evidence
+    extraction, or (anything else) the email draft. Draft image captions echo the
+    screenshot filenames found in the request.
+    """
+    from report_engine.evidence import EVIDENCE_SYSTEM_PROMPT
+    from report_engine.screenshots import SCREENSHOT_SUMMARY_SYSTEM
+
+    system = ""
+    shots: List[str] = []
+    for msg in request.get("input") or []:
+        if not isinstance(msg, dict):
+            continue
+        if msg.get("role") == "system":
+            system = str(msg.get("content") or "")
+        elif isinstance(msg.get("content"), list):
+            for part in msg["content"]:
+                text = str(part.get("text") or "") if isinstance(part, dict) else ""
+                if text.startswith(SCREENSHOT_FILENAME_PREFIX):
+                    shots.append(text[len(SCREENSHOT_FILENAME_PREFIX):].strip())
+    if system == SCREENSHOT_SUMMARY_SYSTEM:
+        kind, body = "screenshot", {
+            "performance_summary": "Clicks rose steadily through the month.",
+            "report_note": "Search clicks trended upward across the period.",
+            "highlights": ["Clicks up", "Impressions flat"],
+            "visible_metrics": [{"label": "Clicks", "value": "12,345", "context": "Last 28 days", "evidence_ref": "screenshot"}],
+            "confidence": "Medium",
+        }
+    elif system == EVIDENCE_SYSTEM_PROMPT:
+        kind, body = "evidence", {
+            "main_kpis": [{"metric": "Clicks", "value": "12,345", "delta": "+8%", "period": "January 2026",
+                           "evidence_ref": "gsc-performance.xlsx / Chart", "confidence": "High"}],
+            "noteworthy_wins": [],
+            "risks_or_anomalies": [],
+            "movers": [],
+            "work_to_results_links": [],
+            "notes": [],
+        }
+    else:
+        kind, body = "draft", {
+            "subject": "SEO Monthly Update",
+            "monthly_overview": "Organic visibility grew this month while the technical backlog shrank.",
+            "dashthis_line": "",
+            "key_highlights": ["Clicks up month over month", "Three new pages indexed"],
+            "main_kpis": ["Clicks: 12,345", "Impressions: 456,789"],
+            "wins_progress": ["Title tag refresh shipped"],
+            "blockers": ["Waiting on developer access"],
+            "completed_tasks": ["Optimized title tags"],
+            "outstanding_tasks": ["Schema markup"],
+            "top_opportunities": {"queries": [], "pages": []},
+            "image_captions": [{"file_name": fn, "suggested_section": "key_highlights", "caption": f"Chart: {fn}"} for fn in shots],
+        }
+    return kind, json.dumps(body)
+
+
+def text_chunks(text: str, chunk_chars: int = 24) -> List[str]:
+    """text split into stream deltas of about chunk_chars characters."""
+    step = max(1, int(chunk_chars))
+    return [text[i:i + step] for i in range(0, len(text), step)]
+
+
+def corrupt_json_text(text: str) -> str:
+    """text with a stray fragment after its first top-level field: a malformed stream."""
+    cut = text.find('", "')
+    cut = cut + 1 if cut > 0 else len(text) // 3
+    return text[:cut] + ' <<unexpected>> ' + text[cut:]
+
+
+class _StubResponse:
+    def __init__(self, text: str):
+        self.output_text = text
+
+
+class _StubEvent:
+    def __init__(self, type: str, **fields: Any):
+        self.type = type
+        self.__dict__.update(fields)
+
+
+class _StubResponses:
+    def __init__(self, owner: "StubModelClient"):
+        self._owner = owner
+
+    def create(self, **kwargs: Any) -> Any:
+        if kwargs.pop("stream", False):
+            return self._owner._stream(kwargs)
+        return self._owner._respond(kwargs)
+
+
+class StubModelClient:
+    """In-process stand-in for openai.OpenAI: canned_output() after latency_s; counts per call kind in .calls.
+
+    create(stream=True) yields Responses stream events: latency_s before the first delta,
+    then stream_chunk_s per delta. For HTTP-level behaviour (SDK, retries, 429s, token
+    usage, malformed streams) use responses_server.py instead.
+    """
+
+    def __init__(self, latency_s: float = 0.0, stream_chunk_s: float = 0.0):
+        self.latency_s = float(latency_s)
+        self.stream_chunk_s = float(stream_chunk_s)
+        self.calls: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.responses = _StubResponses(self)
+
+    def with_options(self, **kwargs: Any) -> "StubModelClient":
+        return self
+
+    def _respond(self, kwargs: Dict[str, Any]) -> _StubResponse:
+        kind, text = canned_output(kwargs)
+        with self._lock:
+            self.calls[kind] = self.calls.get(kind, 0) + 1
+        if self.latency_s > 0:
+            time.sleep(self.latency_s)
+        return _StubResponse(text)
+
+    def _stream(self, kwargs: Dict[str, Any]) -> Any:
+        kind, text = canned_output(kwargs)
+        with self._lock:
+            self.calls[kind] = self.calls.get(kind, 0) + 1
+        if self.latency_s > 0:
+            time.sleep(self.latency_s)
+        for chunk in text_chunks(text):
+            yield _StubEvent("response.output_text.delta", delta=chunk)
+            if self.stream_chunk_s > 0:
+                time.sleep(self.stream_chunk_s)
+        yield _StubEvent("response.completed", response=_StubResponse(text))
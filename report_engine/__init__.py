@@ -0,0 +1,53 @@
+"""Report engine: the ingestion, insight, drafting and rendering pipeline behind the
+monthly report builder, importable without Streamlit (headless and batch use).
+
+The Streamlit app (monthly_report_builder_app.py) is a thin UI over this package.
+"""
+
+from .llm import DEFAULT_MODEL
+from .pdf import PdfDocument
+from .ingest import build_supporting_context
+from .insight import build_insight_model
+from .evidence import run_evidence_extraction
+from .drafting import generate_monthly_email_draft, gpt_generate_email, gpt_generate_email_stream
+from .render import (
+    SIGNATURE_OPTIONS,
+    build_eml,
+    get_template_html,
+    load_template,
+    render_email_html,
+    render_signature_html,
+    seed_image_placement,
+)
+from .pdf_export import PLAYWRIGHT_AVAILABLE, PdfBrowserService, html_to_pdf_batch, html_to_pdf_bytes, pdf_browser_service
+
+__all__ = [
+    "DEFAULT_MODEL",
+    "PLAYWRIGHT_AVAILABLE",
+    "PdfBrowserService",
+    "PdfDocument",
+    "SIGNATURE_OPTIONS",
+    "TEMPLATE_HTML",
+    "build_eml",
+    "build_insight_model",
+    "build_supporting_context",
+    "generate_monthly_email_draft",
+    "get_template_html",
+    "gpt_generate_email",
+    "gpt_generate_email_stream",
+    "html_to_pdf_batch",
+    "html_to_pdf_bytes",
+    "load_template",
+    "pdf_browser_service",
+    "render_email_html",
+    "render_signature_html",
+    "run_evidence_extraction",
+    "seed_image_placement",
+]
+
+
+def __getattr__(name):
+    # TEMPLATE_HTML is loaded on first access rather than at import (see render.get_template_html).
+    if name == "TEMPLATE_HTML":
+        return get_template_html()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
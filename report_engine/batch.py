@@ -0,0 +1,464 @@
+"""Month-end batch runner: analyze, draft and export many clients in parallel.
+
+Usage:
+    python -m report_engine.batch manifest.json --out runs/2026-01 --workers 4 --model-concurrency 6 --pdf
+
+Manifest (JSON; relative paths are resolved against the manifest's folder):
+    {
+      "defaults": {"month_label": "January 2026", "verbosity": "Standard", "signature": "Kevin"},
+      "clients": [
+        {"id": "acme", "client_name": "Acme", "website": "acme.com",
+         "uploads": "acme/uploads", "omni_notes": "acme/omni.txt",
+         "dashthis_url": "...", "recipient_first_name": "...", "opening_line": "...",
+         "special_instructions": "..."}
+      ]
+    }
+
+"uploads" is a folder (every non-hidden file in it, sorted by name) or a list of
+file paths. Each client gets out/<id>/ with email.eml, email.html, insight.json,
+draft.json and result.json (written last, so a client without one never finished).
+Re-running the same command resumes: clients whose result.json matches the current
+inputs and settings are skipped, unless --force is given. PDFs are rendered in the
+parent process on one warm browser once every client has finished. A summary of
+per-client status, timings, token usage and errors is written to out/summary.json;
+each client's usage is also appended to the usage ledger (see usage.py).
+
+Model calls across all workers share one semaphore (--model-concurrency), so the
+number of in-flight Responses API requests stays bounded no matter how many
+clients run at once.
+"""
+
+import argparse
+import hashlib
+import io
+import json
+import multiprocessing
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Optional, List, Tuple, Any
+
+from .fingerprint import _input_fingerprint
+from .llm import DEFAULT_MODEL, set_model_call_gate
+from .usage import append_ledger, usage_meter
+from .utils import _safe_decode_text
+
+
+BATCH_RESULT_VERSION = "1"
+BATCH_WORKERS = int(os.getenv("BATCH_WORKERS", "4") or 4)
+BATCH_MODEL_CONCURRENCY = int(os.getenv("BATCH_MODEL_CONCURRENCY", "6") or 6)
+
+# Client settings that change the output (and therefore invalidate a finished result).
+BATCH_SETTING_KEYS = (
+    "client_name", "website", "month_label", "dashthis_url", "recipient_first_name",
+    "opening_line", "signature", "verbosity", "special_instructions",
+)
+BATCH_DEFAULTS = {
+    "client_name": "",
+    "website": "",
+    "month_label": "",
+    "dashthis_url": "",
+    "recipient_first_name": "",
+    "opening_line": "",
+    "signature": "None",
+    "verbosity": "Quick scan",
+    "special_instructions": "",
+    "uploads": [],
+    "omni_notes": "",
+}
+
+
+class _NamedUpload(io.BytesIO):
+    """In-memory stand-in for a Streamlit UploadedFile (name + getvalue/getbuffer)."""
+
+    def __init__(self, name: str, data: bytes):
+        super().__init__(data)
+        self.name = name
+
+
+def _write_json_atomic(path: str, obj: Any) -> None:
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as fh:
+        json.dump(obj, fh, indent=2, ensure_ascii=False, default=str)
+    os.replace(tmp, path)
+
+
+def _write_bytes_atomic(path: str, data: bytes) -> None:
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as fh:
+        fh.write(data)
+    os.replace(tmp, path)
+
+
+def _read_json(path: str) -> Optional[Any]:
+    try:
+        with open(path, "r", encoding="utf-8") as fh:
+            return json.load(fh)
+    except Exception:
+        return None
+
+
+def load_manifest(path: str) -> List[Dict[str, Any]]:
+    """Read a batch manifest and return one fully-resolved spec per client."""
+    with open(path, "r", encoding="utf-8") as fh:
+        manifest = json.load(fh)
+    base = os.path.dirname(os.path.abspath(path))
+    if isinstance(manifest, list):
+        manifest = {"clients": manifest}
+    defaults = dict(BATCH_DEFAULTS)
+    defaults.update(manifest.get("defaults") or {})
+
+    def _resolve(p: str) -> str:
+        return p if os.path.isabs(p) else os.path.join(base, p)
+
+    specs: List[Dict[str, Any]] = []
+    seen = set()
+    for i, raw in enumerate(manifest.get("clients") or []):
+        spec = dict(defaults)
+        spec.update(raw or {})
+        cid = str(spec.get("id") or spec.get("client_name") or f"client-{i + 1}").strip()
+        cid = "".join(c if (c.isalnum() or c in "-_.") else "-" for c in cid) or f"client-{i + 1}"
+        if cid in seen:
+            raise ValueError(f"Duplicate client id in manifest: {cid}")
+        seen.add(cid)
+        spec["id"] = cid
+
+        uploads = spec.get("uploads") or []
+        if isinstance(uploads, str):
+            uploads = [uploads]
+        spec["uploads"] = [_resolve(p) for p in uploads]
+        notes = spec.get("omni_notes") or ""
+        spec["omni_notes"] = _resolve(notes) if notes else ""
+        specs.append(spec)
+    return specs
+
+
+def _collect_uploads(spec: Dict[str, Any]) -> List[_NamedUpload]:
+    paths: List[str] = []
+    for p in spec.get("uploads") or []:
+        if os.path.isdir(p):
+            for fn in sorted(os.listdir(p)):
+                full = os.path.join(p, fn)
+                if not fn.startswith(".") and os.path.isfile(full):
+                    paths.append(full)
+        elif os.path.isfile(p):
+            paths.append(p)
+        else:
+            raise FileNotFoundError(f"Upload path not found: {p}")
+    files: List[_NamedUpload] = []
+    for full in paths:
+        with open(full, "rb") as fh:
+            files.append(_NamedUpload(os.path.basename(full), fh.read()))
+    return files
+
+
+def _read_notes(spec: Dict[str, Any]) -> str:
+    path = spec.get("omni_notes") or ""
+    if not path:
+        return ""
+    with open(path, "rb") as fh:
+        raw = fh.read()
+    return _safe_decode_text(raw).strip()
+
+
+def _run_signature(spec: Dict[str, Any], model: str, fingerprint: Dict[str, Any]) -> str:
+    settings = {k: spec.get(k) for k in BATCH_SETTING_KEYS}
+    h = hashlib.sha256()
+    h.update(f"v{BATCH_RESULT_VERSION}|{model}|{fingerprint['signature']}|".encode("utf-8"))
+    h.update(json.dumps(settings, sort_keys=True, default=str).encode("utf-8"))
+    return h.hexdigest()
+
+
+def _image_triplets(files: List[_NamedUpload]) -> List[Tuple[str, bytes, str]]:
+    triplets: List[Tuple[str, bytes, str]] = []
+    for f in files:
+        low = f.name.lower()
+        if low.endswith((".png", ".jpg", ".jpeg")):
+            mime = "image/png" if low.endswith(".png") else "image/jpeg"
+            triplets.append((f.name, f.getvalue(), mime))
+    return triplets
+
+
+def _init_worker(gate: Any) -> None:
+    set_model_call_gate(gate)
+
+
+def run_client(spec: Dict[str, Any], out_root: str, model: str = DEFAULT_MODEL, force: bool = False) -> Dict[str, Any]:
+    """Analyze, draft and export one client into out_root/<id>/. Returns its result record."""
+    from openai import OpenAI
+
+    from .ingest import build_supporting_context
+    from .insight import build_insight_model
+    from .drafting import generate_monthly_email_draft
+    from .render import _derive_top_opportunities_from_insight, build_eml, render_email_html, seed_image_placement
+
+    cid = spec["id"]
+    out_dir = os.path.join(out_root, cid)
+    os.makedirs(out_dir, exist_ok=True)
+    result_path = os.path.join(out_dir, "result.json")
+    timings: Dict[str, float] = {}
+    t_start = time.perf_counter()
+    result: Dict[str, Any] = {"id": cid, "client_name": spec.get("client_name") or "", "status": "error", "pid": os.getpid()}
+    meter = None
+
+    try:
+        t0 = time.perf_counter()
+        files = _collect_uploads(spec)
+        notes = _read_notes(spec)
+        fingerprint = _input_fingerprint(notes, files)
+        signature = _run_signature(spec, model, fingerprint)
+        timings["load_s"] = round(time.perf_counter() - t0, 3)
+        result["signature"] = signature
+        result["inputs"] = fingerprint["files"]
+
+        previous = _read_json(result_path)
+        if (
+            not force
+            and isinstance(previous, dict)
+            and previous.get("status") == "ok"
+            and previous.get("signature") == signature
+            and all(os.path.exists(os.path.join(out_dir, fn)) for fn in (previous.get("artifacts") or []))
+        ):
+            previous["status"] = "skipped"
+            previous["skipped_reason"] = "inputs unchanged"
+            return previous
+
+        client = OpenAI()
+        triplets = _image_triplets(files)
+        meter = usage_meter("batch", client=result["client_name"] or cid, id=cid, model=model)
+
+        t0 = time.perf_counter()
+        supporting_context = build_supporting_context(files)
+        timings["parse_s"] = round(time.perf_counter() - t0, 3)
+
+        t0 = time.perf_counter()
+        with meter:
+            insight = build_insight_model(
+                client=client,
+                model=model,
+                omni_notes=notes,
+                supporting_context=supporting_context,
+                image_triplets=triplets,
+            )
+        timings["insight_s"] = round(time.perf_counter() - t0, 3)
+
+        payload = {
+            "client_name": (spec.get("client_name") or "").strip(),
+            "website": (spec.get("website") or "").strip(),
+            "month_label": (spec.get("month_label") or "").strip(),
+            "dashthis_url": (spec.get("dashthis_url") or "").strip(),
+            "omni_notes": notes,
+            "insight_payload": insight,
+            "verbosity_level": spec.get("verbosity") or "Quick scan",
+            "special_instructions": (spec.get("special_instructions") or "").strip(),
+        }
+        t0 = time.perf_counter()
+        with meter:
+            email_json, raw = generate_monthly_email_draft(client=client, model=model, payload=payload, image_triplets=triplets)
+        timings["draft_s"] = round(time.perf_counter() - t0, 3)
+        email_json = email_json or {}
+
+        t0 = time.perf_counter()
+        assignments: Dict[str, str] = {}
+        captions: Dict[str, str] = {}
+        seed_image_placement(email_json, assignments, captions)
+        top_opps = email_json.get("top_opportunities") or {}
+        if not (isinstance(top_opps, dict) and (top_opps.get("queries") or top_opps.get("pages"))):
+            top_opps = _derive_top_opportunities_from_insight(insight, max_items=5)
+        sections = {k: email_json.get(k) for k in ("monthly_overview", "dashthis_line", "key_highlights", "main_kpis",
+                                                   "wins_progress", "blockers", "completed_tasks", "outstanding_tasks")}
+        sections["top_opportunities"] = {
+            "queries": list(top_opps.get("queries") or [])[:5],
+            "pages": list(top_opps.get("pages") or [])[:5],
+        }
+        rendered = render_email_html(
+            sections,
+            client_name=spec.get("client_name") or "",
+            month_label=spec.get("month_label") or "",
+            website=spec.get("website") or "",
+            dashthis_url=spec.get("dashthis_url") or "",
+            recipient_first_name=spec.get("recipient_first_name") or "",
+            opening_line=spec.get("opening_line") or "",
+            signature_choice=spec.get("signature") or "None",
+            images={name: b for name, b, _ in triplets},
+            image_assignments=assignments,
+            image_captions=captions,
+        )
+        eml_bytes = build_eml(email_json.get("subject", ""), rendered["html"], rendered["image_parts"])
+        timings["render_s"] = round(time.perf_counter() - t0, 3)
+
+        _write_bytes_atomic(os.path.join(out_dir, "email.eml"), eml_bytes)
+        _write_bytes_atomic(os.path.join(out_dir, "email.html"), rendered["preview_html"].encode("utf-8"))
+        _write_json_atomic(os.path.join(out_dir, "insight.json"), insight)
+        _write_json_atomic(os.path.join(out_dir, "draft.json"), {"email": email_json, "raw": raw or "",
+                                                                 "image_assignments": assignments, "image_captions": captions})
+        result["artifacts"] = ["email.eml", "email.html", "insight.json", "draft.json"]
+        result["subject"] = email_json.get("subject", "")
+        result["status"] = "ok"
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+        result["traceback"] = traceback.format_exc(limit=8)
+    finally:
+        timings["total_s"] = round(time.perf_counter() - t_start, 3)
+        result["timings"] = timings
+        if meter is not None:
+            usage = meter.summary()
+            append_ledger(usage)
+            result["usage"] = {k: v for k, v in usage.items() if k != "call_log"}
+        result["finished_at"] = time.strftime("%Y-%m-%dT%H:%M:%S")
+
+    if result["status"] == "ok":
+        _write_json_atomic(result_path, result)
+    else:
+        # Leave the last good result in place; record the failure next to it.
+        _write_json_atomic(os.path.join(out_dir, "error.json"), result)
+    return result
+
+
+def _render_pdfs(out_root: str, results: List[Dict[str, Any]], force: bool = False) -> None:
+    """Render email.pdf for finished clients on one warm browser; failures are warnings, not client errors."""
+    from .pdf_export import PLAYWRIGHT_AVAILABLE, html_to_pdf_batch
+
+    todo: List[Dict[str, Any]] = []
+    for r in results:
+        if r.get("status") not in ("ok", "skipped"):
+            continue
+        out_dir = os.path.join(out_root, r["id"])
+        if not force and r.get("status") == "skipped" and os.path.exists(os.path.join(out_dir, "email.pdf")):
+            continue
+        todo.append(r)
+    if not todo:
+        return
+    if not PLAYWRIGHT_AVAILABLE:
+        for r in todo:
+            r.setdefault("warnings", []).append("PDF skipped: Playwright is not installed")
+        return
+
+    htmls: List[str] = []
+    for r in todo:
+        with open(os.path.join(out_root, r["id"], "email.html"), "r", encoding="utf-8") as fh:
+            htmls.append(fh.read())
+    t0 = time.perf_counter()
+    try:
+        outputs = html_to_pdf_batch(htmls)
+    except Exception as e:
+        outputs = [e] * len(todo)
+    per_pdf = round((time.perf_counter() - t0) / max(1, len(todo)), 3)
+    for r, out in zip(todo, outputs):
+        out_dir = os.path.join(out_root, r["id"])
+        if isinstance(out, (bytes, bytearray)) and out:
+            _write_bytes_atomic(os.path.join(out_dir, "email.pdf"), bytes(out))
+            r.setdefault("timings", {})["pdf_s"] = per_pdf
+            if "email.pdf" not in (r.get("artifacts") or []):
+                r["artifacts"] = list(r.get("artifacts") or []) + ["email.pdf"]
+            if r.get("status") == "ok":
+                _write_json_atomic(os.path.join(out_dir, "result.json"), r)
+        else:
+            first_line = (str(out).strip().splitlines() or [""])[0]
+            r.setdefault("warnings", []).append(f"PDF failed: {type(out).__name__}: {first_line}")
+
+
+def run_batch(
+    manifest_path: str,
+    out_root: str,
+    workers: int = BATCH_WORKERS,
+    model_concurrency: int = BATCH_MODEL_CONCURRENCY,
+    model: str = DEFAULT_MODEL,
+    pdf: bool = False,
+    force: bool = False,
+    only: Optional[List[str]] = None,
+) -> Dict[str, Any]:
+    """Run every client in the manifest across a process pool and write out_root/summary.json."""
+    specs = load_manifest(manifest_path)
+    if only:
+        wanted = set(only)
+        specs = [s for s in specs if s["id"] in wanted]
+    os.makedirs(out_root, exist_ok=True)
+
+    t_start = time.perf_counter()
+    ctx = multiprocessing.get_context()
+    gate = ctx.BoundedSemaphore(max(1, int(model_concurrency)))
+    results: Dict[str, Dict[str, Any]] = {}
+
+    def _failed(spec: Dict[str, Any], msg: str) -> Dict[str, Any]:
+        return {"id": spec["id"], "client_name": spec.get("client_name") or "", "status": "error", "error": msg, "timings": {}}
+
+    pending = list(specs)
+    while pending:
+        n_workers = max(1, min(int(workers), len(pending)))
+        broken = False
+        with ProcessPoolExecutor(max_workers=n_workers, mp_context=ctx, initializer=_init_worker, initargs=(gate,)) as pool:
+            futures = {pool.submit(run_client, spec, out_root, model, force): spec for spec in pending}
+            for fut in as_completed(futures):
+                spec = futures[fut]
+                try:
+                    r = fut.result()
+                except BrokenProcessPool:
+                    broken = True
+                    continue
+                except Exception as e:
+                    r = _failed(spec, f"{type(e).__name__}: {e}")
+                results[spec["id"]] = r
+                print(f"[{r.get('status')}] {spec['id']} ({(r.get('timings') or {}).get('total_s', 0)}s)"
+                      + (f" - {r.get('error')}" if r.get("error") else ""), file=sys.stderr)
+        remaining = [s for s in pending if s["id"] not in results]
+        if broken and remaining and len(remaining) < len(pending):
+            # A worker died (e.g. OOM); restart the pool for the clients it took down with it.
+            pending = remaining
+            continue
+        for spec in remaining:
+            results[spec["id"]] = _failed(spec, "Worker process terminated abruptly")
+        pending = []
+
+    ordered = [results[s["id"]] for s in specs if s["id"] in results]
+    if pdf:
+        _render_pdfs(out_root, ordered, force=force)
+
+    counts: Dict[str, int] = {}
+    for r in ordered:
+        counts[r.get("status", "error")] = counts.get(r.get("status", "error"), 0) + 1
+    summary = {
+        "manifest": os.path.abspath(manifest_path),
+        "model": model,
+        "workers": workers,
+        "model_concurrency": model_concurrency,
+        "wall_s": round(time.perf_counter() - t_start, 3),
+        "counts": counts,
+        "clients": [
+            {k: r.get(k) for k in ("id", "client_name", "status", "subject", "timings", "usage", "error", "warnings", "skipped_reason") if r.get(k) is not None}
+            for r in ordered
+        ],
+    }
+    _write_json_atomic(os.path.join(out_root, "summary.json"), summary)
+    return summary
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(prog="python -m report_engine.batch", description="Month-end batch report runner.")
+    ap.add_argument("manifest", help="Path to the client manifest (JSON).")
+    ap.add_argument("--out", required=True, help="Output folder (one subfolder per client).")
+    ap.add_argument("--workers", type=int, default=BATCH_WORKERS, help="Client processes to run in parallel.")
+    ap.add_argument("--model-concurrency", type=int, default=BATCH_MODEL_CONCURRENCY, help="Max in-flight model calls across all workers.")
+    ap.add_argument("--model", default=DEFAULT_MODEL)
+    ap.add_argument("--pdf", action="store_true", help="Also export email.pdf per client.")
+    ap.add_argument("--force", action="store_true", help="Re-run clients even if their inputs are unchanged.")
+    ap.add_argument("--only", action="append", help="Run only this client id (repeatable).")
+    args = ap.parse_args(argv)
+
+    if not os.getenv("OPENAI_API_KEY"):
+        print("OPENAI_API_KEY is not set.", file=sys.stderr)
+        return 2
+
+    summary = run_batch(
+        args.manifest, args.out, workers=args.workers, model_concurrency=args.model_concurrency,
+        model=args.model, pdf=args.pdf, force=args.force, only=args.only,
+    )
+    print(json.dumps({"wall_s": summary["wall_s"], "counts": summary["counts"]}))
+    return 1 if summary["counts"].get("error") else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
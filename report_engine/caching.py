@@ -0,0 +1,155 @@
+"""Content-addressed caches: in-memory LRU with an optional size-bounded on-disk tier."""
+
+import json
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from typing import Optional, List, Tuple, Any
+
+
+# -----------------------------
+# Content-addressed caches
+# -----------------------------
+# Small in-memory LRU with an optional on-disk tier (one JSON file per key). Used for
+# results that are pure functions of their inputs, e.g. screenshot summaries keyed by
+# image hash + model + prompt version. Values must be JSON-serializable.
+
+REPORT_CACHE_DIR = os.environ.get("REPORT_CACHE_DIR") or os.path.join(os.getcwd(), ".cache", "report-builder")
+
+
+def _env_flag(name: str, default: bool) -> bool:
+    v = (os.getenv(name) or "").strip().lower()
+    if not v:
+        return default
+    return v not in ("0", "false", "no", "off")
+
+
+class _LruCache:
+    """Thread-safe bounded LRU mapping."""
+
+    def __init__(self, max_items: int = 256):
+        self.max_items = max(1, int(max_items))
+        self._data: "OrderedDict[str, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Any:
+        with self._lock:
+            if key not in self._data:
+                return None
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def put(self, key: str, value: Any) -> None:
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_items:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
+class _JsonDirStore:
+    """Directory of JSON files keyed by hex digest, bounded by total size.
+
+    Least-recently-used files (by mtime; reads touch the file) are evicted once the
+    directory grows past max_bytes. All I/O errors are swallowed: the store is an
+    optimization, never a source of failures.
+    """
+
+    def __init__(self, root: str, max_bytes: int = 64 * 1024 * 1024):
+        self.root = root
+        self.max_bytes = int(max_bytes)
+        self._lock = threading.Lock()
+        self._approx_bytes: Optional[int] = None
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], f"{key}.json")
+
+    def get(self, key: str) -> Any:
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                value = json.load(f)
+            try:
+                os.utime(path, None)
+            except Exception:
+                pass
+            return value
+        except Exception:
+            return None
+
+    def put(self, key: str, value: Any) -> None:
+        path = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            payload = json.dumps(value, ensure_ascii=False).encode("utf-8")
+            tmp = f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(payload)
+            os.replace(tmp, path)
+        except Exception:
+            return
+        with self._lock:
+            if self._approx_bytes is None:
+                self._approx_bytes = self._scan_size()
+            else:
+                self._approx_bytes += len(payload)
+            if self._approx_bytes > self.max_bytes:
+                self._evict()
+
+    def _files(self) -> List[Tuple[float, int, str]]:
+        out = []
+        for dirpath, _, filenames in os.walk(self.root):
+            for fn in filenames:
+                if not fn.endswith(".json"):
+                    continue
+                fp = os.path.join(dirpath, fn)
+                try:
+                    st_ = os.stat(fp)
+                    out.append((st_.st_mtime, st_.st_size, fp))
+                except Exception:
+                    continue
+        return out
+
+    def _scan_size(self) -> int:
+        return sum(size for _, size, _ in self._files())
+
+    def _evict(self) -> None:
+        files = sorted(self._files())
+        total = sum(size for _, size, _ in files)
+        # Evict down to 90% so we don't rescan on every put near the limit.
+        target = int(self.max_bytes * 0.9)
+        for _, size, fp in files:
+            if total <= target:
+                break
+            try:
+                os.remove(fp)
+                total -= size
+            except Exception:
+                continue
+        self._approx_bytes = total
+
+
+class _TieredCache:
+    """Memory LRU in front of an optional _JsonDirStore. Disk hits are promoted to memory."""
+
+    def __init__(self, max_items: int, disk: Optional[_JsonDirStore] = None):
+        self.memory = _LruCache(max_items)
+        self.disk = disk
+
+    def get(self, key: str) -> Any:
+        value = self.memory.get(key)
+        if value is None and self.disk is not None:
+            value = self.disk.get(key)
+            if value is not None:
+                self.memory.put(key, value)
+        return value
+
+    def put(self, key: str, value: Any) -> None:
+        self.memory.put(key, value)
+        if self.disk is not None:
+            self.disk.put(key, value)
@@ -0,0 +1,291 @@
+"""Compact insight digest for the draft-generation prompt.
+
+gpt_generate_email used to embed the whole insight model with json.dumps(indent=2):
+50 top and 50 opportunity queries/pages, every supplemental KPI row, debug counters,
+confidence labels and the same long evidence_ref string on every row. The digest
+keeps what the section rules in the drafting prompt actually use, in a terser form:
+
+  - rows are positional arrays under short keys (columns in DIGEST_LEGEND, which goes
+    into the system prompt once, so it is part of the cacheable prefix);
+  - evidence_ref strings are interned: rows carry an index into "refs" as their last
+    field, always present (null without a ref) so it is never confused with a metric;
+  - row counts are capped per verbosity level (DIGEST_ROW_LIMITS); "more" records how
+    many rows of each list were left out. Organic commerce KPIs (revenue, purchases,
+    conversion rate, AOV) are always kept, as the Main KPIs rules require them;
+  - debug, _gsc_source and confidence labels are dropped (the prompt forbids mentioning
+    confidence), except on interpretive links, where it sets how cautious the wording is.
+
+DRAFT_PROMPT_FORMAT=full restores the previous prompt. benchmarks/bench_draft_prompt.py
+measures prompt tokens and latency for both formats.
+"""
+
+import math
+import os
+import re
+from typing import Dict, Optional, List, Any
+
+
+DRAFT_PROMPT_FORMAT = (os.getenv("DRAFT_PROMPT_FORMAT") or "compact").strip().lower()
+
+# Rows kept per list, by verbosity. Top Opportunities shows 5 items; a few spares let
+# the model skip ones already used elsewhere in the email. Every tier keeps some rows
+# of the user's edited source tables, so UI edits always reach the draft.
+DIGEST_ROW_LIMITS: Dict[str, Dict[str, int]] = {
+    "quick": {"kpis": 8, "opportunities": 7, "top": 5, "breakdowns": 3, "observations": 4,
+              "work": 10, "links": 6, "screenshots": 6, "edits": 3, "text_chars": 160},
+    "standard": {"kpis": 12, "opportunities": 8, "top": 10, "breakdowns": 5, "observations": 6,
+                 "work": 15, "links": 10, "screenshots": 10, "edits": 5, "text_chars": 240},
+    "deep": {"kpis": 20, "opportunities": 10, "top": 15, "breakdowns": 8, "observations": 10,
+             "work": 25, "links": 16, "screenshots": 16, "edits": 10, "text_chars": 400},
+}
+
+COMMERCE_KPI_PATTERN = re.compile(
+    r"revenue|purchase|transaction|conversion|\baov\b|average order|order value|e-?commerce|key event", re.I
+)
+
+_WORK_KEYS = {"completed": "done", "in_progress": "wip", "planned": "plan", "blockers": "block", "comms": "comms", "themes": "themes"}
+_OBS_KEYS = {"technical_issues": "tech", "content_ux_issues": "ux", "serp_market_notes": "serp", "other_findings": "other"}
+
+DIGEST_LEGEND = """INSIGHT_MODEL is provided as CONTEXT.insight_digest, a compact digest. Rows are arrays.
+- refs: evidence sources. Rows listed with a final field r always have every field; r is an index into refs, or null when the row has no source.
+- Rows without an r field (links, shots, edits) may omit trailing empty fields.
+- kpi: [metric, value, delta, period, r] (data_signals KPIs).
+- kpi_src: {source file: [[metric, value, delta, r]]} (supplemental and document KPIs; commerce KPIs listed first).
+- opp_q / opp_p: GSC opportunity queries / pages (high impressions + low CTR): [item, impressions, ctr, position, clicks, r].
+- top_q / top_p: top GSC queries / pages by clicks (movers): [item, clicks, impressions, ctr, position, r].
+- dist: {devices|countries|search_appearance: [[item, clicks, impressions, ctr, position, r]]}.
+- trend: [note, r].
+- seo: {tech|ux|serp|other: [[what, where, details, severity, r]]} (SEO observations).
+- work: {done|wip|plan|block|comms|themes: [[item, targets, details, r]]} (work context parsed from Omni notes).
+- links: [work_item, related_signal, relationship, confidence, suggested_language] (Layer D work-to-results context).
+- shots: [file_name, performance_summary, report_note, highlights, [[label, value, context]]] (screenshot summaries).
+- edits: {file: {table: {cols, rows}}} (user-edited source tables).
+- notes: analysis notes. more: {list: rows left out of the digest}.
+"""
+
+
+def _verbosity_key(verbosity_level: Optional[str]) -> str:
+    v = (verbosity_level or "Quick scan").strip().lower()
+    return "deep" if v.startswith("deep") else ("quick" if v.startswith("quick") else "standard")
+
+
+def _scalar(x: Any) -> Any:
+    """JSON-friendly cell: None/NaN -> "", floats rounded, strings stripped."""
+    if x is None:
+        return ""
+    if isinstance(x, float):
+        if math.isnan(x) or math.isinf(x):
+            return ""
+        return int(x) if x.is_integer() else round(x, 2)
+    if isinstance(x, (int, bool)):
+        return x
+    s = str(x).strip()
+    return "" if s.lower() in ("nan", "none", "null") else s
+
+
+def _clip(x: Any, n: int) -> str:
+    s = str(_scalar(x))
+    return s if len(s) <= n else s[: max(0, n - 1)].rstrip() + "…"
+
+
+def _row(*cells: Any) -> List[Any]:
+    """Row without an evidence ref: trailing empty cells are dropped."""
+    out = list(cells)
+    while out and out[-1] in ("", [], None):
+        out.pop()
+    return out
+
+
+def _ref_row(*cells: Any) -> List[Any]:
+    """Row whose last cell is the refs index: fixed arity, null when there is no ref."""
+    out = list(cells)
+    if out and out[-1] == "":
+        out[-1] = None
+    return out
+
+
+def _dicts(items: Any) -> List[Dict[str, Any]]:
+    return [x for x in (items or []) if isinstance(x, dict)] if isinstance(items, list) else []
+
+
+class _Refs:
+    """Interns evidence_ref strings; rows carry the index."""
+
+    def __init__(self):
+        self.refs: List[str] = []
+        self._ids: Dict[str, int] = {}
+
+    def __call__(self, ref: Any) -> Any:
+        ref = _scalar(ref)
+        if isinstance(ref, list):
+            ref = ", ".join(str(r) for r in ref)
+        if ref == "":
+            return ""
+        ref = str(ref)
+        if ref not in self._ids:
+            self._ids[ref] = len(self.refs)
+            self.refs.append(ref)
+        return self._ids[ref]
+
+
+def _capped(rows: List[Any], limit: int, name: str, more: Dict[str, int]) -> List[Any]:
+    if len(rows) > limit:
+        more[name] = more.get(name, 0) + len(rows) - limit
+    return rows[:limit]
+
+
+def _kpi_rows(items: Any, ref: _Refs, with_period: bool) -> List[List[Any]]:
+    rows = []
+    for k in _dicts(items):
+        if _scalar(k.get("metric")) == "" and _scalar(k.get("value")) == "":
+            continue
+        if with_period:
+            rows.append(_ref_row(_scalar(k.get("metric")), _scalar(k.get("value")), _scalar(k.get("delta")),
+                                 _scalar(k.get("period")), ref(k.get("evidence_ref"))))
+        else:
+            rows.append(_ref_row(_scalar(k.get("metric")), _scalar(k.get("value")), _scalar(k.get("delta")),
+                                 ref(k.get("evidence_ref"))))
+    return rows
+
+
+def _commerce_first(rows: List[List[Any]], limit: int) -> List[List[Any]]:
+    """Commerce KPI rows (never capped) followed by the others up to limit."""
+    commerce = [r for r in rows if COMMERCE_KPI_PATTERN.search(str(r[0] if r else ""))]
+    rest = [r for r in rows if not COMMERCE_KPI_PATTERN.search(str(r[0] if r else ""))]
+    return commerce + rest[: max(0, limit - len(commerce))]
+
+
+def build_insight_digest(insight: Dict[str, Any], verbosity_level: Optional[str] = None) -> Dict[str, Any]:
+    """Compact, verbosity-trimmed digest of an insight model for the draft prompt (see DIGEST_LEGEND)."""
+    lim = DIGEST_ROW_LIMITS[_verbosity_key(verbosity_level)]
+    insight = insight if isinstance(insight, dict) else {}
+    ds = insight.get("data_signals") if isinstance(insight.get("data_signals"), dict) else {}
+    ref = _Refs()
+    more: Dict[str, int] = {}
+    digest: Dict[str, Any] = {}
+
+    kpis = _kpi_rows(ds.get("kpis"), ref, with_period=True)
+    if kpis:
+        digest["kpi"] = kpis
+
+    kpi_src: Dict[str, List[List[Any]]] = {}
+    for key in ("supplemental_kpis_by_source", "document_kpis"):
+        by_source = ds.get(key) if isinstance(ds.get(key), dict) else {}
+        for source, items in by_source.items():
+            rows = _kpi_rows(items, ref, with_period=False)
+            if not rows:
+                continue
+            kept = _commerce_first(rows, lim["kpis"])
+            if len(rows) > len(kept):
+                more[f"kpi_src:{source}"] = len(rows) - len(kept)
+            # document_kpis are the user's edited mini tables: they replace the derived rows.
+            kpi_src[str(source)] = kept
+    if kpi_src:
+        digest["kpi_src"] = kpi_src
+
+    for key, name in (("opportunity_queries", "opp_q"), ("opportunity_pages", "opp_p")):
+        rows = [_ref_row(_scalar(r.get("item")), _scalar(r.get("impressions")), _scalar(r.get("ctr")), _scalar(r.get("position")),
+                         _scalar(r.get("clicks")), ref(r.get("evidence_ref"))) for r in _dicts(ds.get(key))]
+        if rows:
+            digest[name] = _capped(rows, lim["opportunities"], name, more)
+
+    for key, name in (("top_queries", "top_q"), ("top_pages", "top_p")):
+        rows = [_ref_row(_scalar(r.get("item")), _scalar(r.get("clicks")), _scalar(r.get("impressions")), _scalar(r.get("ctr")),
+                         _scalar(r.get("position")), ref(r.get("evidence_ref"))) for r in _dicts(ds.get(key))]
+        if rows:
+            digest[name] = _capped(rows, lim["top"], name, more)
+
+    dist: Dict[str, List[List[Any]]] = {}
+    breakdowns = ds.get("distribution_breakdowns") if isinstance(ds.get("distribution_breakdowns"), dict) else {}
+    for key, items in breakdowns.items():
+        rows = [_ref_row(_scalar(r.get("item")), _scalar(r.get("clicks")), _scalar(r.get("impressions")), _scalar(r.get("ctr")),
+                         _scalar(r.get("position")), ref(r.get("evidence_ref"))) for r in _dicts(items)]
+        if rows:
+            dist[str(key)] = _capped(rows, lim["breakdowns"], f"dist:{key}", more)
+    if dist:
+        digest["dist"] = dist
+
+    trend = [_ref_row(_clip(t.get("note"), lim["text_chars"]), ref(t.get("evidence_ref"))) for t in _dicts(ds.get("trend_notes"))]
+    if trend:
+        digest["trend"] = trend
+
+    obs = insight.get("seo_observations") if isinstance(insight.get("seo_observations"), dict) else {}
+    seo: Dict[str, List[List[Any]]] = {}
+    for key, name in _OBS_KEYS.items():
+        rows = [_ref_row(_clip(o.get("what") or o.get("issue"), lim["text_chars"]), _clip(o.get("where"), lim["text_chars"]),
+                         _clip(o.get("details"), lim["text_chars"]), _scalar(o.get("severity")), ref(o.get("evidence_ref")))
+                for o in _dicts(obs.get(key))]
+        if rows:
+            seo[name] = _capped(rows, lim["observations"], f"seo:{name}", more)
+    if seo:
+        digest["seo"] = seo
+
+    wc = insight.get("work_context") if isinstance(insight.get("work_context"), dict) else {}
+    work: Dict[str, List[List[Any]]] = {}
+    for key, name in _WORK_KEYS.items():
+        rows = [_ref_row(_clip(w.get("item"), lim["text_chars"]), _clip(w.get("targets"), lim["text_chars"]),
+                         _clip(w.get("details"), lim["text_chars"]), ref(w.get("evidence_ref")))
+                for w in _dicts(wc.get(key))]
+        if rows:
+            work[name] = _capped(rows, lim["work"], f"work:{name}", more)
+    if work:
+        digest["work"] = work
+
+    links = []
+    for link in _dicts(insight.get("interpretive_links")):
+        rel = _scalar(link.get("relationship"))
+        links.append(_row(
+            _clip(link.get("work_item"), lim["text_chars"]),
+            _clip(link.get("related_signal"), lim["text_chars"]),
+            rel,
+            _scalar(link.get("confidence")),
+            # The no-signal wording is the same boilerplate on every such link.
+            "" if rel == "no_clear_signal_yet" else _clip(link.get("suggested_language"), lim["text_chars"]),
+        ))
+    if links:
+        # Links that found a signal first: they are the ones the draft can use.
+        links.sort(key=lambda r: len(r) > 2 and r[2] == "no_clear_signal_yet")
+        digest["links"] = _capped(links, lim["links"], "links", more)
+
+    shots = []
+    for s in _dicts(insight.get("screenshot_summaries")):
+        metrics = [_row(_scalar(m.get("label")), _scalar(m.get("value")), _scalar(m.get("context")))
+                   for m in _dicts(s.get("visible_metrics"))]
+        highlights = [_clip(h, lim["text_chars"]) for h in (s.get("highlights") or []) if _scalar(h) != ""] \
+            if isinstance(s.get("highlights"), list) else []
+        shots.append(_row(_scalar(s.get("file_name")), _clip(s.get("performance_summary"), lim["text_chars"]),
+                          _clip(s.get("report_note"), lim["text_chars"]), highlights, metrics))
+    if shots:
+        digest["shots"] = _capped(shots, lim["screenshots"], "shots", more)
+
+    edits_src = ds.get("source_table_edits") if isinstance(ds.get("source_table_edits"), dict) else {}
+    edits: Dict[str, Dict[str, Any]] = {}
+    for fname, tables in edits_src.items():
+        for sel, rows in (tables.items() if isinstance(tables, dict) else []):
+            rows = _dicts(rows)
+            if not rows:
+                continue
+            cols = list(rows[0].keys())
+            values = [_row(*[_scalar(r.get(c)) for c in cols]) for r in rows]
+            edits.setdefault(str(fname), {})[str(sel)] = {
+                "cols": cols, "rows": _capped(values, lim["edits"], f"edits:{fname}/{sel}", more)}
+    if edits:
+        digest["edits"] = edits
+
+    notes = [_scalar(n) for n in (insight.get("notes") or []) if _scalar(n) != ""] if isinstance(insight.get("notes"), list) else []
+    if notes:
+        digest["notes"] = notes
+    if more:
+        digest["more"] = more
+    digest["refs"] = ref.refs
+    return digest
+
+
+def draft_prompt_context(payload: Dict[str, Any], prompt_format: Optional[str] = None) -> Dict[str, Any]:
+    """The CONTEXT object of the draft prompt: payload with insight_payload replaced by its digest (compact format)."""
+    fmt = (prompt_format or DRAFT_PROMPT_FORMAT).strip().lower()
+    if fmt == "full":
+        return payload
+    ctx = {k: v for k, v in payload.items() if k != "insight_payload"}
+    ctx["insight_digest"] = build_insight_digest(payload.get("insight_payload") or {}, payload.get("verbosity_level"))
+    return ctx
@@ -0,0 +1,495 @@
+"""Email drafting: prompt assembly, model call and normalization of the draft JSON."""
+
+import json
+import re
+import time
+from typing import TYPE_CHECKING, Any, Callable, Optional, List, Tuple
+
+if TYPE_CHECKING:  # the SDK is only needed by callers that construct a client
+    from openai import OpenAI
+
+from .utils import _safe_json_load
+from .images import _image_data_url_for_model
+from .digest import DIGEST_LEGEND, DRAFT_PROMPT_FORMAT, draft_prompt_context
+from .jsonstream import IncrementalJsonObject, MalformedJsonStream
+from .llm import DRAFT_CALL_TIMEOUT_S, DRAFT_STREAM_IDLE_TIMEOUT_S, _responses_create, _responses_stream
+from .tracing import span
+
+
+def _normalize_email_json(data: dict, verbosity_level: str = "Quick scan") -> dict:
+    """Normalize GPT email JSON output into a stable shape for downstream rendering.
+
+    This is a defensive helper: it should never raise, and it should preserve any
+    valid content the model already returned while ensuring required keys exist.
+    """
+    if not isinstance(data, dict):
+        data = {}
+
+    v = (verbosity_level or "Quick scan").strip().lower()
+
+    def _as_str(x):
+        return "" if x is None else str(x).strip()
+
+    def _as_list(x):
+        if x is None:
+            return []
+        if isinstance(x, list):
+            return x
+        # Sometimes the model returns a single string; split lightly on newlines/bullets.
+        if isinstance(x, str):
+            s = x.strip()
+            if not s:
+                return []
+            parts = [p.strip(" \t-•") for p in re.split(r"\n+|\r+|\u2022", s) if p.strip()]
+            return parts
+        return []
+
+    def _clamp_list(items, max_n):
+        items = [ _as_str(i) for i in items if _as_str(i) ]
+        return items[:max_n] if max_n is not None else items
+
+    # Normalize core fields
+    out = {}
+    out["subject"] = _as_str(data.get("subject")) or "SEO Monthly Update"
+    out["monthly_overview"] = _as_str(data.get("monthly_overview"))
+
+    # Section bullet arrays
+    out["main_kpis"] = _as_list(data.get("main_kpis"))
+
+
+    # Top opportunities (optional): dict with {queries:[], pages:[]}
+    top_opp = data.get("top_opportunities")
+    if not isinstance(top_opp, dict):
+        top_opp = {}
+    out["top_opportunities"] = {
+        "queries": _as_list(top_opp.get("queries")),
+        "pages": _as_list(top_opp.get("pages")),
+    }
+
+    out["key_highlights"] = _as_list(data.get("key_highlights"))
+    out["wins_progress"] = _as_list(data.get("wins_progress"))
+    out["blockers"] = _as_list(data.get("blockers"))
+    out["completed_tasks"] = _as_list(data.get("completed_tasks"))
+    out["outstanding_tasks"] = _as_list(data.get("outstanding_tasks"))
+
+    # DashThis line (optional)
+    out["dashthis_line"] = _as_str(data.get("dashthis_line"))
+
+    # Image captions: list[dict] with expected keys
+    caps = data.get("image_captions")
+    if not isinstance(caps, list):
+        caps = []
+    norm_caps = []
+    allowed_secs = {"key_highlights","main_kpis","wins_progress","blockers","completed_tasks","outstanding_tasks"}
+    for it in caps:
+        if not isinstance(it, dict):
+            continue
+        fn = _as_str(it.get("file_name"))
+        if not fn:
+            continue
+        sec = _as_str(it.get("suggested_section"))
+        if sec not in allowed_secs:
+            sec = "key_highlights"
+        norm_caps.append({
+            "file_name": fn,
+            "caption": _as_str(it.get("caption")),
+            "suggested_section": sec,
+        })
+    out["image_captions"] = norm_caps
+
+    # Verbosity-based clamps (match the schema limits used in gpt_generate_email)
+    if v.startswith("quick"):
+        out["main_kpis"] = _clamp_list(out["main_kpis"], 5)
+        out["top_opportunities"]["queries"] = _clamp_list(out["top_opportunities"]["queries"], 5)
+        out["top_opportunities"]["pages"] = _clamp_list(out["top_opportunities"]["pages"], 5)
+        out["key_highlights"] = _clamp_list(out["key_highlights"], 4)
+        out["wins_progress"] = _clamp_list(out["wins_progress"], 3)
+        out["blockers"] = _clamp_list(out["blockers"], 3)
+        out["completed_tasks"] = _clamp_list(out["completed_tasks"], 5)
+        out["outstanding_tasks"] = _clamp_list(out["outstanding_tasks"], 5)
+    elif v.startswith("deep"):
+        out["main_kpis"] = _clamp_list(out["main_kpis"], 7)
+        out["top_opportunities"]["queries"] = _clamp_list(out["top_opportunities"]["queries"], 5)
+        out["top_opportunities"]["pages"] = _clamp_list(out["top_opportunities"]["pages"], 5)
+        out["key_highlights"] = _clamp_list(out["key_highlights"], 6)
+        out["wins_progress"] = _clamp_list(out["wins_progress"], 6)
+        out["blockers"] = _clamp_list(out["blockers"], 5)
+        out["completed_tasks"] = _clamp_list(out["completed_tasks"], 10)
+        out["outstanding_tasks"] = _clamp_list(out["outstanding_tasks"], 10)
+    else:
+        # Standard
+        out["main_kpis"] = _clamp_list(out["main_kpis"], 7)
+        out["key_highlights"] = _clamp_list(out["key_highlights"], 5)
+        out["wins_progress"] = _clamp_list(out["wins_progress"], 5)
+        out["blockers"] = _clamp_list(out["blockers"], 4)
+        out["completed_tasks"] = _clamp_list(out["completed_tasks"], 8)
+        out["outstanding_tasks"] = _clamp_list(out["outstanding_tasks"], 8)
+
+    # Final cleanup: ensure all list fields are lists of strings
+    for k in ["main_kpis","key_highlights","wins_progress","blockers","completed_tasks","outstanding_tasks"]:
+        out[k] = [ _as_str(x) for x in (out.get(k) or []) if _as_str(x) ]
+
+    # Final cleanup: top opportunities lists
+    try:
+        out["top_opportunities"]["queries"] = [ _as_str(x) for x in (out.get("top_opportunities", {}).get("queries") or []) if _as_str(x) ]
+        out["top_opportunities"]["pages"] = [ _as_str(x) for x in (out.get("top_opportunities", {}).get("pages") or []) if _as_str(x) ]
+    except Exception:
+        out["top_opportunities"] = {"queries": [], "pages": []}
+
+    return out
+
+def build_draft_prompt(payload: dict, prompt_format: Optional[str] = None) -> Tuple[str, str]:
+    """(system prompt, user prompt text) for the draft call.
+
+    prompt_format "compact" (the default, see digest.DRAFT_PROMPT_FORMAT) sends the insight
+    model as a verbosity-trimmed digest with compact JSON; "full" sends it as-is, indented.
+    """
+    fmt = (prompt_format or DRAFT_PROMPT_FORMAT).strip().lower()
+    # Keep the same section structure across modes. The ONLY thing that changes by verbosity
+    # is how much context is included within the same sections.
+    v = (payload.get("verbosity_level") or "Quick scan").strip().lower()
+    if v.startswith("quick"):
+        schema = {
+            "subject": "string",
+            "monthly_overview": "2-3 sentences (max)",
+            "main_kpis": ["0-12 bullets (only if truly noteworthy; otherwise empty list)"],
+            "top_opportunities": {"queries": ["0-5 strings (optional)"], "pages": ["0-5 strings (optional)"]},
+            "key_highlights": ["3-4 bullets (max)"],
+            "wins_progress": ["2-3 bullets (max)"],
+            "blockers": ["1-3 bullets (max)"],
+            "completed_tasks": ["3-5 bullets (max)"],
+            "outstanding_tasks": ["3-5 bullets (max)"],
+            "image_captions": [{"file_name":"exact filename","caption":"optional","suggested_section":"main_kpis|top_opportunities|wins_progress|key_highlights|blockers|completed_tasks|outstanding_tasks"}],
+            "dashthis_line": "short 1 sentence"
+        }
+    elif v.startswith("deep"):
+        schema = {
+            "subject": "string",
+            "monthly_overview": "3-4 sentences (max)",
+            "main_kpis": ["0-12 bullets (only if truly noteworthy; otherwise empty list)"],
+            "top_opportunities": {"queries": ["0-5 strings (optional)"], "pages": ["0-5 strings (optional)"]},
+            "key_highlights": ["4-6 bullets (max)"],
+            "wins_progress": ["3-6 bullets (max)"],
+            "blockers": ["2-5 bullets (max)"],
+            "completed_tasks": ["5-10 bullets (max)"],
+            "outstanding_tasks": ["5-10 bullets (max)"],
+            "image_captions": [{"file_name":"exact filename","caption":"optional","suggested_section":"main_kpis|top_opportunities|wins_progress|key_highlights|blockers|completed_tasks|outstanding_tasks"}],
+            "dashthis_line": "1-2 sentences (max)"
+        }
+    else:
+        # Standard
+        schema = {
+            "subject": "string",
+            "monthly_overview": "3-4 sentences (max)",
+            "main_kpis": ["0-12 bullets (only if truly noteworthy; otherwise empty list)"],
+            "top_opportunities": {"queries": ["0-5 strings (optional)"], "pages": ["0-5 strings (optional)"]},
+            "key_highlights": ["3-5 bullets (max)"],
+            "wins_progress": ["3-5 bullets (max)"],
+            "blockers": ["2-4 bullets (max)"],
+            "completed_tasks": ["4-8 bullets (max)"],
+            "outstanding_tasks": ["4-8 bullets (max)"],
+            "image_captions": [{"file_name":"exact filename","caption":"optional","suggested_section":"main_kpis|top_opportunities|wins_progress|key_highlights|blockers|completed_tasks|outstanding_tasks"}],
+            "dashthis_line": "1 sentence"
+        }
+
+    system = """You are a senior SEO consultant writing a MONTHLY client update email.
+
+Style and tone:
+- Write like a real person emailing a client you know well.
+- Friendly, professional, and focused on what matters to the client.
+- Use plain English (avoid marketing jargon, buzzwords, and hype).
+- Contractions are encouraged where natural.
+- Do not include over-the-top pleasantries.
+- Do NOT mention confidence labels.
+- Do not say things like "Technical updates shipped" or "knocked out technical updates" or "wrapped up technical updates".
+
+Examples of preferred language style:
+- "We addressed several technical issues that were causing..."
+- "We resolved a canonical redirect issue that was causing Google to crawl fewer pages."
+- "We identified and corrected an indexing issue affecting..."
+- "We updated internal linking to support..."
+
+Content rules:
+- SPECIAL INSTRUCTIONS OVERRIDE (highest priority):
+  - If CONTEXT.special_instructions is non-empty, follow it as the highest-priority guidance for the draft.
+  - It may:
+    - prohibit mentioning a topic (globally or within a specific section),
+    - require specific wording in a specific section,
+    - require adding, removing, or rewording specific content,
+    - require global transformations (e.g., capitalization, wording normalization),
+    - change ordering or emphasis across sections.
+  - Apply it literally, even if it conflicts with other stylistic or structural preferences in this prompt.
+  - Special Instructions override verbosity limits, section bullet limits, and output-length constraints when in conflict.
+  - Non-negotiables still apply: output must be valid JSON matching the schema, and do not fabricate data.
+
+- Special Instructions execution requirements:
+  - Special Instructions must be executed exactly as written.
+  - All Special Instructions must be executed.
+  - You may not selectively apply or partially comply with Special Instructions.
+  - If multiple Special Instructions are provided, each one must be followed.
+  - Completing one instruction does not excuse failing to complete others.
+  - Before finalizing the output, verify that every Special Instruction has been applied.
+  - Do NOT reinterpret intent.
+  - Do NOT optimize, summarize, or soften instructions.
+  - Do NOT substitute a lesser or partial action.
+  - Do NOT refuse or hedge unless the instruction is logically impossible to execute.
+
+- Mandatory compliance via reasoning:
+  - If a Special Instruction requires an action, you must reason until you find a way to comply using the available inputs.
+  - You are expected to analyze INSIGHT_MODEL data, derive or calculate information when necessary, and make judgment calls when explicitly requested.
+  - If a Special Instruction asks for subjective judgment (e.g., “you think are valuable”), making that judgment is required.
+  - You may NOT respond with statements such as:
+    - "There is nothing valuable"
+    - "The data does not allow this"
+    - "This cannot be determined"
+  - Unless the task is logically impossible, you must complete it.
+
+- Additive vs destructive change rules:
+  - When a Special Instruction requires adding, inserting, or including content:
+    - Preserve all existing content unless explicitly instructed otherwise.
+    - Add the required content.
+    - Do NOT remove, rewrite, reorder, condense, or substitute existing content.
+  - When a Special Instruction requires removal or exclusion:
+    - Remove only the explicitly referenced content.
+    - Leave all other content untouched.
+  - When a Special Instruction requires rewriting or replacing:
+    - Rewrite only what is explicitly named.
+    - Do not affect surrounding content.
+  - If removal or replacement is not explicitly instructed, it is not permitted.
+
+- REQUIRED EXECUTION ORDER (critical):
+  - Step 1: Draft the full email content using Omni notes, INSIGHT_MODEL, and all standard rules.
+  - Step 2: Apply ALL Special Instructions.
+  - Step 3: Apply any Special Instructions that require global transformations (e.g., capitalization of names, exclusions) across the ENTIRE draft.
+  - Step 4: Verify that every Special Instruction has been applied.
+  - Step 5: Output the final JSON.
+
+- Omni notes are the PRIMARY source of truth for what work happened, what is in progress, what is blocked, and what is planned.
+- INSIGHT_MODEL is the PRIMARY source for performance numbers (Layer A), SEO observations (Layer B), and cautious work↔results context (Layer D).
+- Supporting_context is SECONDARY and should only be used to clarify or corroborate items already present in the Insight Model.
+- Do NOT invent metrics, results, or causality. Only include numbers that appear in INSIGHT_MODEL.data_signals or are directly visible in attached screenshots/PDF text.
+- Put KPI numbers in the Main KPIs section whenever possible. Avoid repeating the same numbers across multiple sections.
+- Use evidence in Key Highlights or Wins & Progress only when it is truly noteworthy (material movement, clear page/query mover, or evidence that directly supports the work narrative).
+- If evidence suggests a relationship between work and results, use cautious language (e.g., "early signal", "may be contributing", "directional lift") unless explicitly stated in Omni notes.
+- Never output limitation text such as "couldn't pull KPIs" or "data unavailable". If evidence is missing, omit it.
+
+Status fidelity rules (critical):
+- Treat Omni notes as literal statements of status, timing, and certainty.
+- Do NOT advance or upgrade the state of work beyond what is explicitly stated in the Omni notes.
+- If an Omni note describes a future, pending, or dependency-based action (e.g., "will provide", "is going to", "planned", "expected", "waiting on"), reflect it as such in the draft.
+- Do NOT rephrase future or pending items as completed or in-progress work.
+- Do NOT imply that inputs were received or used unless Omni notes explicitly confirm receipt or use.
+- When in doubt, preserve the original tense and intent of the Omni note rather than smoothing or generalizing it.
+
+Evidence review responsibility:
+- Before drafting, review the full INSIGHT_MODEL JSON to understand all available performance data.
+- Do not surface all available metrics—select only those that are relevant based on section rules.
+- Use the presence or absence of data to guide what is included, not to force coverage.
+- If data exists but is not appropriate to include, silently omit it.
+
+Monthly Overview rules (refined):
+- The Monthly Overview must be qualitative and work-focused.
+- Do NOT include metrics, statistics, percentages, counts, or numeric performance references of any kind in the Monthly Overview.
+- The Overview should characterize the month at a high level (e.g., focus, theme, or type of work), not enumerate tasks.
+- Prefer framing (“what kind of month this was”) over listing activities.
+- Keep the Overview close to the Omni notes wording and intent, with light cleanup only.
+- Length limits still apply (based on verbosity mode).
+
+Main KPIs selection rules:
+- The Main KPIs section must be a flat bullet list (no tier labels or subheadings).
+- If organic revenue, purchases/transactions, conversion rate, or average order value (AOV) are present in INSIGHT_MODEL.data_signals, they MUST be included.
+- Treat these organic commerce KPIs as authoritative and client-safe when present.
+- Do NOT substitute SEO visibility metrics (GSC clicks, impressions, CTR, average position) in place of organic commerce KPIs when commerce KPIs are available.
+- If multiple organic commerce KPIs are present, prioritize them before adding any supporting SEO visibility metrics.
+- Prefer organic-only metrics when available. If sitewide metrics are used, label them clearly.
+- Follow section bullet limits strictly to avoid KPI overload unless explicitly overridden by Special Instructions.
+
+Top Opportunities section rules (additive):
+- Add a section called "Top Opportunities" directly under the Main KPIs section.
+- Source this section from the existing GSC opportunity data in INSIGHT_MODEL (high impressions + low CTR queries and pages).
+- Include two short lists:
+  - Queries (Top 5)
+  - Pages (Top 5)
+- Each item should include the identifier (query or page) plus impressions and CTR (and avg position if available).
+- Keep this section strictly factual and scannable; do not add narrative paragraphs.
+- Do not repeat the same query or page already used as a specific example elsewhere in the report unless unavoidable.
+
+Key Highlights section intent:
+- Use this section to communicate what is most important for the client to know happened this month.
+- Focus on informational significance, not exhaustive coverage.
+- Avoid listing routine or process-only tasks unless they meaningfully affected delivery, data quality, or next steps.
+
+Wins & Progress section rules:
+- This section should mix execution wins with early performance validation.
+- Primary source: Omni work summary wins (completed or clearly in progress).
+- Secondary source (optional, max 1–2 bullets): notable non-KPI performance signals from INSIGHT_MODEL (e.g., page-level or query-level movers, CTR improvements, early visibility gains).
+- Performance wins must:
+  - Relate to areas that were worked on or prioritized during the month.
+  - Avoid duplicating metrics already listed in Main KPIs.
+  - Be framed as directional signals, not outcomes or attribution.
+- Do not include revenue, purchases, or conversion rate claims in this section unless explicitly stated in Omni notes.
+- If no meaningful performance wins exist, include only work wins.
+
+Insight synthesis rules (additive):
+- If the INSIGHT_MODEL reveals a clear, meaningful pattern or signal, surface ONE short consultant-style insight.
+- Insights should synthesize across signals (e.g., work focus + opportunity + timing), not restate a single metric.
+- Keep the insight to ONE sentence.
+- Do not imply causation; use cautious language such as "signals", "suggests", "sets up", or "we’ll watch for".
+- Prefer insights that explain sequencing, prioritization, or context rather than outcomes.
+- Placement:
+  - Do NOT place insight sentences in the Monthly Overview if they require metrics.
+  - Place the insight in Key Highlights or Wins & Progress (not both).
+
+Work and performance context:
+- Performance metrics and completed or ongoing work may be referenced together when relevant (outside the Monthly Overview).
+- Use neutral, professional language such as "alongside", "while", or "provides baseline context".
+- Tracking fixes should be framed as improving data clarity and measurement accuracy, not performance.
+
+Structural deduplication rule:
+- Each major work item or theme should be described in detail in only one primary section.
+- Other sections may reference the theme only if adding a materially different dimension (e.g., blocker, dependency, or performance signal).
+- Avoid restating the same work item across Overview, Key Highlights, Wins & Progress, and Outstanding sections.
+
+Anti-filler / single-home enforcement (critical):
+- Each Omni work item or concept may appear in ONLY ONE section as a primary item.
+- Do NOT reuse the same work item across multiple sections by paraphrasing it to fit the section.
+- Rewording the same idea does NOT count as adding new information.
+- If there are fewer distinct wins or highlights this month, prefer fewer bullets over stretching the same concept to fill space.
+
+Screenshot-to-section association:
+- If you reference or summarize insight from a screenshot in any section, you MUST assign that screenshot to the SAME section via image_captions[].suggested_section.
+- If screenshots show GSC page or query movers (tables of URLs or queries with click gains), include one brief bullet in Wins & Progress summarizing 2–4 examples, and assign those screenshots to wins_progress with a concise caption naming examples.
+- If a screenshot is a KPI trend chart or KPI tiles, assign it to main_kpis.
+
+Verbosity control:
+Adjust wording based on CONTEXT.verbosity_level. Do NOT add new sections in any mode.
+- Quick scan (default):
+  - Monthly Overview: max 2–3 sentences.
+  - Focus on the most important items; drop routine maintenance unless it was a major focus.
+  - Bullets should be short and scannable.
+- Standard:
+  - Monthly Overview: 3–4 sentences.
+  - Bullets may include a short explanatory clause where helpful.
+- Deep dive:
+  - Provide additional context inside existing bullets (max one extra sentence per bullet).
+  - Do not add extra bullets or sections.
+
+Noise filtering:
+- Do not include "reporting about reporting" unless it materially affected delivery.
+- Deduplicate repeated items across sections.
+
+Output requirements:
+- Output MUST be valid JSON only and must match the provided schema exactly.
+- Do not include markdown, commentary, or explanatory text.
+"""
+
+    if fmt == "full":
+        prompt = (
+            "Create a monthly SEO update email draft.\n\n"
+            f"CONTEXT:\n{json.dumps(payload, indent=2)}\n\n"
+            f"OUTPUT SCHEMA:\n{json.dumps(schema, indent=2)}"
+        )
+        return system, prompt
+
+    compact = (",", ":")
+    context = draft_prompt_context(payload, "compact")
+    prompt = (
+        "Create a monthly SEO update email draft.\n\n"
+        f"CONTEXT:\n{json.dumps(context, ensure_ascii=False, separators=compact, default=str)}\n\n"
+        f"OUTPUT SCHEMA:\n{json.dumps(schema, ensure_ascii=False, separators=compact)}"
+    )
+    return system + "\n" + DIGEST_LEGEND, prompt
+
+
+def _draft_input(payload: dict, image_triplets: List[Tuple[str, bytes, str]], prompt_format: Optional[str]) -> list:
+    """Responses API `input` for the draft call: system prompt, user prompt and screenshots."""
+    with span("draft_prompt", images=len(image_triplets or [])) as sp:
+        system, prompt = build_draft_prompt(payload, prompt_format)
+
+        content = [{"type":"input_text","text":prompt}]
+        # Attach screenshots with filenames so the model can reliably map file_name -> image.
+        for fn, b, mt in (image_triplets or []):
+            content.append({"type":"input_text","text": f"Screenshot filename: {fn}"})
+            content.append({"type":"input_image","image_url": _image_data_url_for_model(b, mt)})
+        sp.set(chars=len(prompt) + len(system), format=(prompt_format or DRAFT_PROMPT_FORMAT))
+    return [{"role":"system","content":system},{"role":"user","content":content}]
+
+
+def gpt_generate_email(client: "OpenAI", model: str, payload: dict, image_triplets: List[Tuple[str, bytes, str]],
+                       prompt_format: Optional[str] = None) -> Tuple[dict, str]:
+    resp = _responses_create(
+        client,
+        purpose="draft",
+        timeout_s=DRAFT_CALL_TIMEOUT_S,
+        model=model,
+        input=_draft_input(payload, image_triplets, prompt_format),
+        temperature=0.25,
+    )
+    raw = resp.output_text or ""
+    with span("draft_parse", chars=len(raw)):
+        data = _safe_json_load(raw)
+    return (data if isinstance(data, dict) else {"_parse_failed": True, "_error": "No JSON"}), raw
+
+
+# Expected JSON type of each draft section; a streamed field of another type fails the attempt early.
+_DRAFT_FIELD_TYPES = {
+    "subject": str, "monthly_overview": str, "dashthis_line": str, "top_opportunities": dict,
+    "main_kpis": list, "key_highlights": list, "wins_progress": list, "blockers": list,
+    "completed_tasks": list, "outstanding_tasks": list, "image_captions": list,
+}
+
+
+def _validate_draft_field(key: str, value: Any) -> None:
+    expected = _DRAFT_FIELD_TYPES.get(key)
+    if expected is not None and not isinstance(value, expected):
+        raise MalformedJsonStream(f"Draft field '{key}' should be {expected.__name__}, got {type(value).__name__}")
+
+
+def gpt_generate_email_stream(client: "OpenAI", model: str, payload: dict, image_triplets: List[Tuple[str, bytes, str]],
+                              on_field: Optional[Callable[[str, Any], None]] = None,
+                              on_retry: Optional[Callable[[], None]] = None,
+                              prompt_format: Optional[str] = None) -> Tuple[dict, str]:
+    """gpt_generate_email over a streamed response.
+
+    on_field(key, value) is called as each top-level section of the draft JSON completes,
+    so the UI can show the subject and overview long before the whole draft is written.
+    A stream that stops looking like the draft object (prose, broken JSON, a section of
+    the wrong type, truncation) is abandoned and retried as soon as that is visible;
+    on_retry() is called before the retry re-sends fields from the start.
+    Returns (email_json, raw_model_output) like gpt_generate_email.
+    """
+    t0 = time.perf_counter()
+    first_field_ms: List[float] = []
+
+    def _on_field(key: str, value: Any) -> None:
+        if not first_field_ms:
+            first_field_ms.append(round((time.perf_counter() - t0) * 1000.0, 1))
+        if on_field is not None:
+            on_field(key, value)
+
+    parser = IncrementalJsonObject(on_field=_on_field, validate=_validate_draft_field, on_reset=on_retry)
+    try:
+        _responses_stream(
+            client,
+            parser,
+            purpose="draft",
+            timeout_s=DRAFT_STREAM_IDLE_TIMEOUT_S,
+            model=model,
+            input=_draft_input(payload, image_triplets, prompt_format),
+            temperature=0.25,
+        )
+    except MalformedJsonStream:
+        # Retries exhausted: fall back to the lenient parse of whatever arrived.
+        pass
+    raw = parser.text
+    with span("draft_parse", chars=len(raw), streamed=True, first_field_ms=first_field_ms[0] if first_field_ms else None):
+        data = dict(parser.fields) if parser.done else _safe_json_load(raw)
+    return (data if isinstance(data, dict) else {"_parse_failed": True, "_error": "No JSON"}), raw
+
+
+def generate_monthly_email_draft(client: "OpenAI", model: str, payload: dict, image_triplets: List[Tuple[str, bytes, str]]) -> Tuple[dict, str]:
+    """Backward-compatible wrapper expected by the UI.
+
+    Returns (email_json, raw_model_output).
+    """
+    return gpt_generate_email(client=client, model=model, payload=payload, image_triplets=image_triplets)
@@ -0,0 +1,143 @@
+"""Evidence extraction pass (structured, high-confidence evidence from uploads)."""
+
+import json
+import re
+from typing import TYPE_CHECKING, Dict, Optional, List, Tuple, Any
+
+if TYPE_CHECKING:  # the SDK is only needed by callers that construct a client
+    from openai import OpenAI
+
+from .images import _image_data_url_for_model
+from .llm import _responses_create
+from .packing import pack_supporting_context
+from .tracing import span
+
+
+# This app uses a two-step process:
+# 1) Evidence extraction: parse uploads + produce a structured, high-confidence evidence summary.
+# 2) Writing: generate the email draft using Omni notes as primary narrative + the evidence summary as support.
+
+EVIDENCE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "main_kpis": {"type": "array", "items": {"type": "object", "properties": {
+            "metric": {"type": "string"},
+            "value": {"type": "string"},
+            "delta": {"type": "string"},
+            "period": {"type": "string"},
+            "evidence_ref": {"type": "string"},
+            "confidence": {"type": "string"},
+        }, "required": ["metric","value","evidence_ref","confidence"], "additionalProperties": False}},
+        "noteworthy_wins": {"type": "array", "items": {"type": "object", "properties": {
+            "claim": {"type": "string"},
+            "why_it_matters": {"type": "string"},
+            "evidence_ref": {"type": "string"},
+            "confidence": {"type": "string"},
+        }, "required": ["claim","evidence_ref","confidence"], "additionalProperties": False}},
+        "risks_or_anomalies": {"type": "array", "items": {"type": "object", "properties": {
+            "claim": {"type": "string"},
+            "context": {"type": "string"},
+            "evidence_ref": {"type": "string"},
+            "confidence": {"type": "string"},
+        }, "required": ["claim","evidence_ref","confidence"], "additionalProperties": False}},
+        "movers": {"type": "array", "items": {"type": "object", "properties": {
+            "entity_type": {"type": "string"},  # page|query
+            "entity": {"type": "string"},
+            "movement": {"type": "string"},
+            "evidence_ref": {"type": "string"},
+            "confidence": {"type": "string"},
+        }, "required": ["entity_type","entity","evidence_ref","confidence"], "additionalProperties": False}},
+        "work_to_results_links": {"type": "array", "items": {"type": "object", "properties": {
+            "work_item": {"type": "string"},
+            "observed_signal": {"type": "string"},
+            "language": {"type": "string"},  # suggested cautious phrasing
+            "evidence_ref": {"type": "string"},
+            "confidence": {"type": "string"},
+        }, "required": ["work_item","observed_signal","evidence_ref","confidence"], "additionalProperties": False}},
+        "notes": {"type": "array", "items": {"type": "string"}},
+    },
+    "required": ["main_kpis","noteworthy_wins","risks_or_anomalies","movers","work_to_results_links","notes"],
+    "additionalProperties": False,
+}
+
+EVIDENCE_SYSTEM_PROMPT = """You are a meticulous SEO analyst.
+Task: Extract HIGH-CONFIDENCE evidence from supporting_context (documents/tables) and provided screenshots.
+Return ONLY JSON matching the schema.
+
+Rules:
+- Be comprehensive: attempt to pull the most important KPIs and notable changes.
+- Only include claims you can ground in evidence. Every item MUST include evidence_ref pointing to filename and page/sheet when possible.
+- Confidence must be one of: High, Medium, Low. Prefer High only when numbers/labels are explicit.
+- Do not editorialize. Do not write an email. Do not mention limitations like 'in this workspace'.""".strip()
+
+def run_evidence_extraction(client: "OpenAI", model: str, omni_notes: str, supporting_context: Dict[str, Any],
+                            image_parts_for_model: List[Tuple[str, bytes, str]], token_budget: Optional[int] = None) -> Dict[str, Any]:
+    """Structured evidence from the uploads. supporting_context is packed into token_budget
+    (default EVIDENCE_TOKEN_BUDGET, see packing.py); the packing report is returned under "_packing".
+    """
+    with span("evidence_payload") as sp:
+        packed, packing = pack_supporting_context(supporting_context, token_budget)
+        supporting_json = json.dumps(packed, ensure_ascii=False, separators=(",", ":"))
+        sp.set(chars=len(supporting_json), tokens=packing["packed_tokens"], original_tokens=packing["original_tokens"],
+               dropped=len(packing["dropped"]), images=len(image_parts_for_model or []))
+    result = _extract_evidence(client, model, omni_notes, supporting_json, image_parts_for_model)
+    if isinstance(result, dict):
+        result["_packing"] = packing
+    return result
+
+
+def _extract_evidence(client: "OpenAI", model: str, omni_notes: str, supporting_json: str, image_parts_for_model: List[Tuple[str, bytes, str]]) -> Dict[str, Any]:
+    user_text = f"""Omni notes (for context only; do not invent results):
+{omni_notes}
+
+Supporting context (parsed from uploads):
+{supporting_json}
+
+Now extract evidence per schema.""".strip()
+
+    content = [{"type": "input_text", "text": user_text}]
+    # Attach images (downscaled + re-encoded by _prepare_image_for_model) for extraction
+    for name, b, mt in image_parts_for_model:
+        # Provide filename BEFORE the image so the model can reliably map file_name -> image.
+        content.append({"type": "input_text", "text": f"Image filename: {name}"})
+        content.append({"type": "input_image", "image_url": _image_data_url_for_model(b, mt)})
+
+        # Call the model. Some OpenAI SDK versions do not support `response_format=` for responses.create.
+    # We therefore ask for strict JSON in the prompt and then parse best-effort.
+    try:
+        resp = _responses_create(
+            client,
+            purpose="evidence",
+            model=model,
+            input=[
+                {"role": "system", "content": EVIDENCE_SYSTEM_PROMPT},
+                {"role": "user", "content": content},
+            ],
+        )
+    except TypeError:
+        resp = _responses_create(
+            client,
+            purpose="evidence",
+            model=model,
+            input=[
+                {"role": "system", "content": EVIDENCE_SYSTEM_PROMPT},
+                {"role": "user", "content": content},
+            ],
+        )
+
+    raw = getattr(resp, "output_text", "") or ""
+    if not raw:
+        return {"main_kpis": [], "noteworthy_signals": {"positive": [], "negative": [], "neutral": []},
+                "page_movers": [], "query_movers": [], "work_to_results_links": [], "notes": ["No output_text"]}
+
+    # Best-effort JSON extraction
+    m = re.search(r"\{[\s\S]*\}", raw)
+    if not m:
+        return {"main_kpis": [], "noteworthy_signals": {"positive": [], "negative": [], "neutral": []},
+                "page_movers": [], "query_movers": [], "work_to_results_links": [], "notes": ["No JSON found in output"]}
+
+    try:
+        return json.loads(m.group(0))
+    except Exception:
+        return {"main_kpis": [], "noteworthy_signals": {"positive": [], "negative": [], "neutral": []},
+                "page_movers": [], "query_movers": [], "work_to_results_links": [], "notes": ["JSON parse failed"]}
@@ -0,0 +1,99 @@
+"""Input fingerprints: per-upload SHA-256 digests and a combined analysis signature."""
+
+import hashlib
+from typing import Dict, Optional, List, Any
+
+from .caching import _LruCache
+
+
+# -----------------------------
+# Input fingerprints
+# -----------------------------
+# SHA-256 per upload, computed once per upload event. Digests are memoized on the
+# UploadedFile object and by Streamlit's file_id (a new id is issued for every upload,
+# so a same-size replacement is always re-hashed). Fingerprints are stable across
+# processes and safe to use as cache keys.
+
+FINGERPRINT_CHUNK_BYTES = 1024 * 1024
+_UPLOAD_DIGESTS = _LruCache(1024)
+
+
+def _sha256_stream(f: Any) -> str:
+    h = hashlib.sha256()
+    buf = None
+    try:
+        buf = f.getbuffer() if hasattr(f, "getbuffer") else None
+    except Exception:
+        buf = None
+    if buf is not None:
+        mv = memoryview(buf)
+        try:
+            for off in range(0, len(mv), FINGERPRINT_CHUNK_BYTES):
+                h.update(mv[off:off + FINGERPRINT_CHUNK_BYTES])
+        finally:
+            mv.release()
+        return h.hexdigest()
+    if isinstance(f, (bytes, bytearray)):
+        h.update(f)
+        return h.hexdigest()
+    data = f.getvalue() if hasattr(f, "getvalue") else b""
+    h.update(data or b"")
+    return h.hexdigest()
+
+
+def _upload_digest(f: Any) -> str:
+    """SHA-256 hex digest of an upload (UploadedFile, BytesIO or bytes)."""
+    if isinstance(f, (bytes, bytearray)):
+        return _sha256_stream(f)
+    digest = getattr(f, "_rb_sha256", None)
+    if digest:
+        return digest
+    file_id = getattr(f, "file_id", None)
+    if file_id:
+        digest = _UPLOAD_DIGESTS.get(str(file_id))
+    if not digest:
+        digest = _sha256_stream(f)
+        if file_id:
+            _UPLOAD_DIGESTS.put(str(file_id), digest)
+    try:
+        setattr(f, "_rb_sha256", digest)
+    except Exception:
+        pass
+    return digest
+
+
+def _input_fingerprint(omni_notes: str, uploaded_files: List[Any]) -> Dict[str, Any]:
+    """Fingerprint the analysis inputs.
+
+    Returns {"notes": sha256 of the stripped notes, "files": {name: sha256},
+    "signature": combined sha256 over notes + ordered (name, digest) pairs}.
+    """
+    notes_digest = hashlib.sha256((omni_notes or "").strip().encode("utf-8")).hexdigest()
+    files: Dict[str, str] = {}
+    h = hashlib.sha256()
+    h.update(f"notes:{notes_digest}".encode("utf-8"))
+    for f in (uploaded_files or []):
+        name = getattr(f, "name", "uploaded_file")
+        try:
+            digest = _upload_digest(f)
+        except Exception:
+            digest = ""
+        files[name] = digest
+        h.update(f"\nfile:{name}:{digest}".encode("utf-8"))
+    return {"notes": notes_digest, "files": files, "signature": h.hexdigest()}
+
+
+def _changed_inputs(previous: Optional[Dict[str, Any]], current: Dict[str, Any]) -> Dict[str, Any]:
+    """Diff two _input_fingerprint results: which files were added/changed/removed and whether notes changed."""
+    prev_files = dict((previous or {}).get("files") or {})
+    cur_files = dict((current or {}).get("files") or {})
+    return {
+        "notes_changed": (previous or {}).get("notes") != (current or {}).get("notes"),
+        "added": [n for n in cur_files if n not in prev_files],
+        "changed": [n for n in cur_files if n in prev_files and prev_files[n] != cur_files[n]],
+        "removed": [n for n in prev_files if n not in cur_files],
+    }
+
+
+def _insight_signature(omni_notes: str, uploaded_files: List[Any]) -> str:
+    return _input_fingerprint(omni_notes, uploaded_files)["signature"]
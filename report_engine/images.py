@@ -0,0 +1,106 @@
+"""Image preparation for model payloads (downscale + re-encode once, LRU cached)."""
+
+import base64
+import hashlib
+import io
+import os
+import threading
+from collections import OrderedDict
+from typing import Tuple
+
+from .lazy import optional_module
+from .tracing import span
+
+
+# -----------------------------
+# Image preparation (model payloads)
+# -----------------------------
+# Screenshots are downscaled and re-encoded once before any model call. The originals
+# are still used for the .eml / preview so the client-facing email keeps full quality.
+
+MODEL_IMAGE_MAX_EDGE = int(os.getenv("MODEL_IMAGE_MAX_EDGE", "2048") or 2048)
+MODEL_IMAGE_QUALITY = int(os.getenv("MODEL_IMAGE_QUALITY", "85") or 85)
+PREPARED_IMAGE_CACHE_MAX_BYTES = 96 * 1024 * 1024
+
+_PREPARED_IMAGE_CACHE: "OrderedDict[str, Tuple[bytes, str]]" = OrderedDict()
+_PREPARED_IMAGE_CACHE_BYTES = 0
+_PREPARED_IMAGE_LOCK = threading.Lock()
+
+
+def _encode_image_for_model(img_bytes: bytes, mime: str) -> Tuple[bytes, str]:
+    """Cap the longest edge, drop metadata and re-encode (WebP, else JPEG).
+
+    Falls back to the original bytes when Pillow is unavailable, the image cannot be
+    decoded, or re-encoding would not make the payload smaller.
+    """
+    Image = optional_module("PIL.Image")
+    features = optional_module("PIL.features")
+    if Image is None or features is None:
+        return img_bytes, mime
+    try:
+        with Image.open(io.BytesIO(img_bytes)) as im:
+            im.load()
+            w, h = im.size
+            longest = max(w, h)
+            resized = longest > MODEL_IMAGE_MAX_EDGE
+            if resized:
+                scale = MODEL_IMAGE_MAX_EDGE / float(longest)
+                im = im.resize((max(1, int(w * scale)), max(1, int(h * scale))), Image.LANCZOS)
+            # Flatten transparency onto white; screenshots rarely need alpha.
+            if im.mode in ("RGBA", "LA", "P"):
+                im = im.convert("RGBA")
+                bg = Image.new("RGB", im.size, (255, 255, 255))
+                bg.paste(im, mask=im.split()[-1])
+                im = bg
+            elif im.mode != "RGB":
+                im = im.convert("RGB")
+
+            out = io.BytesIO()
+            # Saving without exif/icc/info strips metadata.
+            if features.check("webp"):
+                im.save(out, format="WEBP", quality=MODEL_IMAGE_QUALITY, method=4)
+                out_mime = "image/webp"
+            else:
+                im.save(out, format="JPEG", quality=MODEL_IMAGE_QUALITY, optimize=True)
+                out_mime = "image/jpeg"
+            prepared = out.getvalue()
+        if not resized and len(prepared) >= len(img_bytes):
+            return img_bytes, mime
+        return prepared, out_mime
+    except Exception:
+        return img_bytes, mime
+
+
+def _prepare_image_for_model(img_bytes: bytes, mime: str) -> Tuple[bytes, str]:
+    """Return (bytes, mime) ready for an input_image part, cached by content hash.
+
+    Each distinct image is prepared once per process and reused by screenshot
+    summaries, evidence extraction and draft generation.
+    """
+    global _PREPARED_IMAGE_CACHE_BYTES
+    if not img_bytes:
+        return img_bytes, mime
+    key = hashlib.sha256(img_bytes).hexdigest() + f":{MODEL_IMAGE_MAX_EDGE}:{MODEL_IMAGE_QUALITY}"
+    with _PREPARED_IMAGE_LOCK:
+        hit = _PREPARED_IMAGE_CACHE.get(key)
+        if hit is not None:
+            _PREPARED_IMAGE_CACHE.move_to_end(key)
+            return hit
+
+    with span("image_prepare", bytes=len(img_bytes)) as sp:
+        prepared = _encode_image_for_model(img_bytes, mime)
+        sp.set(out_bytes=len(prepared[0]))
+
+    with _PREPARED_IMAGE_LOCK:
+        if key not in _PREPARED_IMAGE_CACHE:
+            _PREPARED_IMAGE_CACHE[key] = prepared
+            _PREPARED_IMAGE_CACHE_BYTES += len(prepared[0])
+            while _PREPARED_IMAGE_CACHE_BYTES > PREPARED_IMAGE_CACHE_MAX_BYTES and len(_PREPARED_IMAGE_CACHE) > 1:
+                _, (old_b, _) = _PREPARED_IMAGE_CACHE.popitem(last=False)
+                _PREPARED_IMAGE_CACHE_BYTES -= len(old_b)
+    return prepared
+
+
+def _image_data_url_for_model(img_bytes: bytes, mime: str) -> str:
+    b, mt = _prepare_image_for_model(img_bytes, mime)
+    return f"data:{mt};base64," + base64.b64encode(b).decode("utf-8")
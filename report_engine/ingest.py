@@ -0,0 +1,391 @@
+"""Upload ingestion: per-file parsing (PDF, DOCX, text, Excel, CSV) into the supporting context."""
+
+import hashlib
+import io
+import os
+import time
+from typing import Dict, Optional, List, Tuple, Any
+
+
+from .utils import (
+    MAX_DOC_CHARS_PER_FILE,
+    MAX_SUPPORTING_TEXT_CHARS,
+    MAX_TABLE_COLS,
+    MAX_TABLE_ROWS,
+    _clamp,
+    _json_deepcopy,
+    _normalize_ws,
+    _safe_decode_text,
+)
+from .caching import REPORT_CACHE_DIR, _JsonDirStore, _TieredCache, _env_flag
+from .fingerprint import _upload_digest
+from .lazy import has_module, require_module
+from .tables import has_table, put_table, table_ref
+from .csv_reader import read_csv_export
+from .pdf import PdfDocument, _extract_pdf_section_tables, _extract_pdf_tables, _extract_pdf_text
+from .signals import _detect_gsc_table_kind, _is_signal_table
+from .tracing import span
+
+
+def _extract_docx_text(data: bytes) -> str:
+    try:
+        docx = require_module("docx")
+        d = docx.Document(io.BytesIO(data))
+        paras = [p.text for p in d.paragraphs if (p.text or "").strip()]
+        return _normalize_ws("\n".join(paras))
+    except Exception:
+        return ""
+
+def _df_preview(df) -> Dict[str, Any]:
+    try:
+        pd = require_module("pandas")
+        df2 = df.copy()
+        if df2.shape[1] > MAX_TABLE_COLS:
+            df2 = df2.iloc[:, :MAX_TABLE_COLS]
+        truncated = df2.shape[0] > MAX_TABLE_ROWS
+        dfp = df2.head(MAX_TABLE_ROWS) if truncated else df2
+        headers = [str(c) for c in dfp.columns.tolist()]
+        rows = dfp.fillna("").astype(str).values.tolist()
+        # light numeric stats for hinting
+        numeric_cols = [c for c in df2.columns if pd.api.types.is_numeric_dtype(df2[c])]
+        stats = {}
+        for c in numeric_cols[:12]:
+            col = df2[c].dropna()
+            if len(col) == 0:
+                continue
+            stats[str(c)] = {"min": float(col.min()), "max": float(col.max()), "mean": float(col.mean())}
+        return {
+            "shape": [int(df.shape[0]), int(df.shape[1])],
+            "headers": headers,
+            "rows": rows,
+            "truncated": bool(truncated),
+            "numeric_stats": stats,
+        }
+    except Exception as e:
+        return {"error": str(e)}
+
+
+# Excel reader: "auto" uses python-calamine (Rust, much faster on large sheets) when it
+# is installed, else openpyxl in read-only mode; any other value is passed to pandas.
+EXCEL_ENGINE = (os.getenv("EXCEL_ENGINE", "auto") or "auto").strip().lower()
+
+
+def _open_excel(pd, data: bytes):
+    """pd.ExcelFile over the upload, trying the preferred engine first, then pandas' default."""
+    engines = []
+    if EXCEL_ENGINE == "auto":
+        if has_module("python_calamine"):
+            engines.append("calamine")
+        engines.append("openpyxl")
+    else:
+        engines.append(EXCEL_ENGINE)
+    for engine in engines:
+        try:
+            return pd.ExcelFile(io.BytesIO(data), engine=engine)
+        except Exception:
+            continue
+    return pd.ExcelFile(io.BytesIO(data))
+
+
+def _excel_sheet_rows(xl, sheet: str) -> Optional[int]:
+    """Data rows in a sheet from the workbook's stored dimensions, without reading it (None if unknown)."""
+    try:
+        if xl.engine == "openpyxl":
+            rows = xl.book[sheet].max_row
+        elif xl.engine == "calamine":
+            rows = xl.book.get_sheet_by_name(sheet).height
+        else:
+            return None
+        return int(rows) - 1 if rows else None
+    except Exception:
+        return None
+
+# Bump when any per-file extractor changes its output shape or heuristics.
+PARSE_CACHE_VERSION = "4"
+PARSE_CACHE_MAX_ITEMS = int(os.getenv("PARSE_CACHE_MAX_ITEMS", "64") or 64)
+PARSE_DISK_CACHE = _env_flag("PARSE_DISK_CACHE", True)
+PARSE_DISK_CACHE_MAX_BYTES = int(os.getenv("PARSE_DISK_CACHE_MAX_BYTES", str(256 * 1024 * 1024)) or 256 * 1024 * 1024)
+
+_PARSE_CACHE = _TieredCache(
+    PARSE_CACHE_MAX_ITEMS,
+    disk=_JsonDirStore(os.path.join(REPORT_CACHE_DIR, "parsed-uploads"), PARSE_DISK_CACHE_MAX_BYTES) if PARSE_DISK_CACHE else None,
+)
+
+
+def _parse_cache_key(name: str, digest: str, has_pandas: bool) -> str:
+    # Entries embed the filename, so it is part of the key alongside the content hash.
+    h = hashlib.sha256()
+    h.update(f"{digest}|{name}|{PARSE_CACHE_VERSION}|pandas={int(bool(has_pandas))}".encode("utf-8"))
+    return h.hexdigest()
+
+
+def _parse_upload_uncached(name: str, data: bytes, has_pandas: bool, digest: Optional[str] = None) -> Dict[str, Any]:
+    """Parse one non-image upload into its share of the supporting context.
+
+    Returns a partial context ({documents, tables, notes, _by_file, pdf_timings, chars,
+    unsupported}) that build_supporting_context merges in upload order. Spreadsheet
+    and CSV tables also register their full DataFrame in the table store; the entry's
+    "table_ref" points at it.
+    """
+    lower = name.lower()
+    part: Dict[str, Any] = {"documents": [], "tables": [], "notes": [], "_by_file": {}, "pdf_timings": {}, "chars": 0, "unsupported": False}
+
+    if lower.endswith(".pdf"):
+        # Open the PDF once; all three extractors share the parsed pages.
+        with PdfDocument(data) as pdf_doc:
+            t0 = time.perf_counter()
+            with span("pdf_text") as sp:
+                t = _extract_pdf_text(pdf_doc)
+                sp.set(pages=pdf_doc.page_count, chars=len(t))
+            pdf_doc.add_timing("stage_text", t0)
+            if t.strip():
+                t = _clamp(t, MAX_DOC_CHARS_PER_FILE)
+                part["documents"].append({"filename": name, "type": "pdf", "text": t})
+                part["_by_file"].setdefault(name, {"documents": [], "tables": []})["documents"].append({"type": "pdf", "text": t})
+                part["chars"] += len(t)
+            else:
+                part["notes"].append(f"Could not extract text from PDF: {name}")
+
+            # Best-effort table extraction (helps with PDF exports that contain embedded tables)
+            t0 = time.perf_counter()
+            try:
+                with span("pdf_tables") as sp:
+                    pdf_tables = _extract_pdf_tables(pdf_doc)
+                    sp.set(tables=len(pdf_tables or []))
+                for pv in (pdf_tables or []):
+                    # Represent each table like an Excel sheet preview
+                    page = pv.get("page", "")
+                    t_i = pv.get("table_index", "")
+                    sheet_label = f"PDF page {page} table {t_i}".strip()
+                    part["tables"].append({"filename": name, "type": "pdf", "sheet": sheet_label, "table": pv})
+                    part["_by_file"].setdefault(name, {"documents": [], "tables": []})["tables"].append({"type": "pdf", "sheet": sheet_label, "table": pv})
+            except Exception:
+                pass
+            pdf_doc.add_timing("stage_tables", t0)
+
+            # Best-effort "clean tables per section" extraction for dashboard-style PDFs (includes OCR fallback)
+            t0 = time.perf_counter()
+            try:
+                with span("pdf_section_tables") as sp:
+                    section_tables = _extract_pdf_section_tables(pdf_doc, enable_ocr=True)
+                    sp.set(tables=len(section_tables or []), ocr_pages=pdf_doc.stats.get("ocr_pages_done", 0))
+                for pv in (section_tables or []):
+                    section = pv.get("section", "PDF")
+                    table_name = pv.get("table_name", "Table")
+                    sheet_label = f"{section} - {table_name}".strip(" -")
+                    part["tables"].append({"filename": name, "type": "pdf", "sheet": sheet_label, "table": pv})
+                    part["_by_file"].setdefault(name, {"documents": [], "tables": []})["tables"].append({"type": "pdf", "sheet": sheet_label, "table": pv})
+            except Exception:
+                pass
+            pdf_doc.add_timing("stage_section_tables", t0)
+
+        part["pdf_timings"][name] = dict(pdf_doc.timings)
+        part["_by_file"].setdefault(name, {"documents": [], "tables": []})["timings_ms"] = part["pdf_timings"][name]
+        if pdf_doc.stats:
+            part["_by_file"][name]["ocr"] = dict(pdf_doc.stats)
+        if pdf_doc.stats.get("ocr_budget_exhausted"):
+            part["notes"].append(
+                f"OCR time budget reached for {name}: "
+                f"{pdf_doc.stats.get('ocr_pages_done', 0)} of {pdf_doc.stats.get('ocr_pages_requested', 0)} pages recovered."
+            )
+        return part
+
+    if lower.endswith(".docx"):
+        t = _extract_docx_text(data)
+        if t.strip():
+            t = _clamp(t, MAX_DOC_CHARS_PER_FILE)
+            part["documents"].append({"filename": name, "type": "docx", "text": t})
+            part["_by_file"].setdefault(name, {"documents": [], "tables": []})["documents"].append({"type": "docx", "text": t})
+            part["chars"] += len(t)
+        else:
+            part["notes"].append(f"Could not extract text from DOCX: {name}")
+        return part
+
+    if lower.endswith((".txt", ".md", ".log")):
+        t = _normalize_ws(_safe_decode_text(data))
+        if t.strip():
+            t = _clamp(t, MAX_DOC_CHARS_PER_FILE)
+            part["documents"].append({"filename": name, "type": "text", "text": t})
+            part["_by_file"].setdefault(name, {"documents": [], "tables": []})["documents"].append({"type": "text", "text": t})
+            part["chars"] += len(t)
+        return part
+
+    if lower.endswith((".xlsx", ".xls", ".xlsm")):
+        if not has_pandas:
+            part["notes"].append(f"Cannot parse Excel (pandas/openpyxl not installed): {name}")
+            return part
+        try:
+            pd = require_module("pandas")
+            xl = _open_excel(pd, data)
+
+            added_any = False
+            for sheet in xl.sheet_names[:12]:
+                try:
+                    with span("excel_sheet", sheet=sheet) as sp:
+                        # openpyxl's stored dimensions must be read before pandas touches the sheet (it resets them).
+                        total = _excel_sheet_rows(xl, sheet) if xl.engine == "openpyxl" else None
+                        # Phase 1: header row only, enough to classify the sheet.
+                        headers = [str(c) for c in xl.parse(sheet_name=sheet, nrows=0).columns][:MAX_TABLE_COLS]
+                        kind = _detect_gsc_table_kind(sheet, headers)
+                        # Phase 2: full load only for sheets that feed data signals. The rest
+                        # (Filters, notes tabs, ...) are only ever shown as previews, so just
+                        # the preview rows are read; their numeric_stats cover those rows.
+                        ref = None
+                        if _is_signal_table(headers):
+                            df = xl.parse(sheet_name=sheet)
+                            preview = _df_preview(df)
+                            ref = put_table(table_ref(digest or _upload_digest(data), "xlsx", sheet), df)
+                        else:
+                            df = xl.parse(sheet_name=sheet, nrows=MAX_TABLE_ROWS + 1)
+                            preview = _df_preview(df)
+                            if preview.get("truncated"):
+                                # Row count from the sheet's dimensions (None when the file does not store them).
+                                total = total if total is not None else _excel_sheet_rows(xl, sheet)
+                                preview["shape"][0] = total if (total or 0) > len(df) else None
+                        sp.set(rows=len(df), kind=kind or "", full_load=bool(ref))
+                    entry: Dict[str, Any] = {"type": "xlsx", "sheet": sheet, "table": preview, "_gsc_kind": kind}
+                    if ref:
+                        entry["table_ref"] = ref
+                    else:
+                        entry["_preview_only"] = True
+                    part["tables"].append({"filename": name, **entry})
+                    part["_by_file"].setdefault(name, {"tables": []})["tables"].append(_json_deepcopy(entry))
+                    added_any = True
+                except Exception as se:
+                    part["notes"].append(f"Excel sheet parse error for {name} / {sheet}: {se}")
+
+            if not added_any:
+                part["notes"].append(f"Excel parsed but no sheets could be read: {name}")
+
+        except Exception as e:
+            part["notes"].append(f"Excel parse error for {name}: {e}")
+        return part
+
+    
+    if lower.endswith(".csv"):
+        # CSV exports (including GA4) often include metadata lines before the header.
+        if not has_pandas:
+            part["notes"].append(f"Cannot parse CSV (pandas not installed): {name}")
+            # Still register the file so it appears in UI/debug
+            part["_by_file"].setdefault(name, {"documents": [], "tables": [], "notes": []})["notes"].append(
+                "CSV parse skipped: pandas not installed"
+            )
+            return part
+
+        part["_by_file"].setdefault(name, {"documents": [], "tables": [], "notes": []})
+
+        try:
+            with span("csv_read") as sp:
+                frames, csv_info = read_csv_export(data)
+                sp.set(rows=sum(len(df) for df in frames), sections=len(frames))
+            part["_by_file"][name]["csv"] = csv_info
+            for k, df in enumerate(frames):
+                # Clean up unnamed columns
+                df = df.loc[:, [c for c in df.columns if str(c).strip() and not str(c).lower().startswith("unnamed")]]
+                # The first section keeps the single-table ref and labels; extra GA4 sections are numbered.
+                parts = ("csv",) if k == 0 else ("csv", k + 1)
+                ref = put_table(table_ref(digest or _upload_digest(data), *parts), df)
+                preview = _df_preview(df)
+                entry = {"filename": name, "type": "csv", "table": preview, "table_ref": ref}
+                sheet = "CSV" if k == 0 else f"CSV section {k + 1}"
+                if k:
+                    entry["sheet"] = sheet
+                part["tables"].append(entry)
+                part["_by_file"][name]["tables"].append({"type": "csv", "sheet": sheet, "table": _json_deepcopy(preview), "table_ref": ref})
+        except Exception as e:
+            err = f"CSV parse error for {name}: {e}"
+            part["notes"].append(err)
+            part["_by_file"][name]["notes"].append(err)
+        return part
+    msg = f"Unsupported file type for parsing: {name}"
+    part["notes"].append(msg)
+    part["_by_file"].setdefault(name, {"documents": [], "tables": [], "notes": []})["notes"].append(msg)
+    part["unsupported"] = True
+    return part
+
+
+def _parse_upload(name: str, data: bytes, has_pandas: bool, digest: Optional[str] = None) -> Tuple[Dict[str, Any], bool]:
+    """Cached _parse_upload_uncached. Returns (part, cache_hit).
+
+    Parsing is deterministic given the bytes, so results are keyed by content hash and
+    kept in memory and on disk; re-analysis after editing notes skips re-parsing and OCR.
+    Results from an OCR pass cut short by its time budget are not cached.
+    """
+    digest = digest or _upload_digest(data)
+    key = _parse_cache_key(name, digest, has_pandas)
+    cached = _PARSE_CACHE.get(key)
+    # A hit is only usable while the full tables it points at are still in the table store.
+    if isinstance(cached, dict) and all(has_table(t.get("table_ref")) for t in (cached.get("tables") or []) if t.get("table_ref")):
+        return _json_deepcopy(cached), True
+
+    part = _parse_upload_uncached(name, data, has_pandas, digest=digest)
+    ocr = (part.get("_by_file", {}).get(name) or {}).get("ocr") or {}
+    if not ocr.get("ocr_budget_exhausted"):
+        _PARSE_CACHE.put(key, _json_deepcopy(part))
+    return part, False
+
+
+def build_supporting_context(uploaded_files: List[Any]) -> Dict[str, Any]:
+    """Parse non-image uploads into structured evidence for the model."""
+    supporting: Dict[str, Any] = {"documents": [], "tables": [], "notes": [], "_by_file": {}}
+    total_chars = 0
+    pdf_timings: Dict[str, Dict[str, float]] = {}
+    cache_hits: List[str] = []
+
+    # Lazy availability checks (resolved once per process by the import registry)
+    has_pandas = has_module("pandas")
+    has_pdfplumber = has_module("pdfplumber")
+    has_pypdf2 = has_module("PyPDF2")
+    has_docx = has_module("docx")
+    has_fitz = has_module("fitz")
+
+    for f in uploaded_files or []:
+        name = getattr(f, "name", "uploaded_file")
+        lower = name.lower()
+
+        # Skip images here
+        if lower.endswith((".png", ".jpg", ".jpeg", ".webp")):
+            continue
+
+        data = f.getvalue() if hasattr(f, "getvalue") else (f.read() if hasattr(f, "read") else b"")
+        try:
+            if hasattr(f, "seek"):
+                f.seek(0)
+        except Exception:
+            pass
+
+        try:
+            digest = _upload_digest(f)
+        except Exception:
+            digest = None
+        with span("parse_file", file=name, bytes=len(data)) as sp:
+            part, hit = _parse_upload(name, data, has_pandas, digest=digest)
+            sp.set(cache_hit=hit, tables=len(part.get("tables") or []), chars=int(part.get("chars") or 0))
+        if hit:
+            cache_hits.append(name)
+        supporting["documents"].extend(part.get("documents") or [])
+        supporting["tables"].extend(part.get("tables") or [])
+        supporting["notes"].extend(part.get("notes") or [])
+        supporting["_by_file"].update(part.get("_by_file") or {})
+        pdf_timings.update(part.get("pdf_timings") or {})
+        total_chars += int(part.get("chars") or 0)
+
+        if part.get("unsupported") and total_chars > MAX_SUPPORTING_TEXT_CHARS:
+            supporting["notes"].append("Supporting context truncated due to size limits.")
+            break
+
+    supporting["_extraction_stats"] = {
+        "documents_count": len(supporting.get("documents", [])),
+        "tables_count": len(supporting.get("tables", [])),
+        "notes_count": len(supporting.get("notes", [])),
+        "has_pandas": has_pandas,
+        "has_pdfplumber": has_pdfplumber,
+        "has_pypdf2": has_pypdf2,
+        "has_docx": has_docx,
+        "has_fitz": has_fitz,
+        # Per-PDF stage breakdown (ms): backend opens, per-backend page work, OCR, and extractor totals
+        "pdf_timings_ms": pdf_timings,
+        # Files served from the parse cache (timings above are from the original parse)
+        "parse_cache_hits": cache_hits,
+    }
+    return supporting
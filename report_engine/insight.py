@@ -0,0 +1,632 @@
+"""Insight model: Omni work context (Layer C), interpretive links (Layer D) and assembly."""
+
+import re
+from typing import TYPE_CHECKING, Dict, Optional, List, Tuple, Any
+
+if TYPE_CHECKING:  # the SDK is only needed by callers that construct a client
+    from openai import OpenAI
+
+from .utils import _json_deepcopy
+from .signals import _build_data_signals
+from .screenshots import _build_seo_observations_from_screens, _summarize_screenshots
+from .tracing import span
+
+
+def _parse_work_context_from_omni(omni_notes: str) -> Dict[str, Any]:
+    """Deterministically parse Omni work summaries into structured work context.
+
+    Mandatory + first-class behavior:
+    - If omni_notes is non-empty, we always attempt to parse it.
+    - We NEVER rely on an LLM for this parsing.
+    - We handle common Omni formats with numbered headings + subsection headings.
+
+    Output buckets:
+      completed[], in_progress[], planned[], blockers[], comms[], themes[]
+    Each item is a dict with:
+      item, type, targets, assignee, details, evidence_ref, confidence
+
+    Notes on robustness:
+    - Omni exports sometimes contain footnote lines like "1" / "2" on their own line.
+    - Some lines may have leading bullets/Unicode dashes/zero-width chars. We normalize.
+    - If we cannot detect a "Work Tasks" heading, we still parse when we see status headings
+      like "Completed" / "In Progress / Ongoing" / "Added but Not Yet Started".
+    """
+    out = {
+        "completed": [],
+        "in_progress": [],
+        "planned": [],
+        "blockers": [],
+        "comms": [],
+        "themes": [],
+    }
+
+    raw = (omni_notes or "")
+    if not raw.strip():
+        return out
+
+    # --- normalization helpers ---
+    def _norm(s: str) -> str:
+        if s is None:
+            return ""
+        s = s.replace("\u00a0", " ").replace("\u200b", "").replace("\ufeff", "")
+        return s
+
+    def clean_line(s: str) -> str:
+        s = _norm(s).strip()
+        # strip leading bullets/dashes/quotes/odd punctuation
+        s = re.sub(r"^[^\w]+", "", s).strip()
+        return s
+
+    # split + clean
+    lines = [clean_line(l) for l in _norm(raw).splitlines()]
+    # drop empties and footnote-only numeric lines
+    lines2 = []
+    for l in lines:
+        if not l:
+            continue
+        if re.fullmatch(r"\d+", l):
+            continue
+        lines2.append(l)
+
+    # --- tag/target extraction ---
+    def tag_type(text: str) -> str:
+        low = (text or "").lower()
+        if any(k in low for k in ["redirect", "sitemap", "crawl", "index", "canonical", "search functionality", "catalog search", "ftp"]):
+            return "technical"
+        if any(k in low for k in ["content", "faq", "duplicate", "category page", "top-level category", "copy", "unique content"]):
+            return "content"
+        if any(k in low for k in ["analytics", "ga4", "google analytics", "baseline", "tracking", "measurement"]):
+            return "analytics"
+        if any(k in low for k in ["schema", "structured data", "merchant", "made in", "country of origin"]):
+            return "schema"
+        if any(k in low for k in ["sort", "filter", "ux", "discoverability", "best-selling", "highest-rated"]):
+            return "cro"
+        return "other"
+
+    _TARGET_MAP = [
+        ("faq", ["faq"]),
+        ("duplicate content", ["duplicate", "duplication"]),
+        ("sitemap", ["sitemap"]),
+        ("redirects", ["redirect"]),
+        ("canonicals", ["canonical"]),
+        ("indexing", ["index", "indexing"]),
+        ("crawlability", ["crawl", "crawlability"]),
+        ("catalog search", ["catalog search", "search functionality", "site search", "vehicle categories", "search inconsistencies"]),
+        ("category pages", ["category page", "top-level category", "category pages"]),
+        ("ga baseline", ["baseline traffic", "baseline view", "google analytics", "ga4"]),
+        ("made in usa", ["made in u.s.a", "made in usa", "made in u.s.a.", "made in : usa", "country of origin"]),
+        ("product schema", ["schema", "structured data"]),
+        ("sorting", ["default sorting", "best-selling", "highest-rated"]),
+        ("product list", ["product list", "top-selling", "top selling"]),
+    ]
+
+    def extract_targets(text: str) -> str:
+        low = (text or "").lower()
+        hits = []
+        for label, keys in _TARGET_MAP:
+            if any(k in low for k in keys):
+                hits.append(label)
+        # Also capture explicit URLs if present
+        urls = re.findall(r"(https?://\S+)", text or "")
+        hits.extend([u.rstrip(").,;") for u in urls])
+        # de-dupe
+        seen=set(); out_t=[]
+        for t in hits:
+            if t not in seen:
+                out_t.append(t); seen.add(t)
+        return ", ".join(out_t)
+
+    # --- section routing ---
+    def is_numbered_heading(l: str) -> bool:
+        return bool(re.match(r"^\d+\.\s+", l))
+
+    def heading_bucket(line: str) -> Optional[str]:
+        low = (line or "").lower().strip().strip(":")
+        if low == "completed":
+            return "completed"
+        if low in ["in progress", "ongoing", "in progress / ongoing", "in progress/ongoing"]:
+            return "in_progress"
+        if re.search(r"(added but not yet started|not yet started|planned|upcoming)", low):
+            return "planned"
+        if "blocker" in low or "constraint" in low:
+            return "blockers"
+        if "communication" in low or ("client" in low and "commun" in low) or ("updates" in low and "client" in low):
+            return "comms"
+        if "notes" in low or "context" in low or "strategic direction" in low or "status overview" in low or "key highlights" in low or "wins" in low:
+            return "themes"
+        return None
+
+    # Parse a task block (task line + optional assignee + optional detail lines)
+    def consume_task(i: int, bucket: str) -> int:
+        task = lines2[i]
+        assignee = ""
+        details = []
+        j = i + 1
+
+        if j < len(lines2) and re.match(r"^(assignee|owner)\s*:\s*", lines2[j], re.I):
+            assignee = re.sub(r"^(assignee|owner)\s*:\s*", "", lines2[j], flags=re.I).strip()
+            j += 1
+
+        while j < len(lines2) and len(details) < 6:
+            nxt = lines2[j]
+            hb = heading_bucket(nxt)
+            # stop if we hit a status bucket header or major numbered section
+            if hb in ["completed", "in_progress", "planned", "blockers", "themes", "comms"]:
+                break
+            if is_numbered_heading(nxt):
+                break
+            if nxt.endswith(":") and bucket in ["blockers", "themes", "comms"]:
+                break
+            # ignore stray numeric lines already filtered
+            details.append(nxt)
+            j += 1
+
+        out[bucket].append({
+            "item": task,
+            "type": tag_type(task),
+            "targets": extract_targets(task),
+            "assignee": assignee,
+            "details": " ".join(details).strip(),
+            "evidence_ref": "Omni notes",
+            "confidence": "High" if bucket in ["completed", "in_progress", "planned"] else "Medium",
+        })
+        return j
+
+    current_major = "themes"
+    current_status = None
+    in_work_tasks = False
+    in_blockers = False
+    in_notes_context = False
+
+    i = 0
+    while i < len(lines2):
+        l = lines2[i]
+        low = l.lower()
+
+        # Detect major headings even if not numbered
+        if "work tasks" in low or "work tasks (by status)" in low:
+            in_work_tasks = True
+            in_blockers = False
+            in_notes_context = False
+            current_major = "themes"
+            current_status = None
+            i += 1
+            continue
+
+        # Switch numbered sections (but keep robustness)
+        if is_numbered_heading(l):
+            # treat as major section heading text beyond "N. "
+            low2 = re.sub(r"^\d+\.\s+", "", low).strip()
+            if "work tasks" in low2:
+                in_work_tasks = True
+                in_blockers = False
+                in_notes_context = False
+                current_major = "themes"
+                current_status = None
+            elif "blockers" in low2 or "constraints" in low2:
+                in_work_tasks = False
+                in_blockers = True
+                in_notes_context = False
+                current_major = "blockers"
+                current_status = None
+            elif "notes" in low2 or "context" in low2:
+                in_work_tasks = False
+                in_blockers = False
+                in_notes_context = True
+                current_major = "themes"
+                current_status = None
+            else:
+                in_work_tasks = False
+                in_blockers = False
+                in_notes_context = False
+                current_major = "themes"
+                current_status = None
+            i += 1
+            continue
+
+        hb = heading_bucket(l)
+
+        # Fallback: if we see a status header anywhere, assume we're in work tasks
+        if hb in ["completed", "in_progress", "planned"] and not in_work_tasks:
+            in_work_tasks = True
+            current_status = hb
+            i += 1
+            continue
+
+        if in_work_tasks and hb in ["completed", "in_progress", "planned"]:
+            current_status = hb
+            i += 1
+            continue
+
+        # In blockers/notes sections: subsection labels ending with ":" become items
+        if hb in ["blockers", "themes", "comms"] and not in_work_tasks:
+            current_major = hb
+            i += 1
+            continue
+
+        if in_work_tasks and current_status:
+            i = consume_task(i, current_status)
+            continue
+
+        # Outside work tasks: collect themes/comms/blockers lines as items
+        target_bucket = current_major
+        if any(k in low for k in ["monthly email", "quarterly", "progress updates", "email summaries", "quarterly reports", "monthly emails"]):
+            target_bucket = "comms"
+
+        # Prefer section labels and meaningful statements
+        if len(l) >= 12:
+            out[target_bucket].append({
+                "item": l,
+                "type": tag_type(l),
+                "targets": extract_targets(l),
+                "assignee": "",
+                "details": "",
+                "evidence_ref": "Omni notes",
+                "confidence": "Medium",
+            })
+
+        i += 1
+
+    # Drop duplicates within each bucket (same item text)
+    for k in out.keys():
+        seen=set()
+        dedup=[]
+        for it in out[k]:
+            key=(it.get("item","").strip().lower(), it.get("assignee","").strip().lower())
+            if key in seen:
+                continue
+            seen.add(key)
+            dedup.append(it)
+        out[k]=dedup
+
+    return out
+
+def _match_overlap(text: str, candidates: List[str]) -> bool:
+    t = (text or "").lower()
+    for c in candidates:
+        c2 = (c or "").strip().lower()
+        if not c2:
+            continue
+        if c2 in t:
+            return True
+    return False
+
+def _normalize_tokens(text: str) -> List[str]:
+    t = re.sub(r"[^a-z0-9:/._-]+", " ", (text or "").lower()).strip()
+    toks = [x for x in t.split() if x and len(x) > 2]
+    return toks
+
+def _best_overlap(a: str, candidates: List[str]) -> Tuple[Optional[str], float]:
+    """Return best candidate overlap by token Jaccard; used for cautious linking."""
+    a_toks = set(_normalize_tokens(a))
+    if not a_toks:
+        return None, 0.0
+    best = (None, 0.0)
+    for c in candidates or []:
+        c_toks = set(_normalize_tokens(c))
+        if not c_toks:
+            continue
+        j = len(a_toks & c_toks) / max(1, len(a_toks | c_toks))
+        if j > best[1]:
+            best = (c, j)
+    return best
+
+def _collect_signal_strings(data_signals: Dict[str, Any]) -> Dict[str, List[str]]:
+    # URLs
+    top_pages = [str(x.get("item") or "") for x in (data_signals.get("top_pages") or []) if isinstance(x, dict)]
+    opp_pages = [str(x.get("item") or "") for x in (data_signals.get("opportunity_pages") or []) if isinstance(x, dict)]
+    urls = [u for u in top_pages + opp_pages if u]
+    # Queries/topics
+    top_queries = [str(x.get("item") or "") for x in (data_signals.get("top_queries") or []) if isinstance(x, dict)]
+    opp_queries = [str(x.get("item") or "") for x in (data_signals.get("opportunity_queries") or []) if isinstance(x, dict)]
+    queries = [q for q in top_queries + opp_queries if q]
+    return {"urls": urls, "queries": queries}
+
+def _collect_observation_strings(seo_obs: Dict[str, Any]) -> List[Tuple[str, Dict[str, Any]]]:
+    obs = []
+    for k in ["technical_issues", "content_ux_issues", "serp_market_notes", "other_findings"]:
+        for o in (seo_obs.get(k) or []):
+            if isinstance(o, dict):
+                s = " ".join([str(o.get("what") or ""), str(o.get("details") or ""), str(o.get("where") or "")]).strip()
+                if s:
+                    obs.append((s, o))
+    return obs
+
+def _build_interpretive_links(work_context: Dict[str, Any], data_signals: Dict[str, Any], seo_obs: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Create cautious links between work items and observed signals/issues.
+
+    Rules:
+    - Medium confidence requires explicit overlap (URL, query, or strong token overlap with an observation).
+    - Otherwise Low confidence and relationship defaults to no_clear_signal_yet.
+    - Never claim causality; suggested language stays cautious.
+    """
+    sig = _collect_signal_strings(data_signals)
+    obs = _collect_observation_strings(seo_obs)
+
+    links: List[Dict[str, Any]] = []
+
+    def add_link(work_item: Dict[str, Any], related: str, relationship: str, confidence: str, refs: List[str], suggested: str) -> None:
+        links.append({
+            "work_item": work_item.get("item") if isinstance(work_item, dict) else str(work_item),
+            "related_signal": related,
+            "relationship": relationship,
+            "confidence": confidence,
+            "evidence_refs": refs,
+            "suggested_language": suggested,
+        })
+
+    for bucket in ["completed", "in_progress", "planned"]:
+        for w in (work_context.get(bucket) or []):
+            if not isinstance(w, dict):
+                w = {"item": str(w)}
+            wi = (w.get("item") or "").strip()
+            if not wi:
+                continue
+
+            # 1) Link to screenshot/PDF observations
+            best_ob, score = _best_overlap(wi + " " + (w.get("targets") or ""), [s for s, _ in obs])
+            if best_ob and score >= 0.18:
+                # find the corresponding observation dict for refs
+                ob_dict = None
+                for s_txt, o in obs:
+                    if s_txt == best_ob:
+                        ob_dict = o
+                        break
+                relationship = "may_be_contributing_to" if bucket == "completed" else "aligned_with"
+                confidence = "Medium" if bucket == "completed" else "Low"
+                refs = [x for x in [
+                    (w.get("evidence_ref") or ""),
+                    (ob_dict.get("evidence_ref") if ob_dict else ""),
+                ] if x]
+                add_link(
+                    w,
+                    related=f"Matches observed SEO finding: {(ob_dict.get('what') if ob_dict else best_ob)[:140]}",
+                    relationship=relationship,
+                    confidence=confidence,
+                    refs=refs,
+                    suggested=(
+                        "This work item aligns with an observed issue; it may help reduce the underlying problem once completed."
+                        if bucket != "completed" else
+                        "Given this work was completed, monitor whether related pages/queries stabilize or improve over the next reporting window."
+                    ),
+                )
+                continue
+
+            # 2) Link to GSC URLs/queries when overlap is explicit
+            best_url, u_score = _best_overlap(wi + " " + (w.get("targets") or ""), sig.get("urls") or [])
+            best_q, q_score = _best_overlap(wi, sig.get("queries") or [])
+            if (best_url and u_score >= 0.22) or (best_q and q_score >= 0.22):
+                if best_url and u_score >= q_score:
+                    related = f"Related page appears in performance data: {best_url}"
+                    rel_ref = "Data signals: pages"
+                else:
+                    related = f"Related query/topic appears in performance data: {best_q}"
+                    rel_ref = "Data signals: queries"
+                relationship = "aligned_with" if bucket != "completed" else "may_be_contributing_to"
+                confidence = "Medium" if bucket == "completed" else "Low"
+                refs = [x for x in [w.get("evidence_ref") or "", rel_ref] if x]
+                add_link(
+                    w,
+                    related=related,
+                    relationship=relationship,
+                    confidence=confidence,
+                    refs=refs,
+                    suggested=(
+                        "This work may be contributing to movement in the related page/query; continue monitoring for sustained change."
+                        if bucket == "completed" else
+                        "Once this work is completed, monitor the related page/query for measurable movement."
+                    ),
+                )
+                continue
+
+            # 3) No clear signal yet (still include for narrative completeness, but keep it cautious and low)
+            add_link(
+                w,
+                related="No explicit overlap found with current performance signals or captured SEO observations.",
+                relationship="no_clear_signal_yet",
+                confidence="Low",
+                refs=[x for x in [w.get("evidence_ref") or ""] if x],
+                suggested="No clear signal yet; keep this item in view and reassess after it has been live through a full reporting cycle.",
+            )
+
+    return links
+
+def _build_insight_notes(supporting_context: Any, data_signals: Dict[str, Any], seo_obs: Dict[str, Any], work_context: Dict[str, Any], screen_summaries: List[Dict[str, Any]]) -> List[str]:
+    """Create transparent, reviewer-friendly notes about what was (and wasn't) available."""
+    notes: List[str] = []
+
+    # Omni/work presence
+    wc_counts = sum(len(work_context.get(k) or []) for k in ["completed", "in_progress", "planned"])
+    if wc_counts:
+        notes.append(f"Omni work summary parsed into {wc_counts} work items (Completed/In progress/Planned). Review for accuracy before drafting.")
+    else:
+        if (supporting_context.get("omni_notes") if isinstance(supporting_context, dict) else ""):
+            notes.append("Omni notes were provided but no work items were detected. Consider formatting tasks under Completed / In Progress / Planned headings.")
+
+    # Screenshot presence
+    if screen_summaries:
+        issues_n = sum(len((s.get("issues_found") or [])) for s in screen_summaries if isinstance(s, dict))
+        stats_n = sum(len((s.get("stats_found") or [])) for s in screen_summaries if isinstance(s, dict))
+        if issues_n or stats_n:
+            notes.append(f"Screenshots analyzed: {len(screen_summaries)} (found {stats_n} stat(s) and {issues_n} potential issue(s)).")
+        else:
+            notes.append(f"Screenshots analyzed: {len(screen_summaries)} (no clear stats/issues detected).")
+
+    # Data availability
+    if not (data_signals.get("kpis") or data_signals.get("top_pages") or data_signals.get("top_queries")):
+        notes.append("No strong performance signals detected from uploads. If available, add GSC/GA4 exports (queries/pages) for better data-driven insights.")
+
+    # Interpretive links density
+    if (work_context.get("completed") or work_context.get("in_progress") or work_context.get("planned")) and not (data_signals.get("top_pages") or data_signals.get("top_queries")):
+        notes.append("Work-to-results linking is limited without page/query performance exports.")
+
+    return notes
+
+TABULAR_UPLOAD_EXTS = (".pdf", ".csv", ".xlsx", ".xls", ".xlsm")
+IMAGE_UPLOAD_EXTS = (".png", ".jpg", ".jpeg", ".webp")
+
+
+def build_insight_model(
+    client: "OpenAI",
+    model: str,
+    omni_notes: str,
+    supporting_context: Dict[str, Any],
+    image_triplets: List[Tuple[str, bytes, str]],
+    progress_cb: Optional[Any] = None,
+    max_concurrency: Optional[int] = None,
+    previous_insight: Optional[Dict[str, Any]] = None,
+    changes: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """Build the layered insight model.
+
+    With previous_insight (the last unedited model output) and changes (from
+    _changed_inputs), layers whose inputs did not change are reused: Layer A only
+    reruns if a tabular upload was added/changed/removed, screenshot summaries only
+    for new or replaced images, and Layer C only if the notes changed. Layer D and
+    the notes are always rebuilt from the current layers.
+    """
+    prev = previous_insight if isinstance(previous_insight, dict) and previous_insight else None
+    touched = set()
+    if prev is not None and changes is not None:
+        touched = set(changes.get("added") or []) | set(changes.get("changed") or []) | set(changes.get("removed") or [])
+    else:
+        prev = None
+
+    # Layer A
+    if prev is not None and "data_signals" in prev and not any(n.lower().endswith(TABULAR_UPLOAD_EXTS) for n in touched):
+        data_signals = _json_deepcopy(prev.get("data_signals") or {})
+    else:
+        with span("data_signals", tables=len((supporting_context or {}).get("tables") or [])):
+            data_signals = _build_data_signals(supporting_context)
+
+    # Screenshots summarization (Layer B input); concurrent, upload order preserved
+    reusable: Dict[str, Dict[str, Any]] = {}
+    if prev is not None:
+        for item in (prev.get("screenshot_summaries") or []):
+            fn = item.get("file_name") if isinstance(item, dict) else None
+            if fn and fn not in touched:
+                reusable[fn] = item
+    pending = [t for t in (image_triplets or []) if t[0] not in reusable]
+    fresh = _summarize_screenshots(
+        client, model, pending, max_concurrency=max_concurrency, progress_cb=progress_cb,
+    ) if pending else []
+    fresh_by_name = {t[0]: fresh[i] for i, t in enumerate(pending) if i < len(fresh)}
+    screen_summaries = [
+        _json_deepcopy(reusable[t[0]]) if t[0] in reusable else fresh_by_name.get(t[0], {})
+        for t in (image_triplets or [])
+    ]
+
+    if prev is not None and "seo_observations" in prev and not any(n.lower().endswith(IMAGE_UPLOAD_EXTS) for n in touched):
+        seo_observations = _json_deepcopy(prev.get("seo_observations") or {})
+    else:
+        with span("seo_observations"):
+            seo_observations = _build_seo_observations_from_screens(screen_summaries)
+
+    # Layer C
+    if prev is not None and "work_context" in prev and not changes.get("notes_changed"):
+        work_context = _json_deepcopy(prev.get("work_context") or {})
+    else:
+        with span("work_context", chars=len(omni_notes or "")):
+            work_context = _parse_work_context_from_omni(omni_notes)
+    # Ensure Omni notes are present in supporting_context for transparent debug/notes
+    if isinstance(supporting_context, dict):
+        supporting_context["omni_notes"] = (omni_notes or "").strip()
+
+    # Layer D
+    with span("interpretive_links") as sp:
+        interpretive_links = _build_interpretive_links(work_context, data_signals, seo_observations)
+        sp.set(links=len(interpretive_links))
+
+    insight = {
+        "data_signals": data_signals,
+        "seo_observations": seo_observations,
+        "work_context": work_context,
+        "interpretive_links": interpretive_links,
+        "notes": _build_insight_notes(supporting_context, data_signals, seo_observations, work_context, screen_summaries),
+        "debug": {
+            "parsed_docs": supporting_context.get("_extraction_stats", {}).get("documents_count", 0),
+            "parsed_tables": supporting_context.get("_extraction_stats", {}).get("tables_count", 0),
+            "parsed_notes": 1 if (omni_notes or "").strip() else 0,
+            "screenshots": len(image_triplets or []),
+        },
+        "screenshot_summaries": screen_summaries,
+    }
+    if prev is not None:
+        insight["debug"]["incremental"] = {
+            "changed_files": sorted(touched),
+            "notes_changed": bool(changes.get("notes_changed")),
+            "screenshots_summarized": len(pending),
+        }
+    return insight
+
+
+# data_signals keys only the insight editor writes, keyed by upload file name.
+_PER_FILE_SIGNAL_KEYS = ("document_kpis", "source_table_edits")
+
+
+def _merge_insight_edits(
+    original: Dict[str, Any],
+    current: Dict[str, Any],
+    fresh: Dict[str, Any],
+    depth: int = 2,
+    changes: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """Carry user edits forward onto a freshly built insight.
+
+    A section (top-level key, and one level below for dict sections) keeps the
+    edited value from current when the fresh value equals the previous original,
+    i.e. re-analysis did not change it. Changed sections take the fresh value.
+    screenshot_summaries are merged per file_name, and the per-file editor tables
+    in data_signals (document_kpis, source_table_edits) are kept for every file
+    that changes (from _changed_inputs) does not list as added/changed/removed.
+    """
+    original = original if isinstance(original, dict) else {}
+    current = current if isinstance(current, dict) else {}
+    merged: Dict[str, Any] = {}
+    for k, v in (fresh or {}).items():
+        if k in original and k in current and original.get(k) == v:
+            merged[k] = _json_deepcopy(current.get(k))
+        elif k == "screenshot_summaries" and isinstance(v, list):
+            merged[k] = _merge_by_file_name(original.get(k), current.get(k), v)
+        elif depth > 1 and isinstance(v, dict) and isinstance(original.get(k), dict) and isinstance(current.get(k), dict):
+            merged[k] = _merge_insight_edits(original[k], current[k], v, depth - 1)
+        else:
+            merged[k] = _json_deepcopy(v)
+
+    signals, edited = merged.get("data_signals"), current.get("data_signals")
+    if depth > 1 and isinstance(signals, dict) and isinstance(edited, dict):
+        touched = set()
+        if changes is not None:
+            touched = set(changes.get("added") or []) | set(changes.get("changed") or []) | set(changes.get("removed") or [])
+        for key in _PER_FILE_SIGNAL_KEYS:
+            per_file = edited.get(key)
+            if not isinstance(per_file, dict):
+                continue
+            kept = signals.get(key) if isinstance(signals.get(key), dict) else {}
+            for fname, value in per_file.items():
+                if fname not in touched:
+                    kept[fname] = _json_deepcopy(value)
+            if kept:
+                signals[key] = kept
+    return merged
+
+
+def _merge_by_file_name(original: Any, current: Any, fresh: List[Any]) -> List[Any]:
+    """Per-item merge of a list of {file_name: ...} dicts, in fresh order."""
+
+    def _by_name(items: Any) -> Dict[str, Any]:
+        return {
+            item["file_name"]: item
+            for item in (items if isinstance(items, list) else [])
+            if isinstance(item, dict) and item.get("file_name")
+        }
+
+    orig_by, cur_by = _by_name(original), _by_name(current)
+    out: List[Any] = []
+    for item in fresh:
+        fn = item.get("file_name") if isinstance(item, dict) else None
+        if fn and fn in orig_by and fn in cur_by and orig_by[fn] == item:
+            out.append(_json_deepcopy(cur_by[fn]))
+        else:
+            out.append(_json_deepcopy(item))
+    return out
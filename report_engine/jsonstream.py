@@ -0,0 +1,185 @@
+"""Incremental parsing of a streamed JSON object, one top-level field at a time.
+
+The draft is a single JSON object whose top-level fields are the email sections.
+IncrementalJsonObject is fed the text deltas of a streamed response and calls
+on_field(key, value) the moment a field's value is complete (strings, lists and
+objects at their closing character, numbers and literals at the next delimiter), so
+the UI can show the subject and overview while the model is still writing the tasks.
+
+It also fails fast: anything that cannot be the start or continuation of the object
+(prose instead of JSON, a stray character between fields, a value that does not
+parse, a field rejected by `validate`) raises MalformedJsonStream as soon as it is
+seen, rather than after the whole response has arrived. A ```json fence around the
+object and a short preamble (MAX_PREAMBLE_CHARS) are tolerated, as _safe_json_load
+tolerates them.
+"""
+
+import json
+from typing import Callable, Dict, Optional, List, Any
+
+
+# Non-JSON text allowed before the opening brace (e.g. "Here is the draft:").
+MAX_PREAMBLE_CHARS = 120
+
+_WS = " \t\r\n"
+_CLOSERS = {"}": "{", "]": "["}
+
+
+class MalformedJsonStream(ValueError):
+    """The streamed text is not (or no longer) a well-formed JSON object."""
+
+
+class IncrementalJsonObject:
+    """Feeds streamed text; reports each completed top-level field of one JSON object.
+
+    Used as the `consumer` of llm._responses_stream: reset() before every attempt,
+    feed(delta) per text delta, finish() when the stream ends (raises if the object
+    was never closed).
+    """
+
+    def __init__(self, on_field: Optional[Callable[[str, Any], None]] = None,
+                 validate: Optional[Callable[[str, Any], None]] = None,
+                 on_reset: Optional[Callable[[], None]] = None):
+        self.on_field = on_field
+        self.validate = validate
+        self.on_reset = on_reset
+        self._clear()
+
+    def _clear(self) -> None:
+        self.text = ""
+        self.fields: Dict[str, Any] = {}
+        self.current_key: Optional[str] = None
+        self.done = False
+        self._pos = 0
+        self._state = "preamble"
+        self._in_string = False
+        self._escape = False
+        self._stack: List[str] = []
+        self._start = 0
+
+    def reset(self) -> None:
+        """Forget everything (a new attempt starts)."""
+        had_text = bool(self.text)
+        self._clear()
+        if had_text and self.on_reset is not None:
+            self.on_reset()
+
+    def feed(self, delta: str) -> List[str]:
+        """Consume a text delta. Returns the keys completed by it; raises MalformedJsonStream."""
+        if not delta:
+            return []
+        self.text += delta
+        completed: List[str] = []
+        text = self.text
+        i = self._pos
+        n = len(text)
+        while i < n:
+            c = text[i]
+            state = self._state
+
+            if state == "preamble":
+                if c == "{":
+                    self._state = "key_or_end"
+                elif i >= MAX_PREAMBLE_CHARS:
+                    raise MalformedJsonStream(f"No JSON object in the first {MAX_PREAMBLE_CHARS} characters: {text[:60]!r}")
+
+            elif state == "key_or_end":
+                if c == '"':
+                    self._state, self._start, self._in_string = "key", i, True
+                elif c == "}":
+                    self._state, self.done = "done", True
+                elif c not in _WS:
+                    raise self._error(i, "expected a field name")
+
+            elif state == "key":
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+                    self.current_key = json.loads(text[self._start:i + 1])
+                    self._state = "colon"
+
+            elif state == "colon":
+                if c == ":":
+                    self._state = "value_start"
+                elif c not in _WS:
+                    raise self._error(i, "expected ':'")
+
+            elif state == "value_start":
+                if c not in _WS:
+                    if c in ",}]:":
+                        raise self._error(i, "expected a value")
+                    self._state, self._start = "value", i
+                    continue  # re-read this character as part of the value
+
+            elif state == "value":
+                if self._in_string:
+                    if self._escape:
+                        self._escape = False
+                    elif c == "\\":
+                        self._escape = True
+                    elif c == '"':
+                        self._in_string = False
+                        if not self._stack:
+                            completed.append(self._complete(i + 1))
+                            self._state = "after_value"
+                elif c == '"':
+                    self._in_string = True
+                elif c in "{[":
+                    self._stack.append(c)
+                elif c in "}]":
+                    if not self._stack:
+                        if c == "}":
+                            # A number or literal ended by the closing brace.
+                            completed.append(self._complete(i))
+                            self._state, self.done = "done", True
+                        else:
+                            raise self._error(i, "unbalanced ']'")
+                    elif self._stack.pop() != _CLOSERS[c]:
+                        raise self._error(i, f"mismatched '{c}'")
+                    elif not self._stack:
+                        completed.append(self._complete(i + 1))
+                        self._state = "after_value"
+                elif c == "," and not self._stack:
+                    completed.append(self._complete(i))
+                    self._state = "key_or_end"
+
+            elif state == "after_value":
+                if c == ",":
+                    self._state = "key_or_end"
+                elif c == "}":
+                    self._state, self.done = "done", True
+                elif c not in _WS:
+                    raise self._error(i, "expected ',' or '}'")
+
+            # "done": trailing text (a closing fence, whitespace) is ignored.
+            i += 1
+        self._pos = i
+        return completed
+
+    def finish(self) -> Dict[str, Any]:
+        """The parsed object once the stream has ended; raises MalformedJsonStream if it is incomplete."""
+        if not self.done:
+            where = f"inside '{self.current_key}'" if self.current_key else f"after {len(self.fields)} field(s)"
+            raise MalformedJsonStream(f"Stream ended before the JSON object was closed ({where}, {len(self.text)} chars)")
+        return self.fields
+
+    def _complete(self, end: int) -> str:
+        key = self.current_key or ""
+        raw = self.text[self._start:end].strip()
+        try:
+            value = json.loads(raw)
+        except ValueError:
+            raise MalformedJsonStream(f"Field '{key}' is not valid JSON: {raw[:60]!r}") from None
+        if self.validate is not None:
+            self.validate(key, value)
+        self.fields[key] = value
+        self.current_key = None
+        if self.on_field is not None:
+            self.on_field(key, value)
+        return key
+
+    def _error(self, i: int, expected: str) -> MalformedJsonStream:
+        return MalformedJsonStream(f"Malformed JSON at char {i}: {expected}, got {self.text[i:i + 20]!r}")
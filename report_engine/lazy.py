@@ -0,0 +1,135 @@
+"""Lazy module registry: heavy and optional imports happen on first use, timed per module.
+
+Optional extractors (PyMuPDF, pdfplumber, PyPDF2, python-docx, pytesseract, Pillow)
+and the big libraries (pandas, openai) are resolved through optional_module() /
+require_module() instead of top-level or per-call imports. Each module is imported
+once; failures are remembered too, so a missing optional dependency is not looked
+up on sys.path again on every call.
+
+prewarm() imports HEAVY_MODULES on a daemon thread (e.g. after the first page has
+rendered) so the first real use does not pay the import cost. import_report() lists
+what was imported, by whom and how long it took (ms).
+"""
+
+import importlib
+import os
+import sys
+import threading
+import time
+from typing import Dict, Optional, List, Any
+
+
+# Heavy imports deferred at startup, in pre-warm order (most likely needed first).
+HEAVY_MODULES = (
+    "pandas",
+    "openai",
+    "PIL.Image",
+    "fitz",
+    "pdfplumber",
+    "PyPDF2",
+    "docx",
+    "pytesseract",
+)
+
+# Cold-start target for the app's first render (ms); shown next to the import report.
+COLD_START_BUDGET_MS = float(os.getenv("COLD_START_BUDGET_MS", "1500") or 1500)
+
+_LOCK = threading.Lock()
+_MODULES: Dict[str, Any] = {}          # name -> module, or None if the import failed
+_IMPORT_TIMES: Dict[str, Dict[str, Any]] = {}
+_MARKS: Dict[str, float] = {}
+_PREWARM_THREAD: Optional[threading.Thread] = None
+_PROCESS_T0 = time.perf_counter()
+
+
+def _import(name: str, source: str) -> Any:
+    with _LOCK:
+        if name in _MODULES:
+            return _MODULES[name]
+    already = name in sys.modules
+    t0 = time.perf_counter()
+    error = ""
+    try:
+        # importlib serializes concurrent imports of the same module, so a foreground
+        # request simply waits for an in-flight pre-warm import to finish.
+        mod = importlib.import_module(name)
+    except Exception as e:
+        mod = None
+        error = f"{type(e).__name__}: {e}"
+    ms = round((time.perf_counter() - t0) * 1000.0, 2)
+    with _LOCK:
+        if name not in _MODULES:
+            _MODULES[name] = mod
+            _IMPORT_TIMES[name] = {
+                "module": name,
+                "ms": ms,
+                "ok": mod is not None,
+                "source": "preloaded" if already else source,
+                "thread": threading.current_thread().name,
+                "error": error,
+            }
+        return _MODULES[name]
+
+
+def optional_module(name: str) -> Any:
+    """Return the module, or None if it is not installed (or fails to import)."""
+    return _import(name, "lazy")
+
+
+def require_module(name: str) -> Any:
+    """Return the module or raise ImportError with the original failure."""
+    mod = _import(name, "lazy")
+    if mod is None:
+        raise ImportError(f"{name} is not available ({_IMPORT_TIMES.get(name, {}).get('error') or 'import failed'})")
+    return mod
+
+
+def has_module(name: str) -> bool:
+    return optional_module(name) is not None
+
+
+def _prewarm_worker(names: List[str]) -> None:
+    for name in names:
+        try:
+            _import(name, "prewarm")
+        except Exception:
+            pass
+
+
+def prewarm(names: Optional[List[str]] = None) -> Optional[threading.Thread]:
+    """Import heavy modules on a background daemon thread (once per process)."""
+    global _PREWARM_THREAD
+    with _LOCK:
+        if _PREWARM_THREAD is not None:
+            return _PREWARM_THREAD
+        todo = [n for n in (names or HEAVY_MODULES) if n not in _MODULES]
+        _PREWARM_THREAD = threading.Thread(target=_prewarm_worker, args=(todo,), name="import-prewarm", daemon=True)
+    _PREWARM_THREAD.start()
+    return _PREWARM_THREAD
+
+
+def mark(label: str, started: Optional[float] = None) -> float:
+    """Record a startup milestone in ms since `started` (default: when this module was imported).
+
+    The first value recorded for a label is kept, so calling this on every Streamlit
+    rerun still reports the cold start.
+    """
+    ms = round((time.perf_counter() - (_PROCESS_T0 if started is None else started)) * 1000.0, 2)
+    with _LOCK:
+        return _MARKS.setdefault(label, ms)
+
+
+def import_report() -> Dict[str, Any]:
+    """Per-module import timings (slowest first) plus recorded startup milestones."""
+    with _LOCK:
+        rows = sorted((dict(r) for r in _IMPORT_TIMES.values()), key=lambda r: -r["ms"])
+        marks = dict(_MARKS)
+        prewarm_alive = bool(_PREWARM_THREAD is not None and _PREWARM_THREAD.is_alive())
+    return {
+        "modules": rows,
+        "marks": marks,
+        "budget_ms": COLD_START_BUDGET_MS,
+        "prewarm_running": prewarm_alive,
+        "pending": [n for n in HEAVY_MODULES if n not in _MODULES],
+    }
+
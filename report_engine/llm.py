@@ -0,0 +1,188 @@
+"""Model call plumbing shared by every Responses API call (timeouts, retries, backoff)."""
+
+import os
+import time
+from typing import TYPE_CHECKING, Dict, Optional, Any
+
+from .jsonstream import MalformedJsonStream
+from .tracing import span
+from .usage import count_input_images, record_model_call
+
+if TYPE_CHECKING:  # the SDK is only needed by callers that construct a client
+    from openai import OpenAI
+
+
+DEFAULT_MODEL = "gpt-5.2"
+
+# Model call resilience (env-overridable)
+MODEL_CALL_TIMEOUT_S = float(os.getenv("MODEL_CALL_TIMEOUT_S", "120") or 120)
+MODEL_CALL_MAX_RETRIES = int(os.getenv("MODEL_CALL_MAX_RETRIES", "2") or 2)
+MODEL_CALL_BACKOFF_S = 1.5
+# Drafting sends the full insight payload plus screenshots and runs much longer than a summary.
+DRAFT_CALL_TIMEOUT_S = float(os.getenv("DRAFT_CALL_TIMEOUT_S", "600") or 600)
+# Streamed drafts: the longest wait for the next stream event (first token included) before retrying.
+DRAFT_STREAM_IDLE_TIMEOUT_S = float(os.getenv("DRAFT_STREAM_IDLE_TIMEOUT_S", "120") or 120)
+
+
+# Optional cross-thread/cross-process cap on in-flight model calls (e.g. a
+# multiprocessing semaphore shared by batch workers). None means unlimited.
+_MODEL_CALL_GATE: Any = None
+
+
+def set_model_call_gate(gate: Any) -> None:
+    """Install a semaphore-like object (acquire/release) that every model call must hold."""
+    global _MODEL_CALL_GATE
+    _MODEL_CALL_GATE = gate
+
+
+def _is_retryable_model_error(exc: Exception) -> bool:
+    """Timeouts, connection drops, 429s and 5xx are worth retrying; bad requests are not."""
+    status = getattr(exc, "status_code", None)
+    if isinstance(status, int):
+        return status == 429 or status >= 500
+    name = type(exc).__name__
+    return name in {"APITimeoutError", "APIConnectionError", "RateLimitError", "InternalServerError", "TimeoutError", "ConnectionError",
+                    "MalformedJsonStream", "ModelStreamError"}
+
+
+class ModelStreamError(RuntimeError):
+    """A streamed response failed mid-way (error / response.failed event, or no response.completed)."""
+
+
+def _usage_tokens(resp: Any) -> Dict[str, int]:
+    """Input, cached-input and output token counts from a response's usage block ({} if absent)."""
+    usage = getattr(resp, "usage", None)
+    if usage is None:
+        return {}
+    details = getattr(usage, "input_tokens_details", None)
+    return {
+        "input_tokens": int(getattr(usage, "input_tokens", 0) or 0),
+        "cached_tokens": int(getattr(details, "cached_tokens", 0) or 0),
+        "output_tokens": int(getattr(usage, "output_tokens", 0) or 0),
+    }
+
+
+def _responses_create(client: "OpenAI", timeout_s: Optional[float] = None, max_retries: Optional[int] = None,
+                      purpose: str = "", **kwargs) -> Any:
+    """client.responses.create with a per-call timeout and retry + exponential backoff.
+
+    The SDK's own retries are disabled for the call so the timeout bounds each attempt.
+    Raises the last error once retries are exhausted. Token usage, latency and image
+    count are recorded into the active usage meter under `purpose` (see usage.py).
+    """
+    import random
+
+    timeout_s = MODEL_CALL_TIMEOUT_S if timeout_s is None else timeout_s
+    retries = MODEL_CALL_MAX_RETRIES if max_retries is None else max(0, int(max_retries))
+    try:
+        call_client = client.with_options(timeout=timeout_s, max_retries=0)
+    except Exception:
+        call_client = client
+
+    model = kwargs.get("model") or ""
+    images = count_input_images(kwargs.get("input"))
+    t0 = time.perf_counter()
+    attempt = 0
+    with span("model_call", model=model, purpose=purpose, images=images) as sp:
+        while True:
+            gate = _MODEL_CALL_GATE
+            try:
+                if gate is not None:
+                    gate.acquire()
+                try:
+                    resp = call_client.responses.create(**kwargs)
+                finally:
+                    if gate is not None:
+                        gate.release()
+                tokens = _usage_tokens(resp)
+                sp.set(attempts=attempt + 1, **tokens)
+                record_model_call(purpose, model, tokens, time.perf_counter() - t0, images, attempts=attempt + 1)
+                return resp
+            except Exception as e:
+                if attempt >= retries or not _is_retryable_model_error(e):
+                    sp.set(attempts=attempt + 1)
+                    record_model_call(purpose, model, {}, time.perf_counter() - t0, images, attempts=attempt + 1,
+                                      error=f"{type(e).__name__}: {e}")
+                    raise
+                delay = MODEL_CALL_BACKOFF_S * (2 ** attempt)
+                time.sleep(delay + random.uniform(0, delay / 2.0))
+                attempt += 1
+
+
+def _responses_stream(client: "OpenAI", consumer: Any, timeout_s: Optional[float] = None, max_retries: Optional[int] = None,
+                      purpose: str = "", **kwargs) -> Any:
+    """_responses_create with stream=True: output text deltas go to consumer as they arrive.
+
+    consumer has reset() (called before every attempt), feed(delta) and finish() (called
+    when the stream completes). Either may raise MalformedJsonStream (jsonstream.py) to
+    abandon the attempt; like timeouts, 429s and 5xx it is retried, immediately and
+    without waiting for the rest of the stream. The timeout bounds each read, so a
+    stalled stream fails too. Returns the completed response (with usage).
+    """
+    import random
+
+    timeout_s = MODEL_CALL_TIMEOUT_S if timeout_s is None else timeout_s
+    retries = MODEL_CALL_MAX_RETRIES if max_retries is None else max(0, int(max_retries))
+    try:
+        call_client = client.with_options(timeout=timeout_s, max_retries=0)
+    except Exception:
+        call_client = client
+
+    model = kwargs.get("model") or ""
+    images = count_input_images(kwargs.get("input"))
+    t0 = time.perf_counter()
+    attempt = 0
+    with span("model_call", model=model, purpose=purpose, images=images, stream=True) as sp:
+        while True:
+            gate = _MODEL_CALL_GATE
+            stream = None
+            try:
+                if gate is not None:
+                    gate.acquire()
+                try:
+                    consumer.reset()
+                    t_attempt = time.perf_counter()
+                    stream = call_client.responses.create(stream=True, **kwargs)
+                    final = None
+                    first = True
+                    for event in stream:
+                        etype = getattr(event, "type", "")
+                        if etype == "response.output_text.delta":
+                            if first:
+                                sp.set(first_delta_ms=round((time.perf_counter() - t_attempt) * 1000.0, 1))
+                                first = False
+                            consumer.feed(getattr(event, "delta", "") or "")
+                        elif etype == "response.completed":
+                            final = getattr(event, "response", None)
+                        elif etype in ("error", "response.failed", "response.incomplete"):
+                            detail = getattr(event, "message", "") or getattr(getattr(event, "response", None), "error", "") or etype
+                            raise ModelStreamError(f"{etype}: {detail}")
+                    if final is None:
+                        raise ModelStreamError("Stream ended without response.completed")
+                    consumer.finish()
+                finally:
+                    close = getattr(stream, "close", None)
+                    if close is not None:
+                        try:
+                            close()
+                        except Exception:
+                            pass
+                    if gate is not None:
+                        gate.release()
+                tokens = _usage_tokens(final)
+                sp.set(attempts=attempt + 1, **tokens)
+                record_model_call(purpose, model, tokens, time.perf_counter() - t0, images, attempts=attempt + 1)
+                return final
+            except Exception as e:
+                if attempt >= retries or not _is_retryable_model_error(e):
+                    sp.set(attempts=attempt + 1)
+                    record_model_call(purpose, model, {}, time.perf_counter() - t0, images, attempts=attempt + 1,
+                                      error=f"{type(e).__name__}: {e}")
+                    raise
+                if isinstance(e, MalformedJsonStream):
+                    sp.add("malformed_streams")
+                    delay = 0.0
+                else:
+                    delay = MODEL_CALL_BACKOFF_S * (2 ** attempt)
+                time.sleep(delay + random.uniform(0, delay / 2.0))
+                attempt += 1
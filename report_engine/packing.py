@@ -0,0 +1,279 @@
+"""Token-budgeted packing of supporting_context for the evidence extraction prompt.
+
+run_evidence_extraction used to json.dumps the whole supporting_context: up to
+MAX_SUPPORTING_TEXT_CHARS of document text, every table preview, and the _by_file
+mirror that repeats all of it. The packer builds a smaller payload:
+
+  1. drops duplicated and internal structures (_by_file, _extraction_stats, the
+     omni_notes copy that the prompt already carries, table refs and other "_" keys);
+  2. splits documents into units (one per "[PDF page N]" block, or per ~DOC_CHUNK_CHARS
+     of other text) and treats each table preview as a unit;
+  3. scores every unit by relevance: numeric density, KPI keywords, and for tables
+     the GSC kind (chart/queries/pages first) and whether it has clicks + impressions;
+  4. fills EVIDENCE_TOKEN_BUDGET greedily by score. A table that does not fit keeps
+     its leading rows, and a page keeps its leading text, if enough budget is left.
+     Everything else is dropped.
+
+Included units are emitted in their original order (file, then page), and each
+document lists the pages it omitted. The report says what was included, trimmed and
+dropped, with token estimates. Tokens are counted with tiktoken when it is
+installed, else estimated locally (estimate_tokens).
+"""
+
+import json
+import os
+import re
+from typing import Dict, Optional, List, Tuple, Any
+
+from .lazy import optional_module
+from .schema import infer_schema
+
+
+EVIDENCE_TOKEN_BUDGET = int(os.getenv("EVIDENCE_TOKEN_BUDGET", "24000") or 24000)
+DOC_CHUNK_CHARS = 4000
+# Smallest useful remainder: below this a unit is dropped rather than trimmed.
+MIN_TRIM_TOKENS = 150
+MIN_TRIM_ROWS = 5
+# Separators and the per-document wrapper a unit adds once assembled.
+_UNIT_OVERHEAD_TOKENS = 8
+
+KPI_KEYWORDS = (
+    "click", "impression", "ctr", "position", "session", "user", "visitor", "conversion", "key event",
+    "revenue", "transaction", "order", "purchase", "engagement", "bounce", "traffic", "organic", "cost",
+    "roas", "rate", "ranking", "keyword",
+)
+# Relevance bonus per GSC table kind (see signals._detect_gsc_table_kind).
+KIND_WEIGHTS = {"chart": 3.0, "queries": 2.5, "pages": 2.5, "countries": 1.0, "devices": 1.0, "search_appearance": 0.8}
+
+_DROP_TOP_LEVEL = ("_by_file", "_extraction_stats", "omni_notes")
+_PAGE_MARKER = re.compile(r"\[PDF page (\d+)\]\n")
+_NUMBER = re.compile(r"[-+$(]?\d[\d,]*(?:\.\d+)?%?")
+_WORD = re.compile(r"[A-Za-z]+")
+_DIGITS = re.compile(r"\d+")
+_PUNCT = re.compile(r"[^\sA-Za-z\d]+")
+
+_ENCODER: Any = None
+
+
+def estimate_tokens(text: str) -> int:
+    """Token count of text: tiktoken (o200k_base) when installed, else a local estimate.
+
+    The estimate counts words (long ones twice), and digit and punctuation runs in
+    groups of three (BPE merges '","' and the like), which tracks token counts on
+    JSON and number-heavy text much better than len/4.
+    """
+    global _ENCODER
+    if not text:
+        return 0
+    if _ENCODER is None:
+        tiktoken = optional_module("tiktoken")
+        try:
+            _ENCODER = tiktoken.get_encoding("o200k_base") if tiktoken is not None else False
+        except Exception:
+            _ENCODER = False
+    if _ENCODER:
+        return len(_ENCODER.encode(text, disallowed_special=()))
+    words = _WORD.findall(text)
+    return (
+        len(words)
+        + sum(1 for w in words if len(w) > 10)
+        + sum((len(d) + 2) // 3 for d in _DIGITS.findall(text))
+        + sum((len(p) + 2) // 3 for p in _PUNCT.findall(text))
+    )
+
+
+def token_estimator_name() -> str:
+    estimate_tokens("x")
+    return "tiktoken/o200k_base" if _ENCODER else "local estimate"
+
+
+def _dumps(obj: Any) -> str:
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"), default=str)
+
+
+def _text_score(text: str) -> float:
+    """Relevance of free text: numeric density plus KPI keyword hits (per 1k chars)."""
+    if not text:
+        return 0.0
+    low = text.lower()
+    n = max(1, len(text))
+    numbers = len(_NUMBER.findall(text))
+    kpi_hits = sum(low.count(k) for k in KPI_KEYWORDS)
+    return min(3.0, numbers * 1000.0 / n / 20.0) + min(3.0, kpi_hits * 1000.0 / n / 4.0)
+
+
+def _table_score(entry: Dict[str, Any]) -> float:
+    table = entry.get("table") or {}
+    headers = [str(h) for h in (table.get("headers") or [])]
+    schema = infer_schema(headers)
+    score = KIND_WEIGHTS.get(str(entry.get("_gsc_kind") or ""), 0.0)
+    if schema.has("clicks", "impressions"):
+        score += 2.0
+    if schema.has("sessions") or schema.has("conversions") or schema.has("revenue"):
+        score += 2.0
+    low = " ".join(headers).lower()
+    score += min(2.0, 0.5 * sum(1 for k in KPI_KEYWORDS if k in low))
+    stats = table.get("numeric_stats") or {}
+    score += min(1.0, 0.25 * len(stats))
+    if table.get("error") or not table.get("rows"):
+        score -= 2.0
+    return score
+
+
+def _doc_units(doc: Dict[str, Any], doc_index: int) -> List[Dict[str, Any]]:
+    text = doc.get("text") or ""
+    units: List[Dict[str, Any]] = []
+    marks = list(_PAGE_MARKER.finditer(text))
+    if marks:
+        for k, m in enumerate(marks):
+            end = marks[k + 1].start() if k + 1 < len(marks) else len(text)
+            units.append({"page": int(m.group(1)), "text": text[m.start():end].strip()})
+    else:
+        for k in range(0, len(text), DOC_CHUNK_CHARS):
+            units.append({"page": k // DOC_CHUNK_CHARS + 1, "text": text[k:k + DOC_CHUNK_CHARS]})
+    out = []
+    for k, u in enumerate(units):
+        label = f"page {u['page']}" if marks else f"part {u['page']}"
+        out.append({
+            "unit": "document",
+            "ref": f"{doc.get('filename')} / {label}",
+            "order": (doc_index, 0, k),
+            "doc_index": doc_index,
+            "label": label,
+            "text": u["text"],
+            # Earlier pages usually carry the dashboard summary.
+            "score": _text_score(u["text"]) + (0.5 if k == 0 else 0.0),
+            "tokens": estimate_tokens(_dumps(u["text"])) + _UNIT_OVERHEAD_TOKENS,
+        })
+    return out
+
+
+def _clean_table_entry(t: Dict[str, Any]) -> Dict[str, Any]:
+    entry = {k: v for k, v in t.items() if not str(k).startswith("_") and k != "table_ref"}
+    if t.get("_gsc_kind") and t.get("_gsc_kind") != "unknown":
+        entry["kind"] = t["_gsc_kind"]
+    return entry
+
+
+def _trim_table(entry: Dict[str, Any], budget: int) -> Optional[Tuple[Dict[str, Any], int, int]]:
+    """The entry with as many leading rows as fit in budget tokens: (entry, tokens, rows kept), or None."""
+    rows = list((entry.get("table") or {}).get("rows") or [])
+    lo, hi, best = MIN_TRIM_ROWS, len(rows) - 1, None
+    while lo <= hi:
+        mid = (lo + hi) // 2
+        cand = {**entry, "table": {**entry["table"], "rows": rows[:mid], "truncated": True}}
+        tokens = estimate_tokens(_dumps(cand)) + _UNIT_OVERHEAD_TOKENS
+        if tokens <= budget:
+            best, lo = (cand, tokens, mid), mid + 1
+        else:
+            hi = mid - 1
+    return best
+
+
+def _trim_text(unit: Dict[str, Any], budget: int) -> Optional[Tuple[str, int]]:
+    text = unit["text"]
+    # Proportional cut, then shrink until it fits.
+    keep = int(len(text) * budget / max(1, unit["tokens"]))
+    while keep > 200:
+        cut = text[:keep].rsplit("\n", 1)[0] if "\n" in text[:keep] else text[:keep]
+        cut = cut + "\n[...]"
+        tokens = estimate_tokens(_dumps(cut)) + _UNIT_OVERHEAD_TOKENS
+        if tokens <= budget:
+            return cut, tokens
+        keep = int(keep * 0.85)
+    return None
+
+
+def pack_supporting_context(supporting_context: Dict[str, Any], budget_tokens: Optional[int] = None) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """Relevance-ranked subset of supporting_context within budget_tokens. Returns (packed, report)."""
+    budget = int(EVIDENCE_TOKEN_BUDGET if budget_tokens is None else budget_tokens)
+    sc = supporting_context or {}
+
+    documents = list(sc.get("documents") or [])
+    tables = list(sc.get("tables") or [])
+    notes = [str(n) for n in (sc.get("notes") or [])]
+    removed = [k for k in sc if k in _DROP_TOP_LEVEL or (str(k).startswith("_") and k not in ("documents", "tables", "notes"))]
+
+    units: List[Dict[str, Any]] = []
+    doc_labels: Dict[int, List[str]] = {}
+    for d_i, doc in enumerate(documents):
+        doc_units = _doc_units(doc, d_i)
+        doc_labels[d_i] = [u["label"] for u in doc_units]
+        units.extend(doc_units)
+    for t_i, t in enumerate(tables):
+        entry = _clean_table_entry(t)
+        units.append({
+            "unit": "table",
+            "ref": f"{t.get('filename')} / {t.get('sheet') or t.get('type') or 'table'}",
+            "order": (len(documents) + t_i, 1, 0),
+            "entry": entry,
+            "score": _table_score(t),
+            "tokens": estimate_tokens(_dumps(entry)) + _UNIT_OVERHEAD_TOKENS,
+        })
+
+    notes_tokens = estimate_tokens(_dumps(notes))
+    remaining = budget - notes_tokens - 20  # envelope keys and separators
+    included: List[Dict[str, Any]] = []
+    report_rows: Dict[str, List[Dict[str, Any]]] = {"included": [], "trimmed": [], "dropped": []}
+
+    for u in sorted(units, key=lambda x: (-x["score"], x["order"])):
+        row = {"ref": u["ref"], "unit": u["unit"], "score": round(u["score"], 2), "tokens": u["tokens"]}
+        if u["tokens"] <= remaining:
+            included.append(u)
+            remaining -= u["tokens"]
+            report_rows["included"].append(row)
+            continue
+        fitted = None
+        if remaining >= MIN_TRIM_TOKENS:
+            if u["unit"] == "table":
+                t = _trim_table(u["entry"], remaining)
+                if t is not None:
+                    fitted = {**u, "entry": t[0], "tokens": t[1]}
+                    row["kept_rows"] = t[2]
+            else:
+                t = _trim_text(u, remaining)
+                if t is not None:
+                    fitted = {**u, "text": t[0], "tokens": t[1]}
+        if fitted is not None:
+            included.append(fitted)
+            remaining -= fitted["tokens"]
+            row["kept_tokens"] = fitted["tokens"]
+            report_rows["trimmed"].append(row)
+        else:
+            report_rows["dropped"].append(row)
+
+    # Reassemble in original order.
+    included.sort(key=lambda x: x["order"])
+    packed_docs: List[Dict[str, Any]] = []
+    by_doc: Dict[int, List[Dict[str, Any]]] = {}
+    for u in included:
+        if u["unit"] == "document":
+            by_doc.setdefault(u["doc_index"], []).append(u)
+    for d_i, doc in enumerate(documents):
+        parts = by_doc.get(d_i)
+        if not parts:
+            continue
+        kept = {p["label"] for p in parts}
+        out = {"filename": doc.get("filename"), "type": doc.get("type"), "text": "\n\n".join(p["text"] for p in parts)}
+        omitted = [lbl for lbl in doc_labels[d_i] if lbl not in kept]
+        if omitted:
+            out["omitted"] = omitted
+        packed_docs.append(out)
+
+    packed = {
+        "documents": packed_docs,
+        "tables": [u["entry"] for u in included if u["unit"] == "table"],
+        "notes": notes,
+    }
+    original_tokens = estimate_tokens(_dumps(sc)) if sc else 0
+    packed_tokens = estimate_tokens(_dumps(packed))
+    report = {
+        "budget_tokens": budget,
+        "packed_tokens": packed_tokens,
+        "original_tokens": original_tokens,
+        "estimator": token_estimator_name(),
+        "removed_keys": removed,
+        "units": len(units),
+        **report_rows,
+    }
+    return packed, report
@@ -0,0 +1,771 @@
+"""PDF parsing: shared PdfDocument, text/table extraction, dashboard section tables and OCR."""
+
+import io
+import os
+import re
+import time
+from typing import Dict, Optional, List, Tuple, Any
+
+from .lazy import has_module, optional_module, require_module
+from .tracing import span, submit_in_context
+from .utils import MAX_TABLE_COLS, MAX_TABLE_ROWS, _normalize_ws
+
+
+class PdfDocument:
+    """A PDF upload opened once and shared by the text, table and section extractors.
+
+    Each backend (PyMuPDF, pdfplumber, PyPDF2) is opened at most once, on first use,
+    and per-page text, word boxes and table candidates are memoized so the extractors
+    never re-parse the same bytes. `timings` accumulates milliseconds per stage.
+
+    Use as a context manager (or call close()) to release the underlying handles.
+    """
+
+    def __init__(self, data: bytes):
+        self.data = data or b""
+        self.timings: Dict[str, float] = {}
+        self.stats: Dict[str, Any] = {}
+        self._fitz_doc: Any = None
+        self._fitz_failed = False
+        self._plumber_pdf: Any = None
+        self._plumber_failed = False
+        self._pypdf2_texts: Optional[List[str]] = None
+        self._fitz_texts: Dict[int, str] = {}
+        self._plumber_texts: Dict[int, str] = {}
+        self._plumber_words: Dict[int, List[Dict[str, Any]]] = {}
+        self._plumber_tables: Dict[int, List[List[List[Any]]]] = {}
+
+    def __enter__(self) -> "PdfDocument":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        for handle in (self._fitz_doc, self._plumber_pdf):
+            try:
+                if handle is not None:
+                    handle.close()
+            except Exception:
+                pass
+        self._fitz_doc = None
+        self._plumber_pdf = None
+
+    def add_timing(self, stage: str, started: float) -> None:
+        self.timings[stage] = round(self.timings.get(stage, 0.0) + (time.perf_counter() - started) * 1000.0, 2)
+
+    # --- backends (opened lazily, at most once) ---
+    @property
+    def fitz_doc(self) -> Any:
+        """Open PyMuPDF document (None if PyMuPDF is unavailable or the file is unreadable)."""
+        if self._fitz_doc is None and not self._fitz_failed:
+            t0 = time.perf_counter()
+            try:
+                fitz = require_module("fitz")
+                self._fitz_doc = fitz.open(stream=self.data, filetype="pdf")
+            except Exception:
+                self._fitz_failed = True
+            self.add_timing("open_fitz", t0)
+        return self._fitz_doc
+
+    @property
+    def plumber_pdf(self) -> Any:
+        """Open pdfplumber document (None if pdfplumber is unavailable or the file is unreadable)."""
+        if self._plumber_pdf is None and not self._plumber_failed:
+            t0 = time.perf_counter()
+            try:
+                pdfplumber = require_module("pdfplumber")
+                self._plumber_pdf = pdfplumber.open(io.BytesIO(self.data))
+            except Exception:
+                self._plumber_failed = True
+            self.add_timing("open_pdfplumber", t0)
+        return self._plumber_pdf
+
+    @property
+    def page_count(self) -> int:
+        if self.plumber_pdf is not None:
+            return len(self.plumber_pdf.pages)
+        if self.fitz_doc is not None:
+            return len(self.fitz_doc)
+        return 0
+
+    # --- per-page memoized views ---
+    def fitz_text(self, page_index: int) -> str:
+        if page_index not in self._fitz_texts:
+            t0 = time.perf_counter()
+            with span("page_text", page=page_index + 1, backend="fitz"):
+                # "text" keeps reading order reasonable; avoid dict output (too big)
+                self._fitz_texts[page_index] = self.fitz_doc.load_page(page_index).get_text("text") or ""
+            self.add_timing("fitz_text", t0)
+        return self._fitz_texts[page_index]
+
+    def plumber_text(self, page_index: int) -> str:
+        if page_index not in self._plumber_texts:
+            t0 = time.perf_counter()
+            with span("page_text", page=page_index + 1, backend="pdfplumber"):
+                self._plumber_texts[page_index] = self.plumber_pdf.pages[page_index].extract_text() or ""
+            self.add_timing("pdfplumber_text", t0)
+        return self._plumber_texts[page_index]
+
+    def plumber_words(self, page_index: int) -> List[Dict[str, Any]]:
+        """Embedded word boxes for a page: {text, x0, y0, x1, y1} in PDF points."""
+        if page_index not in self._plumber_words:
+            t0 = time.perf_counter()
+            words = []
+            with span("page_words", page=page_index + 1):
+                for w in (self.plumber_pdf.pages[page_index].extract_words() or []):
+                    words.append({
+                        "text": w.get("text", ""),
+                        "x0": float(w.get("x0", 0.0)),
+                        "y0": float(w.get("top", 0.0)),
+                        "x1": float(w.get("x1", 0.0)),
+                        "y1": float(w.get("bottom", 0.0)),
+                    })
+            self._plumber_words[page_index] = words
+            self.add_timing("pdfplumber_words", t0)
+        return self._plumber_words[page_index]
+
+    def plumber_tables(self, page_index: int) -> List[List[List[Any]]]:
+        if page_index not in self._plumber_tables:
+            t0 = time.perf_counter()
+            with span("page_tables", page=page_index + 1) as sp:
+                try:
+                    tables = self.plumber_pdf.pages[page_index].extract_tables() or []
+                except Exception:
+                    tables = []
+                sp.set(tables=len(tables))
+            self._plumber_tables[page_index] = tables
+            self.add_timing("pdfplumber_tables", t0)
+        return self._plumber_tables[page_index]
+
+    def pypdf2_texts(self) -> List[str]:
+        if self._pypdf2_texts is None:
+            t0 = time.perf_counter()
+            reader = require_module("PyPDF2").PdfReader(io.BytesIO(self.data))
+            self._pypdf2_texts = [(page.extract_text() or "") for page in reader.pages]
+            self.add_timing("pypdf2_text", t0)
+        return self._pypdf2_texts
+
+
+def _as_pdf_document(data: Any) -> Tuple["PdfDocument", bool]:
+    """Return (document, owned). Callers close the document only when they own it."""
+    if isinstance(data, PdfDocument):
+        return data, False
+    return PdfDocument(data), True
+
+
+def _extract_pdf_text(data: Any) -> str:
+    """Extract text from PDF bytes (or an open PdfDocument) with best-available tech.
+
+    Priority order (best to fallback):
+      1) PyMuPDF (fitz) - generally best layout-aware extraction
+      2) pdfplumber - good text extraction with layout hints
+      3) PyPDF2 - basic fallback
+
+    This function must be defensive and return "" on failure.
+    """
+    doc, owned = _as_pdf_document(data)
+    try:
+        # 1) PyMuPDF / fitz
+        try:
+            if doc.fitz_doc is not None:
+                parts = []
+                for p_i in range(len(doc.fitz_doc)):
+                    t = doc.fitz_text(p_i).strip()
+                    if t:
+                        parts.append(f"[PDF page {p_i+1}]\n{t}")
+                out = _normalize_ws("\n\n".join(parts))
+                if out:
+                    return out
+        except Exception:
+            pass
+
+        # 2) pdfplumber
+        try:
+            if doc.plumber_pdf is not None:
+                parts = []
+                for p_i in range(len(doc.plumber_pdf.pages)):
+                    t = doc.plumber_text(p_i).strip()
+                    if t:
+                        parts.append(f"[PDF page {p_i+1}]\n{t}")
+                out = _normalize_ws("\n\n".join(parts))
+                if out:
+                    return out
+        except Exception:
+            pass
+
+        # 3) PyPDF2
+        try:
+            parts = []
+            for p_i, t in enumerate(doc.pypdf2_texts()):
+                t = (t or "").strip()
+                if t:
+                    parts.append(f"[PDF page {p_i+1}]\n{t}")
+            return _normalize_ws("\n\n".join(parts))
+        except Exception:
+            return ""
+    finally:
+        if owned:
+            doc.close()
+
+def _extract_pdf_tables(data: Any) -> List[Dict[str, Any]]:
+    """Best-effort extraction of simple tables from PDFs.
+
+    Uses pdfplumber when available. Returns a list of small previews in the
+    same shape as other table previews so downstream can treat them uniformly.
+    """
+    previews: List[Dict[str, Any]] = []
+
+    def _table_to_preview(table: List[List[Any]]) -> Dict[str, Any]:
+        # Normalize ragged rows
+        rows = [[("" if c is None else str(c).strip()) for c in (r or [])] for r in (table or [])]
+        rows = [r for r in rows if any((c or "").strip() for c in r)]
+        if not rows:
+            return {"shape": [0, 0], "headers": [], "rows": [], "truncated": False, "numeric_stats": {}}
+
+        # Determine max cols and clamp
+        max_cols = min(MAX_TABLE_COLS, max(len(r) for r in rows))
+        rows2 = [ (r + [""] * (max_cols - len(r)))[:max_cols] for r in rows ]
+
+        # Heuristic: first row is headers if it looks non-numeric and mostly unique
+        hdr_candidate = rows2[0]
+        def _is_numberish(x: str) -> bool:
+            try:
+                float(str(x).replace(",", ""))
+                return True
+            except Exception:
+                return False
+
+        nonnum = sum(1 for c in hdr_candidate if c and not _is_numberish(c))
+        unique = len({c.lower() for c in hdr_candidate if c}) == len([c for c in hdr_candidate if c])
+        use_hdr = nonnum >= max(1, int(0.6 * max_cols)) and unique
+
+        headers = hdr_candidate if use_hdr else [f"col_{i+1}" for i in range(max_cols)]
+        data_rows = rows2[1:] if use_hdr else rows2
+
+        truncated = len(data_rows) > MAX_TABLE_ROWS
+        data_rows = (data_rows[:MAX_TABLE_ROWS] if truncated else data_rows)
+
+        return {
+            "shape": [len(rows2) - (1 if use_hdr else 0), max_cols],
+            "headers": headers,
+            "rows": data_rows,
+            "truncated": bool(truncated),
+            "numeric_stats": {},
+        }
+
+    doc, owned = _as_pdf_document(data)
+    try:
+        if doc.plumber_pdf is None:
+            return previews
+        for p_i in range(len(doc.plumber_pdf.pages)):
+            tables = doc.plumber_tables(p_i)
+            for t_i, table in enumerate(tables[:6]):  # cap tables per page
+                prev = _table_to_preview(table)
+                # only keep meaningful previews
+                if prev.get("shape", [0, 0])[0] > 0 and prev.get("shape", [0, 0])[1] > 0:
+                    prev["page"] = p_i + 1
+                    prev["table_index"] = t_i + 1
+                    previews.append(prev)
+            # Hard cap overall to avoid bloat
+            if len(previews) >= 24:
+                break
+    except Exception:
+        return previews
+    finally:
+        if owned:
+            doc.close()
+
+    return previews
+
+
+def _df_to_preview(df: "pd.DataFrame") -> Dict[str, Any]:
+    """Convert a dataframe to the standard table preview dict."""
+    try:
+        headers = [str(c) for c in df.columns.tolist()]
+        rows = df.astype(str).fillna("").values.tolist()
+        truncated = len(rows) > MAX_TABLE_ROWS
+        if truncated:
+            rows = rows[:MAX_TABLE_ROWS]
+        return {
+            "shape": [int(df.shape[0]), int(df.shape[1])],
+            "headers": headers,
+            "rows": rows,
+            "truncated": bool(truncated),
+            "numeric_stats": {},
+        }
+    except Exception:
+        return {"shape": [0, 0], "headers": [], "rows": [], "truncated": False, "numeric_stats": {}}
+
+
+def _render_pdf_page_image(doc: Any, page_index: int, zoom: float = 2.0) -> "Any":
+    """Render a PDF page to a PIL image for OCR. Returns None on failure."""
+    fitz = optional_module("fitz")
+    Image = optional_module("PIL.Image")
+    if fitz is None or Image is None:
+        return None
+    try:
+        page = doc.load_page(page_index)
+        mat = fitz.Matrix(zoom, zoom)
+        pix = page.get_pixmap(matrix=mat, alpha=False)
+        img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
+        return img
+    except Exception:
+        return None
+
+
+def _ocr_image_words(img: Any, zoom: float = 2.0, timeout_s: float = 20) -> List[Dict[str, Any]]:
+    """Run Tesseract on a rendered page image and return word boxes (image pixel space)."""
+    words: List[Dict[str, Any]] = []
+    pytesseract = optional_module("pytesseract")
+    if pytesseract is None:
+        return words
+
+    try:
+        data = pytesseract.image_to_data(img, output_type=pytesseract.Output.DICT, timeout=timeout_s)
+        n = len(data.get("text", []))
+        for i in range(n):
+            t = (data["text"][i] or "").strip()
+            if not t:
+                continue
+            try:
+                conf = float(data.get("conf", ["-1"])[i])
+            except Exception:
+                conf = -1.0
+            x, y, w, h = data["left"][i], data["top"][i], data["width"][i], data["height"][i]
+            words.append({"text": t, "x0": float(x), "y0": float(y), "x1": float(x + w), "y1": float(y + h), "conf": conf, "zoom": float(zoom)})
+    except Exception:
+        return []
+
+    return words
+
+
+def _ocr_page_traced(img: Any, page_index: int, zoom: float, timeout_s: float) -> List[Dict[str, Any]]:
+    with span("ocr_page", page=page_index + 1) as sp:
+        words = _ocr_image_words(img, zoom, timeout_s)
+        sp.set(words=len(words))
+    return words
+
+
+# OCR pool settings (env-overridable). Each Tesseract call already runs in its own
+# process, so a bounded thread pool is enough to keep `workers` OCR processes busy.
+OCR_MAX_WORKERS = int(os.getenv("OCR_MAX_WORKERS", "0") or 0) or max(1, min(4, os.cpu_count() or 1))
+OCR_DOCUMENT_BUDGET_S = float(os.getenv("OCR_DOCUMENT_BUDGET_S", "60") or 60)
+OCR_PAGE_TIMEOUT_S = 20
+
+
+def _ocr_pages_parallel(
+    doc: Any,
+    page_indexes: List[int],
+    zoom: float = 2.0,
+    max_workers: Optional[int] = None,
+    budget_s: Optional[float] = None,
+) -> Tuple[Dict[int, List[Dict[str, Any]]], Dict[str, Any]]:
+    """OCR several PDF pages concurrently within a global time budget.
+
+    Pages are rendered one at a time on the calling thread (PyMuPDF documents are
+    not thread-safe) and handed to a bounded pool of Tesseract workers as soon as
+    they are ready. When the budget runs out, pages not yet rendered are skipped,
+    in-flight calls are bounded by their own timeout, and whatever finished is
+    returned.
+
+    Returns ({page_index: words}, stats).
+    """
+    import threading
+    from concurrent.futures import ThreadPoolExecutor, wait
+
+    workers = max(1, int(max_workers or OCR_MAX_WORKERS))
+    budget = float(budget_s if budget_s is not None else OCR_DOCUMENT_BUDGET_S)
+    deadline = time.monotonic() + budget
+    stats: Dict[str, Any] = {
+        "ocr_workers": workers,
+        "ocr_budget_s": budget,
+        "ocr_pages_requested": len(page_indexes),
+        "ocr_pages_done": 0,
+        "ocr_pages_skipped": 0,
+        "ocr_budget_exhausted": False,
+    }
+    results: Dict[int, List[Dict[str, Any]]] = {}
+    if not page_indexes:
+        return results, stats
+    if not has_module("pytesseract"):
+        stats["ocr_pages_skipped"] = len(page_indexes)
+        return results, stats
+
+    # Cap rendered-but-not-yet-OCR'd pages so large PDFs don't hold every bitmap in memory.
+    in_flight = threading.BoundedSemaphore(workers * 2)
+    futures = {}
+    pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ocr")
+    try:
+        for i in page_indexes:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not in_flight.acquire(timeout=remaining):
+                stats["ocr_budget_exhausted"] = True
+                break
+            with span("ocr_render", page=i + 1):
+                img = _render_pdf_page_image(doc, i, zoom=zoom)
+            if img is None:
+                in_flight.release()
+                continue
+            timeout_s = max(1.0, min(float(OCR_PAGE_TIMEOUT_S), deadline - time.monotonic()))
+            fut = submit_in_context(pool, _ocr_page_traced, img, i, zoom, timeout_s)
+            fut.add_done_callback(lambda _f: in_flight.release())
+            futures[fut] = i
+
+        done, not_done = wait(list(futures.keys()), timeout=max(0.0, deadline - time.monotonic()))
+        for fut in done:
+            try:
+                results[futures[fut]] = fut.result() or []
+            except Exception:
+                results[futures[fut]] = []
+        if not_done:
+            stats["ocr_budget_exhausted"] = True
+            for fut in not_done:
+                fut.cancel()
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    stats["ocr_pages_done"] = len(results)
+    stats["ocr_pages_skipped"] = len(page_indexes) - len(results)
+    return results, stats
+
+
+def _words_to_lines(words: List[Dict[str, Any]], y_tol: float = 10.0) -> List[List[Dict[str, Any]]]:
+    """Group word boxes into lines using y-centroid clustering."""
+    if not words:
+        return []
+    items = []
+    for w in words:
+        ymid = (w["y0"] + w["y1"]) / 2.0
+        items.append((ymid, w))
+    items.sort(key=lambda t: (t[0], t[1]["x0"]))
+
+    lines: List[List[Dict[str, Any]]] = []
+    cur: List[Dict[str, Any]] = []
+    cur_y: Optional[float] = None
+    for ymid, w in items:
+        if cur_y is None:
+            cur_y = ymid
+            cur = [w]
+            continue
+        if abs(ymid - cur_y) <= y_tol:
+            cur.append(w)
+            # update running average y
+            cur_y = (cur_y * (len(cur) - 1) + ymid) / float(len(cur))
+        else:
+            cur.sort(key=lambda ww: ww["x0"])
+            lines.append(cur)
+            cur = [w]
+            cur_y = ymid
+    if cur:
+        cur.sort(key=lambda ww: ww["x0"])
+        lines.append(cur)
+    return lines
+
+
+_NUM_TOKEN_RE = re.compile(r"^[\$\(\)\+\-]?\d[\d,]*([.]\d+)?%?$")
+
+def _clean_num_token(s: str) -> str:
+    s = (s or "").strip()
+    # Fix common PDF/OCR split artifacts: "1, 30 7.4%" -> "1,307.4%"
+    s = re.sub(r"(\d),\s+(\d)", r"\1,\2", s)
+    s = re.sub(r"(\d)\s+(\d)", r"\1\2", s)
+    s = s.replace("O", "0") if _NUM_TOKEN_RE.match(s.replace("O","0")) else s
+    return s
+
+
+def _extract_rows_from_token_lines(
+    token_lines: List[List[str]],
+    min_numeric: int = 2,
+    max_cols: int = 10
+) -> List[List[str]]:
+    """Extract rows from tokenized lines: keep lines with >=min_numeric numeric tokens.
+
+    Returns rows as [label, num1, num2, ...].
+    """
+    rows: List[List[str]] = []
+    for toks in token_lines:
+        toks = [t.strip() for t in toks if t.strip()]
+        if not toks:
+            continue
+        nums = [i for i,t in enumerate(toks) if _NUM_TOKEN_RE.match(_clean_num_token(t))]
+        if len(nums) < min_numeric:
+            continue
+        first_num = nums[0]
+        label = " ".join(toks[:first_num]).strip()
+        if not label:
+            # if label empty, treat first token as label
+            label = toks[0]
+            first_num = 1 if len(toks) > 1 else 0
+        values = [_clean_num_token(t) for t in toks[first_num:]]
+        row = [label] + values
+        row = row[:max_cols]
+        rows.append(row)
+    return rows
+
+
+def _tokenize_text_lines(text: str) -> List[List[str]]:
+    lines = []
+    for ln in (text or "").splitlines():
+        ln = ln.strip()
+        if not ln:
+            continue
+        # split on runs of spaces while keeping tokens like "google / cpc"
+        toks = re.split(r"\s{2,}|\t", ln)
+        if len(toks) == 1:
+            toks = ln.split()
+        lines.append([t for t in toks if t.strip()])
+    return lines
+
+
+def _extract_pdf_section_tables(
+    data: Any,
+    enable_ocr: bool = True,
+    ocr_workers: Optional[int] = None,
+    ocr_budget_s: Optional[float] = None,
+) -> List[Dict[str, Any]]:
+    """Extract 'clean table per section' best-effort from dashboard-style PDFs.
+
+    Accepts PDF bytes or an open PdfDocument (preferred; avoids re-parsing).
+    OCR runs on a bounded worker pool (`ocr_workers`, default OCR_MAX_WORKERS) and
+    stops after `ocr_budget_s` seconds for the whole document (default
+    OCR_DOCUMENT_BUDGET_S), keeping whatever pages finished.
+
+    Strategy:
+      - Use pdfplumber text as baseline.
+      - Optionally OCR each page to recover tile/chart text that isn't embedded.
+      - Split into sections by known headings present in this report template.
+      - For each section, produce one or more table previews.
+    """
+    doc, owned = _as_pdf_document(data)
+    try:
+        return _extract_pdf_section_tables_from_doc(doc, enable_ocr=enable_ocr, ocr_workers=ocr_workers, ocr_budget_s=ocr_budget_s)
+    finally:
+        if owned:
+            doc.close()
+
+
+def _extract_pdf_section_tables_from_doc(
+    doc: "PdfDocument",
+    enable_ocr: bool = True,
+    ocr_workers: Optional[int] = None,
+    ocr_budget_s: Optional[float] = None,
+) -> List[Dict[str, Any]]:
+    previews: List[Dict[str, Any]] = []
+    pd = optional_module("pandas")
+    if pd is None:
+        return previews
+
+    # The fitz handle is only needed for OCR rendering
+    if doc.fitz_doc is None:
+        enable_ocr = False
+
+    # Baseline extracted text per page (pdfplumber tends to be best for this template)
+    page_texts: List[str] = []
+    try:
+        if doc.plumber_pdf is None:
+            raise RuntimeError("pdfplumber unavailable")
+        for i in range(len(doc.plumber_pdf.pages)):
+            page_texts.append(doc.plumber_text(i))
+    except Exception:
+        # fallback to fitz if pdfplumber unavailable
+        if doc.fitz_doc is None:
+            return previews
+        try:
+            page_texts = [doc.fitz_text(i) for i in range(len(doc.fitz_doc))]
+        except Exception:
+            return previews
+
+    ocr_lines_by_page: List[List[List[str]]] = [[] for _ in range(len(page_texts))]
+    if enable_ocr:
+        t0 = time.perf_counter()
+        try:
+            fdoc = doc.fitz_doc
+            candidates = []
+            for i in range(len(fdoc)):
+                base_t = page_texts[i] if i < len(page_texts) else ""
+                digit_count = sum(1 for ch in (base_t or "") if ch.isdigit())
+                should_ocr = ("..." in (base_t or "")) or (digit_count < 80)
+                if should_ocr:
+                    candidates.append(i)
+            words_by_page, ocr_stats = _ocr_pages_parallel(
+                fdoc, candidates, zoom=2.0, max_workers=ocr_workers, budget_s=ocr_budget_s,
+            )
+            doc.stats.update(ocr_stats)
+            for i, words in words_by_page.items():
+                if i >= len(ocr_lines_by_page):
+                    continue
+                # keep only reasonable confidence words; allow -1 (unknown) but prefer >=40
+                words2 = [w for w in words if (w.get("conf", -1) >= 40) or (w.get("conf", -1) == -1)]
+                lines = _words_to_lines(words2, y_tol=12.0)
+                token_lines = [[w["text"] for w in ln] for ln in lines]
+                ocr_lines_by_page[i] = token_lines
+        except Exception:
+            pass
+        doc.add_timing("ocr", t0)
+
+    # Section identification (by page; this report is consistent)
+    section_by_page = {}
+    for i, t in enumerate(page_texts):
+        tt = (t or "").upper()
+        if "NUMBER OF VISITORS" in tt and "SITE TRAFFIC" in tt:
+            section_by_page[i] = "Site Traffic"
+        elif "NUMBER OF ORDERS" in tt:
+            section_by_page[i] = "Orders"
+        elif "CONVERSION RATE" in tt:
+            section_by_page[i] = "Conversion Rate"
+        elif re.search(r"\bSALES\b", tt):
+            section_by_page[i] = "Sales"
+        elif "GOOGLE ADS" in tt:
+            section_by_page[i] = "Google Ads"
+        elif "MICROSOFT ADS" in tt:
+            section_by_page[i] = "Microsoft Ads"
+        elif "TOP QUERIES" in tt or "\nNOTES" in tt or tt.strip().startswith("NOTES"):
+            section_by_page[i] = "Notes & Top Queries"
+        else:
+            section_by_page[i] = f"Page {i+1}"
+
+    def add_preview(section: str, table_name: str, df: "pd.DataFrame"):
+        pv = _df_to_preview(df)
+        pv["section"] = section
+        pv["table_name"] = table_name
+        previews.append(pv)
+
+    for i, base_text in enumerate(page_texts):
+        section = section_by_page.get(i, f"Page {i+1}")
+
+        base_lines = _tokenize_text_lines(base_text)
+        ocr_token_lines = ocr_lines_by_page[i] or []
+        # Merge: prefer base, but add OCR lines that aren't present (rough)
+        base_join = set(" ".join([w.lower() for w in ln]) for ln in base_lines)
+        merged_lines = list(base_lines)
+        for ln in ocr_token_lines:
+            key = " ".join([w.lower() for w in ln if w.strip()])
+            if key and key not in base_join:
+                merged_lines.append([w for w in ln if w.strip()])
+
+        # --- KPI tiles (generic) ---
+        # Look for lines that contain multiple known KPI labels; next line often contains the values.
+        kpi_labels = ["SESSIONS","TOTAL USERS","TRANSACTIONS","PURCHASE REVENUE","REVENUE","CONVERSIONS","CLICKS","IMPRESSIONS","COST","SPEND","AVERAGE ORDER VALUE","PURCHASE RATE","CONVERSION RATE"]
+        kpi_rows = []
+        for idx_ln, ln in enumerate(merged_lines[:-1]):
+            up = " ".join(ln).upper()
+            if any(lbl in up for lbl in kpi_labels) and sum(1 for lbl in kpi_labels if lbl in up) >= 2:
+                labels = [tok for tok in re.split(r"\s{1,}", up) if tok.strip()]
+                # Use the raw line tokens rather than split again
+                label_line = " ".join(ln)
+                val_line = " ".join(merged_lines[idx_ln+1])
+                # crude: split labels by double spaces in base extraction; if not, fall back to known sequence
+                # We'll detect label chunks by scanning for known phrases in order.
+                chunks = []
+                tmp = label_line
+                # prioritize longer labels
+                ordered = sorted(set(kpi_labels), key=lambda s: -len(s))
+                found = []
+                for lbl in ordered:
+                    if lbl.lower() in tmp.lower():
+                        found.append(lbl)
+                # For this template, the line is usually the labels in order. We'll just use the tokens in ln grouped by "  " if present in base line
+                chunks = re.split(r"\s{2,}", label_line.strip())
+                if len(chunks) <= 1:
+                    # fallback: split by known labels occurrences
+                    chunks = []
+                    rest = label_line
+                    for lbl in ["SESSIONS","TOTAL USERS","TRANSACTIONS","CONVERSION RATE","PURCHASE REVENUE","REVENUE","CLICKS","IMPRESSIONS","COST","SPEND","CONVERSIONS","AVERAGE ORDER VALUE","PURCHASE RATE"]:
+                        if lbl.lower() in rest.lower():
+                            chunks.append(lbl)
+                            # remove first occurrence
+                            rest = re.sub(re.escape(lbl), "", rest, flags=re.I, count=1).strip()
+                    chunks = [c.strip() for c in chunks if c.strip()]
+                val_chunks = re.split(r"\s{2,}", val_line.strip())
+                if len(val_chunks) < len(chunks):
+                    val_chunks = val_line.split()
+                # build rows
+                for j, lbl in enumerate(chunks):
+                    val = val_chunks[j] if j < len(val_chunks) else ""
+                    if lbl.strip() and val.strip():
+                        kpi_rows.append([lbl.strip(), _clean_num_token(val.strip())])
+                if kpi_rows:
+                    break
+        if kpi_rows:
+            df = pd.DataFrame(kpi_rows, columns=["Metric", "Current"])
+            add_preview(section, "KPIs", df)
+
+        # --- Common breakdown tables (label + value + optional delta) ---
+        # Extract rows with at least 1 numeric token; but keep label/value shapes.
+        breakdown_rows = _extract_rows_from_token_lines(merged_lines, min_numeric=1, max_cols=6)
+        # Filter out obvious junk headers
+        junk = {"PREVIOU", "PREVIOUS", "PERIOD", "YEAR", "TOTAL", "REPORT", "ECO", "NOTES", "QUERIES", "CLICKS", "IMPRESSIONS", "AVG.", "CTR", "POSITION"}
+        cleaned = []
+        for r in breakdown_rows:
+            lab = (r[0] or "").strip()
+            if not lab:
+                continue
+            if lab.upper() in junk:
+                continue
+            # avoid KPI rows duplicated
+            if any(lab.upper() == (kr[0].upper() if kr else "") for kr in kpi_rows):
+                continue
+            cleaned.append(r)
+
+        if cleaned:
+            # Heuristic: if many rows contain "/" it's likely Source/Medium table
+            slash_ratio = sum(1 for r in cleaned if "/" in r[0]) / float(len(cleaned))
+            if slash_ratio >= 0.3:
+                # keep only rows with slash
+                rows2 = [r for r in cleaned if "/" in r[0]]
+                if rows2:
+                    maxlen = max(len(r) for r in rows2)
+                    cols = ["Source / Medium"] + [f"Value {k}" for k in range(1, maxlen)]
+                    df = pd.DataFrame([r + [""]*(maxlen-len(r)) for r in rows2], columns=cols)
+                    add_preview(section, "By Source / Medium", df)
+
+            # Channel tables often have short labels without "/"
+            chan_rows = [r for r in cleaned if ("/" not in r[0]) and (len(r[0]) <= 24) and re.search(r"[A-Za-z]", r[0])]
+            if len(chan_rows) >= 3:
+                maxlen = max(len(r) for r in chan_rows)
+                cols = ["Channel"] + [f"Value {k}" for k in range(1, maxlen)]
+                df = pd.DataFrame([r + [""]*(maxlen-len(r)) for r in chan_rows], columns=cols)
+                add_preview(section, "By Channel", df)
+
+        # --- Notes & Top Queries (page 7) ---
+        if section == "Notes & Top Queries":
+            # Notes: lines beginning with digit
+            note_rows = []
+            for ln in merged_lines:
+                if len(ln) >= 2 and re.match(r"^\d+$", ln[0]):
+                    note_rows.append([ln[0], " ".join(ln[1:]).strip()])
+            if note_rows:
+                add_preview(section, "Notes", pd.DataFrame(note_rows, columns=["#", "Note"]))
+
+            # Top queries: look for rows with >=4 numeric tokens
+            tq_rows = []
+            in_tq = False
+            for ln in merged_lines:
+                s = " ".join(ln)
+                if "TOP" in s.upper() and "QUER" in s.upper():
+                    in_tq = True
+                    continue
+                if not in_tq:
+                    continue
+                # stop when hit NOTES
+                if "OTES" in s.upper() or s.strip().upper() == "NOTES":
+                    break
+                toks = [t.strip() for t in ln if t.strip()]
+                nums = [t for t in toks if _NUM_TOKEN_RE.match(_clean_num_token(t))]
+                if len(nums) >= 4:
+                    # find first numeric index
+                    idxs = [ii for ii,t in enumerate(toks) if _NUM_TOKEN_RE.match(_clean_num_token(t))]
+                    first = idxs[0]
+                    query = " ".join(toks[:first]).strip()
+                    vals = [_clean_num_token(t) for t in toks[first:]]
+                    if query:
+                        tq_rows.append([query]+vals)
+            if tq_rows:
+                maxlen = max(len(r) for r in tq_rows)
+                cols = ["Query","Clicks","Δ Clicks","Impressions","Δ Impressions","CTR","Δ CTR","Avg Position","Δ Avg Position"][:maxlen]
+                # pad
+                df = pd.DataFrame([r+[""]*(maxlen-len(r)) for r in tq_rows], columns=cols)
+                add_preview(section, "Top Queries", df)
+
+    return previews
@@ -0,0 +1,334 @@
+"""PDF export via a warm Playwright Chromium service (print-to-PDF)."""
+
+import asyncio
+import os
+import subprocess
+import sys
+import threading
+from typing import Dict, Optional, List, Tuple, Any
+
+
+# Use a repo-local Playwright browser cache (works on Streamlit Cloud)
+if os.name != 'nt':
+    os.environ.setdefault('PLAYWRIGHT_BROWSERS_PATH', os.path.join(os.getcwd(), '.cache', 'ms-playwright'))
+
+# Optional PDF export via Playwright (Chromium print-to-PDF). Hidden if unavailable.
+# Only the package spec is checked here; playwright itself is imported on first render.
+try:
+    import importlib.util
+    PLAYWRIGHT_AVAILABLE = importlib.util.find_spec("playwright") is not None
+except Exception:
+    PLAYWRIGHT_AVAILABLE = False
+
+# Playwright on Windows needs ProactorEventLoopPolicy for subprocess support.
+if os.name == "nt":
+    try:
+        asyncio.set_event_loop_policy(asyncio.WindowsProactorEventLoopPolicy())
+    except Exception:
+        pass
+
+
+_PW_BOOTSTRAPPED = False
+
+def ensure_playwright_chromium(force: bool = False) -> None:
+    """Ensure Playwright Chromium is installed.
+
+    On Streamlit Community Cloud, Python packages install fine but Playwright browser
+    binaries are not automatically downloaded. We install Chromium into
+    PLAYWRIGHT_BROWSERS_PATH (set near the imports).
+    """
+    global _PW_BOOTSTRAPPED
+    if _PW_BOOTSTRAPPED and not force:
+        return
+    _PW_BOOTSTRAPPED = True
+
+    if os.name == "nt":
+        return
+    if not PLAYWRIGHT_AVAILABLE:
+        return
+
+    browsers_path = os.environ.get("PLAYWRIGHT_BROWSERS_PATH") or os.path.join(os.getcwd(), ".cache", "ms-playwright")
+
+    # If Chromium already exists, do nothing.
+    try:
+        if not force and os.path.isdir(browsers_path):
+            for name in os.listdir(browsers_path):
+                if name.startswith("chromium"):
+                    return
+    except Exception:
+        pass
+
+    try:
+        env = os.environ.copy()
+        env["PLAYWRIGHT_BROWSERS_PATH"] = browsers_path
+        subprocess.run(
+            [sys.executable, "-m", "playwright", "install", "chromium"],
+            check=False,
+            env=env,
+        )
+    except Exception:
+        pass
+
+PDF_POOL_SIZE = int(os.getenv("PDF_POOL_SIZE", "2") or 2)
+PDF_RENDER_TIMEOUT_S = float(os.getenv("PDF_RENDER_TIMEOUT_S", "60") or 60)
+PDF_CHROMIUM_ARGS = ["--no-sandbox", "--disable-dev-shm-usage"]
+PDF_VIEWPORT = {"width": 1100, "height": 1400}
+PDF_OPTIONS = {
+    "format": "Letter",
+    "print_background": True,
+    "margin": {"top": "0.75in", "bottom": "0.75in", "left": "0.75in", "right": "0.75in"},
+}
+
+
+def _is_missing_browser_error(e: BaseException) -> bool:
+    msg = str(e)
+    return ("Executable doesn't exist" in msg) or ("playwright install" in msg)
+
+
+class PdfBrowserService:
+    """Process-wide warm Chromium for print-to-PDF.
+
+    Playwright objects are bound to the event loop that created them, so the service
+    owns one asyncio loop on a daemon thread and callers (any Streamlit script thread)
+    submit work to it. Up to pool_size pages (each with its own browser context) are
+    kept open and reused. Dead pages are dropped, and if Chromium disconnects or
+    crashes it is relaunched on the next render (one retry per render).
+    """
+
+    def __init__(self, pool_size: int = PDF_POOL_SIZE):
+        self.pool_size = max(1, int(pool_size))
+        self.stats: Dict[str, int] = {"launches": 0, "renders": 0, "failures": 0, "pages_created": 0, "pages_dropped": 0}
+        self._start_lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        # Loop-owned state (only touched from the service thread)
+        self._pw = None
+        self._browser = None
+        self._generation = 0
+        self._idle: List[Tuple[int, Any]] = []
+        self._pages_open = 0
+        self._page_freed: Optional[asyncio.Condition] = None
+        self._launch_lock: Optional[asyncio.Lock] = None
+
+    # ---- thread/loop plumbing ----
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._start_lock:
+            if self._loop is not None and self._thread is not None and self._thread.is_alive():
+                return self._loop
+            loop = asyncio.new_event_loop()
+            ready = threading.Event()
+
+            def _run() -> None:
+                asyncio.set_event_loop(loop)
+                ready.set()
+                loop.run_forever()
+
+            t = threading.Thread(target=_run, name="pdf-browser", daemon=True)
+            t.start()
+            ready.wait()
+            self._loop, self._thread = loop, t
+            return loop
+
+    def _call(self, coro: Any, timeout_s: Optional[float]) -> Any:
+        loop = self._ensure_loop()
+        fut = asyncio.run_coroutine_threadsafe(coro, loop)
+        try:
+            return fut.result(timeout=timeout_s)
+        except Exception:
+            fut.cancel()
+            raise
+
+    # ---- browser lifecycle (service thread) ----
+    def _healthy(self) -> bool:
+        try:
+            return self._browser is not None and self._browser.is_connected()
+        except Exception:
+            return False
+
+    async def _launch(self) -> Any:
+        try:
+            return await self._pw.chromium.launch(args=PDF_CHROMIUM_ARGS)
+        except Exception as e:
+            if not _is_missing_browser_error(e):
+                raise
+            # Install Chromium (blocking subprocess) off the loop, then retry once.
+            await asyncio.get_running_loop().run_in_executor(None, lambda: ensure_playwright_chromium(force=True))
+            return await self._pw.chromium.launch(args=PDF_CHROMIUM_ARGS)
+
+    async def _ensure_browser(self) -> None:
+        if self._launch_lock is None:
+            self._launch_lock = asyncio.Lock()
+            self._page_freed = asyncio.Condition()
+        async with self._launch_lock:
+            if self._healthy():
+                return
+            await self._teardown()
+            await asyncio.get_running_loop().run_in_executor(None, ensure_playwright_chromium)
+            if self._pw is None:
+                from playwright.async_api import async_playwright
+                self._pw = await async_playwright().start()
+            self._browser = await self._launch()
+            self._generation += 1
+            self.stats["launches"] += 1
+        async with self._page_freed:
+            self._page_freed.notify_all()
+
+    async def _teardown(self) -> None:
+        idle, self._idle = self._idle, []
+        for _, page in idle:
+            try:
+                await page.context.close()
+            except Exception:
+                pass
+        self._pages_open = 0
+        browser, self._browser = self._browser, None
+        if browser is not None:
+            try:
+                await browser.close()
+            except Exception:
+                pass
+
+    async def _acquire_page(self) -> Tuple[int, Any]:
+        async with self._page_freed:
+            while True:
+                while self._idle:
+                    gen, page = self._idle.pop()
+                    if gen == self._generation and not page.is_closed():
+                        return gen, page
+                    self._pages_open = max(0, self._pages_open - 1)
+                    self.stats["pages_dropped"] += 1
+                if self._pages_open < self.pool_size:
+                    self._pages_open += 1
+                    break
+                await self._page_freed.wait()
+        try:
+            page = await self._browser.new_page(viewport=PDF_VIEWPORT)
+        except Exception:
+            async with self._page_freed:
+                self._pages_open = max(0, self._pages_open - 1)
+                self._page_freed.notify()
+            raise
+        self.stats["pages_created"] += 1
+        return self._generation, page
+
+    async def _release_page(self, gen: int, page: Any, reuse: bool) -> None:
+        if not reuse or gen != self._generation or page.is_closed():
+            try:
+                await page.context.close()
+            except Exception:
+                pass
+            async with self._page_freed:
+                if gen == self._generation:
+                    self._pages_open = max(0, self._pages_open - 1)
+                self.stats["pages_dropped"] += 1
+                self._page_freed.notify()
+            return
+        async with self._page_freed:
+            self._idle.append((gen, page))
+            self._page_freed.notify()
+
+    async def _render(self, html: str) -> bytes:
+        last_exc: Optional[BaseException] = None
+        for _ in range(2):
+            await self._ensure_browser()
+            gen, page = await self._acquire_page()
+            ok = False
+            try:
+                await page.set_content(html or "", wait_until="networkidle")
+                pdf_bytes = await page.pdf(**PDF_OPTIONS)
+                ok = True
+                self.stats["renders"] += 1
+                return pdf_bytes
+            except Exception as e:
+                last_exc = e
+                # Retry only if the browser itself went away mid-render.
+                if self._healthy():
+                    break
+            finally:
+                await self._release_page(gen, page, reuse=ok)
+        self.stats["failures"] += 1
+        raise last_exc if last_exc is not None else RuntimeError("PDF render failed.")
+
+    async def _render_many(self, htmls: List[str]) -> List[Any]:
+        return await asyncio.gather(*[self._render(h) for h in htmls], return_exceptions=True)
+
+    async def _ping(self) -> Dict[str, Any]:
+        await self._ensure_browser()
+        gen, page = await self._acquire_page()
+        ok = False
+        try:
+            ok = (await page.evaluate("1 + 1")) == 2
+            return {"ok": ok, "browser_version": self._browser.version}
+        finally:
+            await self._release_page(gen, page, reuse=ok)
+
+    # ---- public API (any thread) ----
+    def render(self, html: str, timeout_s: Optional[float] = None) -> bytes:
+        return self._call(self._render(html), timeout_s or PDF_RENDER_TIMEOUT_S)
+
+    def render_batch(self, htmls: List[str], timeout_s: Optional[float] = None) -> List[Any]:
+        """Render many documents concurrently on the pool. Returns bytes or the Exception per input, in order."""
+        htmls = list(htmls or [])
+        if not htmls:
+            return []
+        budget = (timeout_s or PDF_RENDER_TIMEOUT_S) * max(1, -(-len(htmls) // self.pool_size))
+        return self._call(self._render_many(htmls), budget)
+
+    def health_check(self, timeout_s: float = 30.0) -> Dict[str, Any]:
+        """Round-trip a page evaluation (launching/relaunching if needed) and report pool state."""
+        try:
+            out = self._call(self._ping(), timeout_s)
+        except Exception as e:
+            out = {"ok": False, "error": str(e)}
+        out.update({"pages_open": self._pages_open, "pages_idle": len(self._idle), **self.stats})
+        return out
+
+    def shutdown(self, timeout_s: float = 10.0) -> None:
+        loop = self._loop
+        if loop is None:
+            return
+
+        async def _close() -> None:
+            await self._teardown()
+            if self._pw is not None:
+                try:
+                    await self._pw.stop()
+                except Exception:
+                    pass
+                self._pw = None
+
+        try:
+            asyncio.run_coroutine_threadsafe(_close(), loop).result(timeout=timeout_s)
+        except Exception:
+            pass
+        loop.call_soon_threadsafe(loop.stop)
+        self._loop = None
+
+
+_SERVICE: Optional[PdfBrowserService] = None
+_SERVICE_LOCK = threading.Lock()
+
+
+def pdf_browser_service() -> PdfBrowserService:
+    """The shared PdfBrowserService (one per process; shut down at interpreter exit)."""
+    global _SERVICE
+    with _SERVICE_LOCK:
+        if _SERVICE is None:
+            import atexit
+            _SERVICE = PdfBrowserService(PDF_POOL_SIZE)
+            atexit.register(_SERVICE.shutdown)
+        return _SERVICE
+
+
+def html_to_pdf_bytes(html: str) -> bytes:
+    """Render the Preview HTML to a PDF using the warm Playwright Chromium service."""
+    if not PLAYWRIGHT_AVAILABLE:
+        raise RuntimeError("Playwright is not available.")
+    return pdf_browser_service().render(html or "")
+
+
+def html_to_pdf_batch(htmls: List[str]) -> List[Any]:
+    """Render several HTML documents (e.g. month-end runs); returns PDF bytes or an Exception per input."""
+    if not PLAYWRIGHT_AVAILABLE:
+        raise RuntimeError("Playwright is not available.")
+    return pdf_browser_service().render_batch([h or "" for h in (htmls or [])])
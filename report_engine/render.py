@@ -0,0 +1,563 @@
+"""Email rendering: template, signatures, section HTML and .eml packaging."""
+
+import base64
+import email.utils
+import functools
+import io
+import os
+import re
+import uuid
+from email.mime.image import MIMEImage
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from typing import Dict, Optional, List, Tuple, Any
+
+from .lazy import require_module
+
+
+# --- Email signature presets (optional) ---
+SIGNATURE_OPTIONS = ["None", "Kevin", "Simon", "Alisa", "Billy"]
+
+SIGNATURE_DATA = {
+    "Kevin": {
+        "name": "Kevin Osborne",
+        "title": "",
+        "phone": "",
+        "org": "Metamend Digital Marketing",
+        "linkedin": "",
+    },
+    "Simon": {
+        "name": "Simon Vreeswijk",
+        "title": "",
+        "phone": "",
+        "org": "Metamend Digital Marketing",
+        "linkedin": "",
+    },
+    "Alisa": {
+        "name": "Alisa Miriev",
+        "title": "Digital Marketing Analyst",
+        "phone": "M: (416) 902-3245",
+        "org": "Metamend Digital Marketing",
+        "linkedin": "",
+    },
+    "Billy": {
+        "name": "Billy Gacek",
+        "title": "Paid Search Manager",
+        "phone": "M: 1.778.875.8558",
+        "org": "Metamend Digital Marketing",
+        "linkedin": "https://www.linkedin.com/in/billygacek/",
+    },
+}
+
+# Metamend logo for signatures (CID: sig_logo); read from disk on first use.
+SIGNATURE_LOGO_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "templates", "signature_logo.png")
+
+
+@functools.lru_cache(maxsize=1)
+def load_signature_logo() -> bytes:
+    """Signature logo PNG bytes (empty if the file is missing)."""
+    try:
+        with open(SIGNATURE_LOGO_PATH, "rb") as f:
+            return f.read()
+    except Exception:
+        return b""
+
+def render_signature_html(choice: str) -> str:
+    """Return Outlook-friendly signature HTML (Aptos 12px)."""
+    if not choice or choice == "None":
+        return ""
+    sig = SIGNATURE_DATA.get(choice)
+    if not sig:
+        return ""
+    # Inline styles for maximum email client compatibility
+    font = "font-family:Aptos, 'Segoe UI', Arial, sans-serif; font-size:12pt; mso-ansi-font-size:12pt; mso-bidi-font-size:12pt; color:#000;"
+    name_html = html_escape(sig.get("name",""))
+    title_html = html_escape(sig.get("title",""))
+    phone_html = html_escape(sig.get("phone",""))
+    org_html = html_escape(sig.get("org",""))
+    linkedin = (sig.get("linkedin") or "").strip()
+    linkedin_html = ""
+    if linkedin:
+        href = html_escape(linkedin)
+        linkedin_html = f'<div style="margin:2px 0 0 0; padding:0;"><a href="{href}" style="color:#0563C1; text-decoration:underline;">Linkedin</a></div>'
+    # Only include lines that exist (Simon has no phone; Kevin has only org)
+    title_line = f'<div style="margin:2px 0 0 0; padding:0;">{title_html}</div>' if title_html else ""
+    phone_line = f'<div style="margin:2px 0 0 0; padding:0;">{phone_html}</div>' if phone_html else ""
+    org_line = f'<div style="margin:2px 0 0 0; padding:0;">{org_html}</div>' if org_html else ""
+    return f"""
+    <div style="margin-top:16px;">
+      <div style="{font}">
+        <div style="font-weight:700; margin:0; padding:0;">{name_html}</div>
+        {title_line}
+        {org_line}
+        {phone_line}
+        {linkedin_html}
+        <div style="margin-top:8px;">
+          <img src="cid:sig_logo" alt="Metamend" style="display:block; height:34px; border:0; outline:none; text-decoration:none;" />
+        </div>
+      </div>
+    </div>
+    """
+TEMPLATE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "templates", "monthly_email_template.html")
+
+DEFAULT_TEMPLATE_HTML = """<!doctype html>
+<html>
+  <body style="margin:0;padding:0;background:#ffffff;">
+    <table role="presentation" width="100%" cellspacing="0" cellpadding="0" style="border-collapse:collapse;background:#ffffff;">
+      <tr>
+        <!-- Left-aligned, full-width email body (no centered card). -->
+        <td style="padding:18px 24px;background:#ffffff;
+                   font-family:Aptos,Calibri,Arial,Helvetica,sans-serif;
+                   font-size:12pt;line-height:1.45;color:#111827;
+                   mso-fareast-font-family:Aptos;mso-bidi-font-family:Aptos;
+                   mso-line-height-rule:exactly;">
+
+          <!-- Title -->
+          <div style="font-size:16pt;color:#1257c7;margin:0 0 4px 0;">{{CLIENT_NAME}} - SEO Monthly Update</div>
+          <div style="font-size:10.5pt;color:#6b7280;margin:0 0 14px 0;">{{MONTH_LABEL}} · {{WEBSITE}}</div>
+
+          <!-- Overview -->
+          <div style="white-space:pre-wrap;margin:0 0 12px 0;">{{MONTHLY_OVERVIEW}}</div>
+
+          <!-- DashThis (near the top) -->
+          <div style="margin:0 0 12px 0;">
+            <strong>DashThis Analytics dashboard:</strong>
+            <a href="{{DASHTHIS_URL}}" style="color:#0b5bd3;font-weight:700;text-decoration:underline;">View live performance</a>
+          </div>
+
+          <!-- Divider -->
+          <hr style="border:0;border-top:1px solid #d1d5db;margin:12px 0;" />
+
+          <!-- Sections (no nested tables; inherit font) -->
+          {{SECTION_KEY_HIGHLIGHTS}}
+          <hr style="border:0;border-top:1px solid #d1d5db;margin:12px 0;" />
+
+          {{SECTION_WINS_PROGRESS}}
+          <hr style="border:0;border-top:1px solid #d1d5db;margin:12px 0;" />
+
+          {{SECTION_BLOCKERS}}
+          <hr style="border:0;border-top:1px solid #d1d5db;margin:12px 0;" />
+
+          {{SECTION_COMPLETED_TASKS}}
+          <hr style="border:0;border-top:1px solid #d1d5db;margin:12px 0;" />
+
+          {{SECTION_OUTSTANDING_TASKS}}
+
+
+          <!-- Closing line (keep minimal; Outlook signature should follow naturally) -->
+          <div style="margin:14px 0 0 0;">Please let me know if you have any questions.</div>
+
+<div style="margin:14px 0 0 0;">Thank you!</div>
+
+        </td>
+      </tr>
+    </table>
+  </body>
+</html>
+"""
+
+
+def load_template() -> str:
+    """Load HTML template from disk; fall back to embedded template on failure."""
+    try:
+        with open(TEMPLATE_PATH, "r", encoding="utf-8") as f:
+            return f.read()
+    except Exception:
+        return DEFAULT_TEMPLATE_HTML
+
+
+@functools.lru_cache(maxsize=1)
+def get_template_html() -> str:
+    """The email template, read from disk once on first render (not at import)."""
+    return load_template()
+
+
+def __getattr__(name: str) -> Any:
+    # TEMPLATE_HTML used to be read at import time; keep the name working lazily.
+    if name == "TEMPLATE_HTML":
+        return get_template_html()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def html_escape(s: str) -> str:
+    return (s or "").replace("&","&amp;").replace("<","&lt;").replace(">","&gt;")
+
+def bullets_to_html(items: List[str]) -> str:
+    items = [i.strip() for i in (items or []) if i and i.strip()]
+    if not items:
+        return ""
+    # Keep styles minimal so Outlook inherits the user's default font (e.g., Aptos).
+    lis = "\n".join([f'<li style="margin:6px 0;">{html_escape(i)}</li>' for i in items])
+    return f'<ul style="margin:8px 0 0 20px;padding:0;">{lis}</ul>'
+
+def _format_gsc_opportunity_item(row: Any) -> str:
+    """Format a GSC opportunity row dict into a concise string.
+
+    Expected row shape: {"item": str, "impressions": int/str, "ctr": "0.80%" or float, "position": float/str}
+    Safe for partial/missing keys.
+    """
+    if isinstance(row, str):
+        return row.strip()
+    if not isinstance(row, dict):
+        return str(row).strip()
+    item = str(row.get("item") or "").strip()
+    if not item:
+        item = str(row.get("query") or row.get("page") or row.get("url") or "").strip()
+    if not item:
+        return ""
+    imps = row.get("impressions")
+    ctr = row.get("ctr")
+    pos = row.get("position")
+    parts = []
+    try:
+        if imps not in (None, "", 0, "0"):
+            parts.append(f"{int(float(str(imps).replace(',',''))):,} impressions")
+    except Exception:
+        if str(imps).strip():
+            parts.append(f"{str(imps).strip()} impressions")
+    # CTR formatting
+    try:
+        if isinstance(ctr, str) and ctr.strip():
+            c = ctr.strip()
+            # normalize "0.008" or "0.8" into percent if it looks numeric and <= 1
+            if re.match(r"^-?\d+(\.\d+)?$", c):
+                val = float(c)
+                if val <= 1.0:
+                    parts.append(f"{val:.2%} CTR")
+                else:
+                    parts.append(f"{val:.2f}% CTR")
+            else:
+                parts.append(f"{c} CTR" if "CTR" not in c.upper() else c)
+        elif ctr is not None and ctr != "":
+            val = float(ctr)
+            if val <= 1.0:
+                parts.append(f"{val:.2%} CTR")
+            else:
+                parts.append(f"{val:.2f}% CTR")
+    except Exception:
+        pass
+    # Position
+    try:
+        if pos not in (None, ""):
+            parts.append(f"avg pos {round(float(pos), 1)}")
+    except Exception:
+        if str(pos).strip():
+            parts.append(f"avg pos {str(pos).strip()}")
+    if parts:
+        return f"{item} — " + ", ".join(parts)
+    return item
+
+def _derive_top_opportunities_from_insight(insight_payload: Any, max_items: int = 5) -> Dict[str, List[str]]:
+    """Derive Top Opportunities lists from INSIGHT_MODEL.data_signals opportunity arrays."""
+    out = {"queries": [], "pages": []}
+    if not isinstance(insight_payload, dict):
+        return out
+    ds = insight_payload.get("data_signals") or {}
+    if not isinstance(ds, dict):
+        return out
+
+    def _take_unique(rows: Any) -> List[str]:
+        if not isinstance(rows, list):
+            return []
+        seen = set()
+        items = []
+        for r in rows:
+            s = _format_gsc_opportunity_item(r)
+            if not s:
+                continue
+            key = s.lower()
+            if key in seen:
+                continue
+            seen.add(key)
+            items.append(s)
+            if len(items) >= max_items:
+                break
+        return items
+
+    out["queries"] = _take_unique(ds.get("opportunity_queries") or [])
+    out["pages"] = _take_unique(ds.get("opportunity_pages") or [])
+    return out
+
+def top_opportunities_subsection_html(top_opportunities: Any) -> str:
+    """Render the Top Opportunities subsection HTML to be placed inside the Main KPI's section."""
+    if not isinstance(top_opportunities, dict):
+        return ""
+    q = top_opportunities.get("queries") or []
+    p = top_opportunities.get("pages") or []
+    if not isinstance(q, list):
+        q = []
+    if not isinstance(p, list):
+        p = []
+    q = [str(x).strip() for x in q if str(x).strip()][:5]
+    p = [str(x).strip() for x in p if str(x).strip()][:5]
+    if not q and not p:
+        return ""
+    # Use existing list helper for consistent bullet styling.
+    q_html = bullets_to_html(q)
+    p_html = bullets_to_html(p)
+    parts = ['<div style="margin:10px 0 0 0;">',
+             '<div style="font-weight:700;margin:0 0 6px 0;">Top Opportunities</div>']
+    if q_html:
+        parts.append('<div style="margin:0 0 6px 0;"><div style="font-weight:600;">Queries</div>' + q_html + '</div>')
+    if p_html:
+        parts.append('<div style="margin:0;"><div style="font-weight:600;">Pages</div>' + p_html + '</div>')
+    parts.append('</div>')
+    return "".join(parts)
+
+
+def section_block(title: str, body_html: str) -> str:
+    if not body_html.strip():
+        return ""
+    # Use simple div blocks (not nested tables) and inherit typography from the template wrapper.
+    return f"""
+<div style="margin:0 0 12px 0;">
+  <div style="font-weight:700;margin:0 0 6px 0;">{html_escape(title)}</div>
+  <div style="margin:0;">{body_html}</div>
+</div>
+""".strip()
+
+def image_block(cid: str, caption: str = "") -> str:
+    cap = ""
+    if (caption or "").strip():
+        cap = f'<div style="font-size:10.5pt;color:#374151;margin-top:6px;line-height:1.35;font-style:italic;">{html_escape(caption)}</div>'
+    return f"""
+<div style="margin:10px 0 12px 0;">
+  <img src="cid:{cid}" style="width:100%;height:auto;max-width:900px;border:1px solid #e5e7eb;display:block;" />
+  {cap}
+</div>
+""".strip()
+
+def build_eml(subject: str, html_body: str, images) -> bytes:
+    """Build an Outlook-friendly .eml file.
+
+    Always returns bytes. Images are optional; when provided, they are attached inline
+    with Content-ID so the HTML can reference them (cid:...).
+    """
+    msg = MIMEMultipart("related")
+    msg["Subject"] = subject or "SEO Monthly Update"
+    msg["To"] = msg.get("To", "")
+    msg["From"] = msg.get("From", os.getenv("DEFAULT_FROM_EMAIL", "kosborne@metamend.com"))
+    msg["Date"] = email.utils.formatdate(localtime=True)
+    # Make .eml open as an editable draft in Outlook-compatible clients
+    msg["X-Unsent"] = "1"
+    msg["X-Unsent-Flag"] = "1"
+    msg["MIME-Version"] = "1.0"
+
+    # HTML body (required)
+    msg.attach(MIMEText(html_body or "", "html", "utf-8"))
+
+    # Inline images (optional)
+    if images:
+        for cid, b in images:
+            # Normalize payload to bytes
+            data_bytes = b
+            if isinstance(data_bytes, dict):
+                data_bytes = data_bytes.get("bytes") or data_bytes.get("data") or b""
+            if isinstance(data_bytes, str):
+                # data URL or base64 string
+                try:
+                    import base64
+                    if data_bytes.startswith("data:image"):
+                        _, encoded = data_bytes.split(",", 1)
+                        data_bytes = base64.b64decode(encoded)
+                    else:
+                        data_bytes = base64.b64decode(data_bytes)
+                except Exception:
+                    data_bytes = b""
+            if isinstance(data_bytes, (bytearray, memoryview)):
+                data_bytes = bytes(data_bytes)
+            if not isinstance(data_bytes, (bytes,)) or not data_bytes:
+                continue
+
+            subtype = _detect_image_subtype(data_bytes)
+            if not subtype:
+                # Skip unknown/invalid image data but still produce a valid .eml
+                continue
+
+            img = MIMEImage(data_bytes, _subtype=subtype)
+            safe_cid = str(cid or "").strip() or f"image-{uuid.uuid4().hex[:8]}"
+            img.add_header("Content-ID", f"<{safe_cid}>")
+            img.add_header("Content-Disposition", "inline", filename=f"{safe_cid}.{subtype}")
+            msg.attach(img)
+
+    return msg.as_bytes()
+
+def _detect_image_subtype(data: bytes) -> str | None:
+    """Detect image subtype for MIMEImage without using imghdr (removed in Python 3.13)."""
+    # Prefer Pillow if available (most reliable)
+    try:
+        Image = require_module("PIL.Image")
+        with Image.open(io.BytesIO(data)) as img:
+            fmt = (img.format or "").lower().strip()
+            if fmt == "jpg":
+                return "jpeg"
+            return fmt or None
+    except Exception:
+        pass
+
+    # Fallback: magic bytes
+    if data.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "png"
+    if data.startswith(b"\xff\xd8\xff"):
+        return "jpeg"
+    if data.startswith(b"RIFF") and len(data) >= 12 and data[8:12] == b"WEBP":
+        return "webp"
+    if data.startswith(b"GIF87a") or data.startswith(b"GIF89a"):
+        return "gif"
+    return None
+
+
+EMAIL_SECTION_KEYS = ["key_highlights", "main_kpis", "wins_progress", "blockers", "completed_tasks", "outstanding_tasks"]
+
+
+def seed_image_placement(email_json: Dict[str, Any], image_assignments: Dict[str, str], image_captions: Dict[str, str]) -> None:
+    """Seed screenshot placement/captions from the draft's image_captions suggestions (existing choices win)."""
+    for item in (email_json.get("image_captions") or []):
+        fn = (item.get("file_name") or "").strip()
+        if fn:
+            suggested = (item.get("suggested_section") or "").strip()
+            if suggested not in EMAIL_SECTION_KEYS:
+                suggested = "key_highlights"
+            image_assignments.setdefault(fn, suggested)
+            image_captions.setdefault(fn, item.get("caption") or "")
+
+
+def render_email_html(
+    sections: Dict[str, Any],
+    client_name: str = "",
+    month_label: str = "",
+    website: str = "",
+    dashthis_url: str = "",
+    recipient_first_name: str = "",
+    opening_line: str = "",
+    signature_choice: str = "None",
+    images: Optional[Dict[str, bytes]] = None,
+    image_assignments: Optional[Dict[str, str]] = None,
+    image_captions: Optional[Dict[str, str]] = None,
+    template_html: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Fill the email template from (edited) draft sections.
+
+    sections: monthly_overview, dashthis_line (str); key_highlights, main_kpis,
+    wins_progress, blockers, completed_tasks, outstanding_tasks (list of lines);
+    top_opportunities ({"queries": [...], "pages": [...]}).
+    images: {filename: bytes} for uploaded screenshots; placed per image_assignments.
+
+    Returns {"html": email HTML with cid: images, "preview_html": same with data URIs,
+    "image_parts": [(cid, bytes)], "image_mimes": {cid: mime}}.
+    """
+    template = get_template_html() if template_html is None else template_html
+    image_assignments = image_assignments or {}
+    image_captions = image_captions or {}
+
+    def _items(key: str) -> List[str]:
+        return [str(x).strip() for x in (sections.get(key) or []) if str(x).strip()]
+
+    sec_high = section_block("Key highlights", bullets_to_html(_items("key_highlights")))
+
+    # Standalone Top Opportunities section HTML (for templates that support a dedicated placeholder).
+    sec_top_opps = ""
+    try:
+        top_opps = sections.get("top_opportunities") or {}
+        _q = top_opps.get("queries") or []
+        _p = top_opps.get("pages") or []
+        _q = [str(x).strip() for x in _q if str(x).strip()][:5]
+        _p = [str(x).strip() for x in _p if str(x).strip()][:5]
+        if _q or _p:
+            _parts = []
+            if _q:
+                _parts.append('<div style="font-weight:700;margin:0 0 6px 0;">Queries (Top 5)</div>')
+                _parts.append(bullets_to_html(_q))
+            if _p:
+                _parts.append('<div style="font-weight:700;margin:12px 0 6px 0;">Pages (Top 5)</div>')
+                _parts.append(bullets_to_html(_p))
+            sec_top_opps = section_block("Top Opportunities", "\n".join(_parts))
+    except Exception:
+        sec_top_opps = ""
+
+    # Main KPI's section: KPIs only (Top Opportunities is rendered as its own section when supported).
+    sec_kpis = section_block("Main KPI\'s", bullets_to_html(_items("main_kpis")))
+
+    sec_wins = section_block("Wins & progress", bullets_to_html(_items("wins_progress")))
+    sec_blk = section_block("Blockers / risks", bullets_to_html(_items("blockers")))
+    sec_done = section_block("Completed tasks", bullets_to_html(_items("completed_tasks")))
+    sec_next = section_block("Outstanding / rolling", bullets_to_html(_items("outstanding_tasks")))
+
+    # Build CID map for all uploaded images (even if not placed, .eml can include; HTML will only reference placed)
+    uploaded_map = {fn: b for fn, b in (images or {}).items() if fn.lower().endswith((".png", ".jpg", ".jpeg"))}
+    cids: Dict[str, str] = {}
+    image_parts: List[Tuple[str, bytes]] = []
+    image_mimes: Dict[str, str] = {}
+    for i, fn in enumerate(sorted(uploaded_map.keys())):
+        cid = f"img{i+1}"
+        cids[fn] = cid
+        image_parts.append((cid, uploaded_map[fn]))
+        ext = fn.lower().rsplit(".", 1)[-1]
+        image_mimes[cid] = "image/png" if ext == "png" else "image/jpeg"
+
+    def append_images(section_html: str, section_key: str) -> str:
+        out = [section_html] if section_html else []
+        for fn, sec in image_assignments.items():
+            if sec == section_key and fn in cids:
+                out.append(image_block(cids[fn], image_captions.get(fn, "")))
+        return "\n".join([x for x in out if x])
+
+    sec_high = append_images(sec_high, "key_highlights")
+    sec_kpis = append_images(sec_kpis, "main_kpis")
+    sec_wins = append_images(sec_wins, "wins_progress")
+    sec_blk = append_images(sec_blk, "blockers")
+    sec_done = append_images(sec_done, "completed_tasks")
+    sec_next = append_images(sec_next, "outstanding_tasks")
+
+    # Greeting block (optional): salutation + opening line (both editable)
+    rec = (recipient_first_name or "").strip()
+    opener = (opening_line or "").strip()
+    greeting_parts = []
+    if rec:
+        greeting_parts.append(f'<div style="margin:0 0 6px 0;">Hi {html_escape(rec)},</div>')
+    if opener:
+        greeting_parts.append(f'<div style="margin:0 0 12px 0;">{html_escape(opener)}</div>')
+    greeting_block_html = "\n".join(greeting_parts) if greeting_parts else ""
+
+    # Signature block (optional) appended at bottom of email
+    signature_block_html = render_signature_html(signature_choice)
+
+    # If a signature is selected, embed the signature logo as an inline CID image so it renders in Outlook and Preview.
+    if signature_choice and signature_choice != "None" and signature_block_html:
+        # Fail quietly: signature will render without the logo rather than breaking generation/export.
+        _sig_bytes = load_signature_logo()
+        if _sig_bytes:
+            image_parts.append(("sig_logo", _sig_bytes))
+            image_mimes["sig_logo"] = "image/png"
+
+    # Template compatibility: some templates include an explicit Top Opportunities placeholder.
+    # If missing, append the Top Opportunities section directly after Main KPI's.
+    _main_kpis_block = sec_kpis
+    if "{{SECTION_TOP_OPPORTUNITIES}}" not in template:
+        _main_kpis_block = sec_kpis + "\n" + sec_top_opps
+
+    html_out = (template
+        .replace("{{CLIENT_NAME}}", html_escape((client_name or "").strip() or "Client"))
+        .replace("{{MONTH_LABEL}}", html_escape((month_label or "").strip() or "Monthly"))
+        .replace("{{WEBSITE}}", html_escape((website or "").strip() or ""))
+        .replace("{{GREETING_BLOCK}}", greeting_block_html)
+        .replace("{{SIGNATURE_BLOCK}}", signature_block_html)
+        .replace("{{MONTHLY_OVERVIEW}}", html_escape(sections.get("monthly_overview") or ""))
+        .replace("{{DASHTHIS_URL}}", html_escape((dashthis_url or "").strip() or ""))
+        .replace("{{DASHTHIS_LINE}}", html_escape(sections.get("dashthis_line") or ""))
+        .replace("{{SECTION_KEY_HIGHLIGHTS}}", sec_high)
+        .replace("{{SECTION_MAIN_KPIS}}", _main_kpis_block)
+        .replace("{{SECTION_TOP_OPPORTUNITIES}}", sec_top_opps)
+        .replace("{{SECTION_WINS_PROGRESS}}", sec_wins)
+        .replace("{{SECTION_BLOCKERS}}", sec_blk)
+        .replace("{{SECTION_COMPLETED_TASKS}}", sec_done)
+        .replace("{{SECTION_OUTSTANDING_TASKS}}", sec_next)
+    )
+
+    # Build a preview-friendly HTML where cid: images are replaced with data URIs.
+    preview_html = html_out
+    for cid, b in image_parts:
+        mime = image_mimes.get(cid, "image/png")
+        data_uri = f"data:{mime};base64," + base64.b64encode(b).decode("utf-8")
+        preview_html = preview_html.replace(f"cid:{cid}", data_uri)
+
+    return {"html": html_out, "preview_html": preview_html, "image_parts": image_parts, "image_mimes": image_mimes}
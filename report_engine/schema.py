@@ -0,0 +1,162 @@
+"""Table schema inference: classify each table's columns into roles once, cached by header tuple.
+
+Signals, breakdowns and fallbacks used to re-run header matching (normalization,
+plural variants, substring and token scans) for every metric on every pass. Here a
+table's headers are classified once into roles (clicks, impressions, ctr, position,
+date, query, page, ..., plus a fallback "dimension") and the result is memoized by
+the header tuple, so every table with the same export layout shares one schema.
+
+Matching rules are those of _find_col: for each role, the first header (left to
+right) that equals, contains or is contained in any needle variant wins. Roles are
+resolved independently, in ROLE_NEEDLES order, so the mapping is deterministic for a
+given header tuple.
+"""
+
+import functools
+import re
+from typing import Dict, Optional, List, Tuple, Any
+
+
+# Role -> header needles (matched with singular/plural variants, substrings and tokens).
+ROLE_NEEDLES: Dict[str, Tuple[str, ...]] = {
+    "clicks": ("clicks",),
+    "impressions": ("impressions",),
+    "ctr": ("ctr",),
+    "position": ("position", "avg position"),
+    "date": ("date",),
+    "query": ("query", "queries", "top queries", "top query"),
+    "page": ("top pages", "pages", "page", "url"),
+    "country": ("country",),
+    "device": ("device",),
+    "search_appearance": ("search appearance", "appearance"),
+    "sessions": ("sessions",),
+    "conversions": ("conversions", "key events"),
+    "revenue": ("revenue",),
+}
+
+# A header containing any of these is a metric, never the fallback "dimension" column.
+METRIC_HEADER_HINTS = ("click", "impression", "ctr", "position", "avg position")
+
+SCHEMA_CACHE_SIZE = 512
+
+
+def _norm_header(s: Any) -> str:
+    s = str(s or "").strip().lower()
+    s = re.sub(r"[\s\u00A0]+", " ", s)
+    s = re.sub(r"[^a-z0-9 ]+", "", s)
+    return s.strip()
+
+
+def _needle_variants(n: str) -> List[str]:
+    n = _norm_header(n)
+    out = [n]
+    # basic pluralization helpers
+    if n.endswith("y"):
+        out.append(n[:-1] + "ies")
+    if not n.endswith("s"):
+        out.append(n + "s")
+    if n.endswith("s"):
+        out.append(n[:-1])
+    return [v for i, v in enumerate(out) if v and v not in out[:i]]
+
+
+@functools.lru_cache(maxsize=SCHEMA_CACHE_SIZE)
+def _normalized_headers(headers: Tuple[str, ...]) -> Tuple[Tuple[str, Tuple[str, ...]], ...]:
+    return tuple((h, tuple(h.split())) for h in (_norm_header(x) for x in headers))
+
+
+@functools.lru_cache(maxsize=4096)
+def _find_col_cached(headers: Tuple[str, ...], needles: Tuple[str, ...]) -> Optional[int]:
+    needles_v: List[Tuple[str, Tuple[str, ...]]] = []
+    for n in needles:
+        needles_v.extend((v, tuple(v.split())) for v in _needle_variants(n))
+
+    for i, (h, h_tokens) in enumerate(_normalized_headers(headers)):
+        for n, n_tokens in needles_v:
+            if h == n:
+                return i
+            # substring match both directions to catch 'top queries' vs 'query'
+            if n in h or h in n:
+                return i
+            # token containment (e.g., 'top queries' contains token 'queries')
+            if all(tok in h_tokens for tok in n_tokens):
+                return i
+    return None
+
+
+def _find_col(headers: List[str], needles: List[str]) -> Optional[int]:
+    """Return the column index whose header matches any needle.
+
+    Robustness improvements:
+    - Accept singular/plural variants (query/queries, country/countries, etc.)
+    - Accept 'Top queries' style headers (needle is substring-ish)
+    - Normalize whitespace + punctuation
+    Results are memoized by (headers, needles).
+    """
+    return _find_col_cached(tuple(str(h) for h in headers), tuple(needles))
+
+
+class TableSchema:
+    """Inferred column roles for one header tuple. Shared between tables; treat as read-only."""
+
+    def __init__(self, headers: Tuple[str, ...]):
+        self.headers = headers
+        self.roles: Dict[str, Optional[int]] = {role: _find_col_cached(headers, needles) for role, needles in ROLE_NEEDLES.items()}
+        # Fallback dimension: the first column that is not a metric.
+        self.roles["dimension"] = next(
+            (i for i, h in enumerate(headers) if not any(m in h.lower() for m in METRIC_HEADER_HINTS)),
+            None,
+        )
+
+    def index(self, role: str) -> Optional[int]:
+        return self.roles.get(role)
+
+    def key(self, role: str) -> Optional[str]:
+        """Header label for a role (the row/column key), or None if no column has it."""
+        i = self.roles.get(role)
+        return self.headers[i] if i is not None else None
+
+    def has(self, *roles: str) -> bool:
+        return all(self.roles.get(r) is not None for r in roles)
+
+    def columns(self) -> List[Dict[str, Any]]:
+        """Per column: its header and every role resolved to it (debug view)."""
+        by_col: Dict[int, List[str]] = {}
+        for role, i in self.roles.items():
+            if i is not None:
+                by_col.setdefault(i, []).append(role)
+        return [{"column": h, "roles": by_col.get(i, [])} for i, h in enumerate(self.headers)]
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {"headers": list(self.headers), "roles": dict(self.roles), "columns": self.columns()}
+
+
+@functools.lru_cache(maxsize=SCHEMA_CACHE_SIZE)
+def _infer_schema_cached(headers: Tuple[str, ...]) -> TableSchema:
+    return TableSchema(headers)
+
+
+def infer_schema(headers: List[Any]) -> TableSchema:
+    """Schema for a table's headers (memoized by the header tuple)."""
+    return _infer_schema_cached(tuple(str(h) for h in (headers or [])))
+
+
+def schema_cache_info() -> Dict[str, Any]:
+    info = _infer_schema_cached.cache_info()
+    return {"hits": info.hits, "misses": info.misses, "size": info.currsize, "max_size": info.maxsize}
+
+
+def describe_table_schemas(supporting_context: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Inferred schema of every parsed table, for the Debug tab."""
+    out: List[Dict[str, Any]] = []
+    for t in (supporting_context or {}).get("tables") or []:
+        headers = (t.get("table") or {}).get("headers") or []
+        schema = infer_schema(headers)
+        out.append({
+            "filename": t.get("filename"),
+            "sheet": t.get("sheet") or t.get("type"),
+            "kind": t.get("_gsc_kind") or "",
+            "roles": {r: schema.key(r) for r, i in schema.roles.items() if i is not None},
+            "columns": schema.columns(),
+        })
+    return out
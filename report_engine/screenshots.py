@@ -0,0 +1,342 @@
+"""Screenshot summaries (Layer B input) and SEO observations derived from them."""
+
+import hashlib
+import os
+from typing import TYPE_CHECKING, Dict, Optional, List, Tuple, Any
+
+if TYPE_CHECKING:  # the SDK is only needed by callers that construct a client
+    from openai import OpenAI
+
+from .utils import _json_deepcopy, _safe_json_load
+from .caching import REPORT_CACHE_DIR, _JsonDirStore, _TieredCache, _env_flag
+from .images import _image_data_url_for_model
+from .llm import _responses_create
+from .tracing import span, submit_in_context
+
+
+def _build_screenshot_summary_text(item: dict) -> str:
+    """Build a concise, report-friendly summary string from a screenshot summary dict.
+
+    Accepts flexible shapes. Prefers explicit 'summary' / 'extracted_summary' fields,
+    otherwise composes from common keys like stats/issues/urls/movers/notes.
+    """
+    if not isinstance(item, dict):
+        return str(item)
+
+    # If an explicit summary exists, use it
+    for k in ("summary", "extracted_summary", "summary_text", "description"):
+        v = item.get(k)
+        if isinstance(v, str) and v.strip():
+            return v.strip()
+
+    parts = []
+
+    def _take_str(key):
+        v = item.get(key)
+        if isinstance(v, str) and v.strip():
+            parts.append(v.strip())
+
+    # Common structured keys
+    for key in ("headline", "what_it_shows", "context"):
+        _take_str(key)
+
+    # Stats-like blocks
+    stats = item.get("stats") or item.get("kpis") or item.get("metrics")
+    if isinstance(stats, dict) and stats:
+        # show a few key:value pairs
+        kv = []
+        for kk, vv in list(stats.items())[:6]:
+            kv.append(f"{kk}: {vv}")
+        if kv:
+            parts.append("Stats: " + "; ".join(kv))
+    elif isinstance(stats, list) and stats:
+        # if list of dicts/strings
+        vals = []
+        for s in stats[:6]:
+            if isinstance(s, dict):
+                # try label/value
+                label = s.get("label") or s.get("metric") or s.get("name") or ""
+                value = s.get("value") if "value" in s else s.get("val")
+                if label and value is not None:
+                    vals.append(f"{label}: {value}")
+                else:
+                    vals.append(str(s))
+            else:
+                vals.append(str(s))
+        if vals:
+            parts.append("Stats: " + "; ".join(vals))
+
+    # Notable items (kept neutral; no diagnosis)
+    for key in ("notables", "notes", "highlights"):
+        v = item.get(key)
+        if isinstance(v, list) and v:
+            parts.append("Notes: " + "; ".join([str(x) for x in v[:6]]))
+        elif isinstance(v, str) and v.strip():
+            parts.append(v.strip())
+
+    # Movers / URLs / queries
+    movers = item.get("movers") or item.get("top_movers") or item.get("top_items")
+    if isinstance(movers, list) and movers:
+        # keep very short
+        sample = []
+        for mvr in movers[:5]:
+            if isinstance(mvr, dict):
+                name = mvr.get("name") or mvr.get("title") or mvr.get("url") or mvr.get("query") or ""
+                delta = mvr.get("delta") or mvr.get("change") or mvr.get("pct") or mvr.get("clicks") or ""
+                if name:
+                    sample.append(f"{name} ({delta})" if delta else name)
+                else:
+                    sample.append(str(mvr))
+            else:
+                sample.append(str(mvr))
+        if sample:
+            parts.append("Top items: " + "; ".join(sample))
+
+    # Fallback: stringify a few fields
+    if not parts:
+        for k in ("issues_found", "urls", "queries"):
+            v = item.get(k)
+            if isinstance(v, list) and v:
+                parts.append(f"{k}: " + "; ".join([str(x) for x in v[:6]]))
+
+    return "\n".join(parts).strip()
+
+SCREENSHOT_SUMMARY_SYSTEM = """You are a senior SEO reporting analyst.
+Your job is to extract performance-relevant signals from a screenshot for inclusion in a monthly client report.
+
+Rules:
+- Extract ONLY what is visible in the screenshot. Do not invent metrics, labels, or causes.
+- Do NOT diagnose SEO issues. Do NOT provide recommendations. Do NOT critique UI (e.g., truncated titles).
+- You MAY lightly frame significance in non-causal language (e.g., "suggests", "may indicate", "aligns with").
+- Keep language client-ready and concise.
+
+Return strict JSON with keys:
+- performance_summary (string): 2-5 sentences describing the key visible performance movement/patterns.
+- report_note (string): 1-2 sentences suitable to include in a report (neutral, non-causal).
+- highlights (array of strings): short bullets of notable visible items (e.g., top rising pages/queries, "Previously 0" entries, big deltas).
+- visible_metrics (array of objects): {label, value, context, evidence_ref} for any explicit KPIs/deltas you can read.
+- confidence (Low|Medium|High)
+""".strip()
+SCREENSHOT_CONCURRENCY = int(os.getenv("SCREENSHOT_CONCURRENCY", "4") or 4)
+
+
+# Bump when the summary post-processing changes; prompt text edits are picked up automatically.
+SCREENSHOT_PROMPT_VERSION = "1-" + hashlib.sha256(SCREENSHOT_SUMMARY_SYSTEM.encode("utf-8")).hexdigest()[:12]
+SUMMARY_CACHE_MAX_ITEMS = int(os.getenv("SUMMARY_CACHE_MAX_ITEMS", "512") or 512)
+SUMMARY_DISK_CACHE = _env_flag("SUMMARY_DISK_CACHE", True)
+SUMMARY_DISK_CACHE_MAX_BYTES = 32 * 1024 * 1024
+
+_SUMMARY_CACHE = _TieredCache(
+    SUMMARY_CACHE_MAX_ITEMS,
+    disk=_JsonDirStore(os.path.join(REPORT_CACHE_DIR, "screenshot-summaries"), SUMMARY_DISK_CACHE_MAX_BYTES) if SUMMARY_DISK_CACHE else None,
+)
+
+
+def _screenshot_summary_cache_key(img_bytes: bytes, model: str) -> str:
+    h = hashlib.sha256()
+    h.update(hashlib.sha256(img_bytes or b"").digest())
+    h.update(f"|{model}|{SCREENSHOT_PROMPT_VERSION}".encode("utf-8"))
+    return h.hexdigest()
+
+
+def _summarize_screenshot(
+    client: "OpenAI",
+    model: str,
+    filename: str,
+    img_bytes: bytes,
+    mime: str,
+    timeout_s: Optional[float] = None,
+    max_retries: Optional[int] = None,
+) -> Dict[str, Any]:
+    """Summarize a screenshot into report-ready, non-diagnostic performance notes.
+
+    Successful summaries are cached by image content hash + model + prompt version,
+    so unchanged screenshots cost no API call on re-analysis (or after a restart when
+    the disk tier is enabled).
+    """
+    with span("screenshot_summary", file=filename, bytes=len(img_bytes or b"")) as sp:
+        key = _screenshot_summary_cache_key(img_bytes, model)
+        cached = _SUMMARY_CACHE.get(key)
+        if isinstance(cached, dict):
+            sp.set(cache_hit=True)
+            data = _json_deepcopy(cached)
+            data["file_name"] = filename
+            return data
+
+        data = _summarize_screenshot_uncached(client, model, filename, img_bytes, mime, timeout_s=timeout_s, max_retries=max_retries)
+        if data is not None:
+            _SUMMARY_CACHE.put(key, _json_deepcopy(data))
+            return data
+        sp.set(failed=True)
+
+    return {
+        "file_name": filename,
+        "performance_summary": "",
+        "report_note": "",
+        "highlights": [],
+        "visible_metrics": [],
+        "confidence": "Low",
+    }
+
+
+def _summarize_screenshot_uncached(
+    client: "OpenAI",
+    model: str,
+    filename: str,
+    img_bytes: bytes,
+    mime: str,
+    timeout_s: Optional[float] = None,
+    max_retries: Optional[int] = None,
+) -> Optional[Dict[str, Any]]:
+    """Call the model for one screenshot. Returns None when no usable summary came back."""
+    try:
+        content = [
+            {"type": "input_text", "text": f"Screenshot filename: {filename}"},
+            {"type": "input_image", "image_url": _image_data_url_for_model(img_bytes, mime)},
+        ]
+        resp = _responses_create(
+            client,
+            purpose="screenshot",
+            timeout_s=timeout_s,
+            max_retries=max_retries,
+            model=model,
+            input=[
+                {"role": "system", "content": SCREENSHOT_SUMMARY_SYSTEM},
+                {"role": "user", "content": content},
+            ],
+            temperature=0.2,
+        )
+        data = _safe_json_load(resp.output_text or "")
+        if isinstance(data, dict):
+            # Back-compat: map older schema keys if present
+            if "performance_summary" not in data:
+                # Try to build from common legacy keys
+                legacy_parts = []
+                for k in ("summary", "extracted_summary", "summary_text", "description", "headline", "what_it_shows", "context"):
+                    v = data.get(k)
+                    if isinstance(v, str) and v.strip():
+                        legacy_parts.append(v.strip())
+                # If older stats/issues exist, convert to highlights
+                highlights = data.get("highlights")
+                if not isinstance(highlights, list):
+                    highlights = []
+                if isinstance(data.get("urls_or_topics"), list):
+                    highlights.extend([str(x) for x in data.get("urls_or_topics")[:8]])
+                if isinstance(data.get("stats_found"), list):
+                    for s in data.get("stats_found")[:6]:
+                        if isinstance(s, dict):
+                            lbl = s.get("label") or s.get("metric") or ""
+                            val = s.get("value") if "value" in s else s.get("val")
+                            if lbl and val is not None:
+                                highlights.append(f"{lbl}: {val}")
+                data["highlights"] = highlights[:12]
+                data["performance_summary"] = " ".join(legacy_parts).strip()
+
+            data.setdefault("report_note", "")
+            data.setdefault("highlights", [])
+            data.setdefault("visible_metrics", [])
+            data.setdefault("confidence", "Low")
+
+            # Ensure file_name exists for UI/payload
+            data["file_name"] = str(data.get("file_name") or filename).strip() or filename
+
+            # Normalize confidence
+            c = str(data.get("confidence") or "Low").title()
+            if c not in {"Low", "Medium", "High"}:
+                c = "Low"
+            data["confidence"] = c
+
+            # Hard safety: remove audit-style keys if present
+            for k in ("issues_found", "technical_issues", "content_ux_issues", "serp_market_notes", "other_findings"):
+                if k in data:
+                    data.pop(k, None)
+
+            return data
+    except Exception:
+        pass
+
+    return None
+
+
+def _summarize_screenshots(
+    client: "OpenAI",
+    model: str,
+    image_triplets: List[Tuple[str, bytes, str]],
+    max_concurrency: Optional[int] = None,
+    timeout_s: Optional[float] = None,
+    max_retries: Optional[int] = None,
+    progress_cb: Optional[Any] = None,
+) -> List[Dict[str, Any]]:
+    """Summarize screenshots concurrently; results keep upload order.
+
+    progress_cb(done, total) is invoked on the calling thread as each summary
+    completes, so it is safe to update Streamlit widgets from it.
+    """
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+
+    triplets = list(image_triplets or [])
+    total = len(triplets)
+    results: List[Optional[Dict[str, Any]]] = [None] * total
+    if not total:
+        return []
+
+    workers = max(1, min(int(max_concurrency or SCREENSHOT_CONCURRENCY), total))
+    done = 0
+    with span("screenshots", images=total, workers=workers), \
+            ThreadPoolExecutor(max_workers=workers, thread_name_prefix="screenshot") as pool:
+        futures = {
+            submit_in_context(pool, _summarize_screenshot, client, model, fn, b, mt, timeout_s, max_retries): idx
+            for idx, (fn, b, mt) in enumerate(triplets)
+        }
+        for fut in as_completed(futures):
+            idx = futures[fut]
+            try:
+                results[idx] = fut.result()
+            except Exception:
+                results[idx] = None
+            done += 1
+            if progress_cb is not None:
+                try:
+                    progress_cb(done, total)
+                except Exception:
+                    pass
+
+    out: List[Dict[str, Any]] = []
+    for idx, r in enumerate(results):
+        if not isinstance(r, dict):
+            # _summarize_screenshot never raises, but keep the shape stable regardless.
+            r = {"file_name": triplets[idx][0], "performance_summary": "", "report_note": "",
+                 "highlights": [], "visible_metrics": [], "confidence": "Low"}
+        out.append(r)
+    return out
+
+
+def _build_seo_observations_from_screens(summaries: List[Dict[str, Any]]) -> Dict[str, Any]:
+    obs = {"technical_issues": [], "content_ux_issues": [], "serp_market_notes": [], "other_findings": []}
+    for s in summaries:
+        for iss in (s.get("issues_found") or []):
+            issue = (iss.get("issue") or "").strip()
+            details = (iss.get("details") or "").strip()
+            where = (iss.get("where") or "").strip()
+            sev = (iss.get("severity") or "Medium").title()
+            if sev not in SEVERITY_OPTIONS:
+                sev = "Medium"
+            entry = {
+                "what": issue,
+                "details": details,
+                "where": where,
+                "severity": sev,
+                "evidence_ref": iss.get("evidence_ref") or "Screenshot",
+                "snippet": details[:200] if details else "",
+                "confidence": (s.get("confidence") or "Medium").title(),
+            }
+            low = (issue + " " + details).lower()
+            if any(k in low for k in ["canonical","redirect","index","crawl","schema","duplicate","robots","sitemap","404","5xx","core web vitals","cwv"]):
+                obs["technical_issues"].append(entry)
+            elif any(k in low for k in ["thin","duplicate content","meta","title","description","content","internal link","copy","template"]):
+                obs["content_ux_issues"].append(entry)
+            elif any(k in low for k in ["serp","feature","merchant","snippet","review","shopping"]):
+                obs["serp_market_notes"].append(entry)
+            else:
+                obs["other_findings"].append(entry)
+    return obs
@@ -0,0 +1,623 @@
+"""Layer A: deterministic data signals (KPIs, GSC queries/pages, opportunities) from parsed tables."""
+
+import re
+from typing import Dict, Optional, List, Tuple, Any
+
+from .lazy import require_module
+from .schema import TableSchema, infer_schema
+from .tables import get_table
+from .utils import MAX_LIST_ROWS
+
+
+def _extract_kpis_from_table_preview(table_rows: Any, source_ref: str) -> List[Dict[str, Any]]:
+    """Heuristic extraction of KPI-like rows from a small table preview (often from PDFs like DashThis).
+
+    Accepts either:
+      - preview dict with keys: headers, rows
+      - list[dict] rows
+      - list[list] rows
+    Always fails safe (returns []) rather than raising.
+    """
+    headers: List[str] = []
+    # Some callers may accidentally pass the full preview dict; normalize.
+    if isinstance(table_rows, dict):
+        headers = [str(h) for h in (table_rows.get("headers") or []) if h is not None]
+        table_rows = table_rows.get("rows") or []
+
+    if not isinstance(table_rows, list) or not table_rows:
+        return []
+
+    # Determine row shape
+    first = table_rows[0]
+    if isinstance(first, dict):
+        keys = list(first.keys())
+    elif isinstance(first, (list, tuple)):
+        if headers and len(headers) >= 2:
+            keys = headers
+        else:
+            keys = [f"col{i+1}" for i in range(len(first))]
+    else:
+        return []
+
+    if len(keys) < 2:
+        return []
+    # If too wide, it's likely not a KPI tile table
+    if len(keys) > 6:
+        return []
+
+    # Cap work
+    rows = table_rows[:MAX_LIST_ROWS]
+    out: List[Dict[str, Any]] = []
+
+    def _numish(v: Any) -> bool:
+        s = str(v).strip()
+        if not s or s.lower() in {"nan", "none"}:
+            return False
+        s2 = re.sub(r"[,$%\s]", "", s)
+        return bool(re.match(r"^[+-]?(\d+\.?\d*|\d*\.?\d+)$", s2))
+
+    def _to_dict(r: Any) -> Dict[str, Any]:
+        if isinstance(r, dict):
+            return r
+        if isinstance(r, (list, tuple)):
+            d: Dict[str, Any] = {}
+            for i, v in enumerate(r):
+                k = keys[i] if i < len(keys) else f"col{i+1}"
+                d[str(k)] = v
+            return d
+        return {}
+
+    for raw in rows:
+        r = _to_dict(raw)
+        if not r:
+            continue
+
+        # KPI tables are usually (label, value, maybe delta/period)
+        # Pick metric label from the first non-numeric-ish cell
+        metric = ""
+        value = None
+        delta = None
+
+        ordered_vals = [r.get(k) for k in keys if k in r]
+        # Fallback if keys didn't align perfectly
+        if not ordered_vals:
+            ordered_vals = list(r.values())
+
+        # metric: first non-num cell
+        for v in ordered_vals:
+            if v is None:
+                continue
+            if not _numish(v):
+                metric = str(v).strip()
+                break
+
+        # value: first numish cell
+        for v in ordered_vals:
+            if v is None:
+                continue
+            if _numish(v):
+                value = str(v).strip()
+                break
+
+        # delta: numish with % or +/- if present
+        for v in ordered_vals:
+            if v is None:
+                continue
+            s = str(v).strip()
+            if ("%" in s or s.startswith(("+", "-"))) and _numish(s):
+                delta = s
+                break
+
+        if not metric or value is None:
+            continue
+
+        out.append({
+            "metric": metric,
+            "value": value,
+            "delta": delta,
+            "evidence_ref": source_ref,
+            "confidence": "Medium",
+        })
+
+    return out
+
+# -----------------------------
+# Typed table views (vectorized signal computation)
+# -----------------------------
+# Signals are computed column-wise over the full stored table (see tables.py), or over
+# the preview when the full table is no longer available. Each table is wrapped once;
+# header lookups and numeric coercion are memoized per column, so totals, top-N,
+# opportunity filters and breakdowns all reuse the same typed arrays. Numeric coercion
+# matches _safe_float (commas stripped, unparseable -> missing) and missing cells read
+# as "" like the old row dicts did.
+
+def _table_frame(t: Dict[str, Any]) -> Any:
+    """The full DataFrame for a table entry (string column names, last duplicate wins), else its preview."""
+    pd = require_module("pandas")
+    df = get_table(t.get("table_ref"))
+    if df is not None:
+        cols = [str(c) for c in df.columns]
+        dup = pd.Index(cols).duplicated(keep="last")
+        if dup.any():
+            df = df.loc[:, ~dup]
+            cols = [c for c, d in zip(cols, dup) if not d]
+        return df.set_axis(cols, axis=1)
+    preview = t.get("table") or {}
+    headers = [str(h) for h in (preview.get("headers") or [])]
+    rows = preview.get("rows") or []
+    data: Dict[str, List[Any]] = {}
+    for i, h in enumerate(headers):
+        data[h] = [r[i] if i < len(r) else "" for r in rows]
+    if not data:
+        return pd.DataFrame(index=range(len(rows)))
+    return pd.DataFrame(data, dtype=object)
+
+
+def _coerce_numeric(col: Any) -> Any:
+    """float64 array for a column; NaN where _safe_float would return None."""
+    pd = require_module("pandas")
+    np = require_module("numpy")
+    dtype = col.dtype
+    if pd.api.types.is_bool_dtype(dtype) or pd.api.types.is_datetime64_any_dtype(dtype):
+        return np.full(len(col), np.nan)
+    if pd.api.types.is_numeric_dtype(dtype):
+        return col.to_numpy(dtype="float64", na_value=np.nan)
+    out = pd.to_numeric(col, errors="coerce")
+    retry = out.isna() & col.notna()
+    if retry.any():
+        cleaned = col[retry].astype(str).str.strip().str.replace(",", "", regex=False)
+        out = out.astype("float64")
+        out[retry] = pd.to_numeric(cleaned, errors="coerce")
+    return out.to_numpy(dtype="float64", na_value=np.nan)
+
+
+def _top_positions(values: Any, n: int, keep: Optional[Any] = None) -> List[int]:
+    """Positions of the n largest values, descending; ties keep table order (stable).
+
+    With keep (a predicate on positions), returns the first n positions in that order
+    that pass it, widening the partial selection only while too few pass.
+    """
+    pd = require_module("pandas")
+    if n <= 0 or len(values) == 0:
+        return []
+    series = pd.Series(values)
+    k = n
+    while True:
+        positions = series.nlargest(k, keep="first").index.tolist()
+        if keep is None:
+            return positions
+        passing = [p for p in positions if keep(p)]
+        if len(passing) >= n or len(positions) >= len(series):
+            return passing[:n]
+        k *= 4
+
+
+def _cell_objects(col: Any) -> Any:
+    """Object array of a column's cells; dates rendered as the table preview renders them.
+
+    A datetime64 column goes through astype(str), as _df_preview does, so a date
+    without a time part reads "2026-01-30" rather than a Timestamp.
+    """
+    pd = require_module("pandas")
+    if pd.api.types.is_datetime64_any_dtype(col.dtype):
+        return col.astype(str).to_numpy(dtype=object)
+    return col.to_numpy(dtype=object)
+
+
+class _TableView:
+    """One parsed table as typed columns, addressed by header label."""
+
+    def __init__(self, t: Dict[str, Any]):
+        self.t = t
+        self.headers = (t.get("table") or {}).get("headers") or []
+        self.df = _table_frame(t)
+        self.n = len(self.df)
+        self.schema: TableSchema = infer_schema(self.headers)
+        self._num: Dict[str, Any] = {}
+        self._obj: Dict[str, Tuple[Any, Any]] = {}
+
+    def key(self, role: str) -> Optional[str]:
+        """Header label of the column inferred for role (see schema.ROLE_NEEDLES)."""
+        return self.schema.key(role)
+
+    def num(self, key: Optional[str]) -> Any:
+        np = require_module("numpy")
+        if key is None or key not in self.df.columns:
+            return np.full(self.n, np.nan)
+        if key not in self._num:
+            self._num[key] = _coerce_numeric(self.df[key])
+        return self._num[key]
+
+    def value(self, key: Optional[str], i: int) -> Optional[float]:
+        if key is None:
+            return None
+        v = self.num(key)[i]
+        return None if v != v else float(v)
+
+    def cell(self, key: Optional[str], i: int) -> Any:
+        obj = self._obj.get(key) if key is not None else None
+        if obj is None:
+            if key is None or key not in self.df.columns:
+                return None
+            col = self.df[key]
+            obj = self._obj[key] = (_cell_objects(col), col.isna().to_numpy())
+        arr, missing = obj
+        return "" if missing[i] else arr[i]
+
+    def text(self, key: Optional[str], i: int) -> str:
+        return str(self.cell(key, i) or "").strip()
+
+    def has_text(self, key: Optional[str]) -> Any:
+        """Predicate on positions: the cell is a non-empty label."""
+        return lambda i: bool(self.text(key, i))
+
+    def ref(self, suffix: str = "") -> str:
+        return f"{self.t.get('filename')} / {self.t.get('sheet')}" + (f" ({suffix})" if suffix else "")
+
+
+def _format_ctr(ctr: Optional[float]) -> str:
+    return f"{ctr:.2%}" if isinstance(ctr, float) and ctr <= 1.0 else (f"{ctr:.2f}" if ctr is not None else "")
+
+
+def _top_row_item(v: _TableView, i: int, dim_key: str, click_key: str, impr_key: Optional[str],
+                  ctr_key: Optional[str], pos_key: Optional[str]) -> Dict[str, Any]:
+    clicks = v.value(click_key, i)
+    imps = v.value(impr_key, i)
+    ctr = v.value(ctr_key, i)
+    pos = v.value(pos_key, i)
+    return {
+        "item": v.text(dim_key, i),
+        "clicks": int(clicks) if clicks is not None else "",
+        "impressions": int(imps) if imps is not None else "",
+        "ctr": _format_ctr(ctr),
+        "position": round(pos, 2) if pos is not None else "",
+        "evidence_ref": v.ref("top rows"),
+        "confidence": "High" if clicks is not None else "Medium",
+    }
+
+def _detect_gsc_table_kind(sheet: str, headers: List[str]) -> str:
+    """Classify GSC export tables by sheet name / headers.
+
+    Important: sheet is often plural ('Queries'), so check both singular/plural tokens.
+    """
+    s = (sheet or "").strip().lower()
+    # Primary: sheet name
+    if "query" in s or "queries" in s:
+        return "queries"
+    if "page" in s or "pages" in s:
+        return "pages"
+    if "country" in s or "countries" in s:
+        return "countries"
+    if "device" in s or "devices" in s:
+        return "devices"
+    if "search appearance" in s or "appearance" in s:
+        return "search_appearance"
+    if "date" in s or "chart" in s or "performance" in s:
+        return "chart"
+
+    # Fallback: infer by header labels (common: 'Top queries', 'Top pages')
+    hs = [str(h or "").strip().lower() for h in (headers or [])]
+    if any("query" in h or "queries" in h for h in hs):
+        return "queries"
+    if any("page" in h or "pages" in h or "url" == h for h in hs):
+        return "pages"
+    if any("country" in h or "countries" in h for h in hs):
+        return "countries"
+    if any("device" in h or "devices" in h for h in hs):
+        return "devices"
+    if any("appearance" in h for h in hs):
+        return "search_appearance"
+
+    return "unknown"
+
+def _is_signal_table(headers: List[Any]) -> bool:
+    """True when a table can feed data signals (it has clicks and impressions columns)."""
+    return infer_schema(headers).has("clicks", "impressions")
+
+def _build_data_signals(supporting_context: Dict[str, Any]) -> Dict[str, Any]:
+    tables = supporting_context.get("tables") or []
+    # If multiple files provide tables, prefer the file that most resembles a GSC export
+    by_file = supporting_context.get("_by_file") or {}
+    gsc_sheet_names = {"chart","queries","pages","countries","devices","search appearance","filters"}
+    best_gsc_file = None
+    best_score = 0
+    for fname, blob in by_file.items():
+        tabs = set((t.get("sheet") or "").strip().lower() for t in (blob.get("tables") or []))
+        score = len(tabs & gsc_sheet_names)
+        if score > best_score:
+            best_score = score
+            best_gsc_file = fname
+    if best_gsc_file and best_score >= 2:
+        tables = [t for t in tables if (t.get("filename") == best_gsc_file)]
+    data_signals = {
+        "kpis": [],
+        "top_queries": [],
+        "top_pages": [],
+        "opportunity_queries": [],
+        "opportunity_pages": [],
+        "distribution_breakdowns": {"devices": [], "countries": [], "search_appearance": []},
+        "trend_notes": [],
+    }
+
+    # Collect candidate GSC tables (one typed view per table, shared by every stage below)
+    np = require_module("numpy")
+    gsc_tables: List[Tuple[str, _TableView]] = []
+    for t in tables:
+        sheet = t.get("sheet") or ""
+        preview = t.get("table") or {}
+        headers = preview.get("headers") or []
+        # Require core metrics
+        if not _is_signal_table(headers):
+            continue
+        kind = t.get("_gsc_kind") or _detect_gsc_table_kind(sheet, headers)
+        gsc_tables.append((kind, _TableView(t)))
+
+    # Prefer totals from Chart if present; otherwise take first available totals
+    totals_clicks = None
+    totals_imps = None
+    totals_ref = None
+
+    for kind, v in gsc_tables:
+        if kind not in ("chart", "unknown", "queries", "pages", "countries", "devices", "search_appearance"):
+            continue
+        click_key = v.key("clicks")
+        impr_key = v.key("impressions")
+        if click_key is None or impr_key is None:
+            continue
+        clicks = float(np.nansum(v.num(click_key)))
+        imps = float(np.nansum(v.num(impr_key)))
+        if clicks <= 0 and imps <= 0:
+            continue
+        # Prefer chart
+        if totals_clicks is None or kind == "chart":
+            totals_clicks, totals_imps = clicks, imps
+            totals_ref = v.ref()
+            if kind == "chart":
+                break
+
+    if totals_clicks is not None and totals_imps is not None:
+        data_signals["kpis"].append({
+            "metric": "GSC Clicks",
+            "value": f"{int(round(totals_clicks)):,}",
+            "period": "",
+            "delta": "",
+            "evidence_ref": totals_ref or "GSC export",
+            "confidence": "High",
+        })
+        data_signals["kpis"].append({
+            "metric": "GSC Impressions",
+            "value": f"{int(round(totals_imps)):,}",
+            "period": "",
+            "delta": "",
+            "evidence_ref": totals_ref or "GSC export",
+            "confidence": "High",
+        })
+        # Derived CTR (safe, but mark Medium)
+        if totals_imps > 0:
+            ctr = totals_clicks / totals_imps
+            data_signals["kpis"].append({
+                "metric": "GSC CTR (derived)",
+                "value": f"{ctr:.2%}",
+                "period": "",
+                "delta": "",
+                "evidence_ref": totals_ref or "GSC export (derived from totals)",
+                "confidence": "Medium",
+            })
+
+    def _click_sort_values(v: _TableView, click_key: str) -> Any:
+        c = v.num(click_key)
+        return np.where(np.isnan(c), -1.0, c)
+
+    # Build lists for queries/pages and breakdowns
+    def top_n(kind: str, dim_role: str, target_list: List[Dict[str, Any]], n: int = MAX_LIST_ROWS):
+        for k, v in gsc_tables:
+            if k != kind:
+                continue
+            dim_key = v.key(dim_role)
+            click_key = v.key("clicks")
+            if dim_key is None or click_key is None:
+                continue
+            impr_key = v.key("impressions")
+            ctr_key = v.key("ctr")
+            pos_key = v.key("position")
+
+            # top rows by clicks (partial selection, not a full sort); blank labels are skipped
+            for i in _top_positions(_click_sort_values(v, click_key), n):
+                if not v.text(dim_key, i):
+                    continue
+                target_list.append(_top_row_item(v, i, dim_key, click_key, impr_key, ctr_key, pos_key))
+            break
+
+    top_n("queries", "query", data_signals["top_queries"], n=MAX_LIST_ROWS)
+    top_n("pages", "page", data_signals["top_pages"], n=MAX_LIST_ROWS)
+
+    # opportunities: high impressions, low ctr, pos 8-20
+    def opportunities(kind: str, dim_role: str, out_list: List[Dict[str, Any]], n: int = MAX_LIST_ROWS):
+        for k, v in gsc_tables:
+            if k != kind:
+                continue
+            dim_key = v.key(dim_role)
+            click_key = v.key("clicks")
+            impr_key = v.key("impressions")
+            if dim_key is None or impr_key is None or click_key is None:
+                continue
+            ctr_key = v.key("ctr")
+            pos_key = v.key("position")
+
+            imps = v.num(impr_key)
+            clicks = v.num(click_key)
+            if ctr_key:
+                ctr = v.num(ctr_key)
+            else:
+                with np.errstate(divide="ignore", invalid="ignore"):
+                    ctr = np.where((imps != 0) & ~np.isnan(imps), clicks / imps, np.nan)
+            mask = ~np.isnan(imps) & (imps >= 200)
+            if pos_key:
+                pos = v.num(pos_key)
+                mask &= ~(~np.isnan(pos) & ((pos < 8) | (pos > 20)))
+            mask &= ~(~np.isnan(ctr) & (ctr > 0.03))
+
+            candidates = np.flatnonzero(mask)
+            has_item = v.has_text(dim_key)
+            for j in _top_positions(imps[candidates], n, keep=lambda j: has_item(int(candidates[j]))):  # impressions desc
+                i = int(candidates[j])
+                c = v.value(click_key, i)
+                r = ctr[i]
+                r = None if r != r else float(r)
+                p = v.value(pos_key, i)
+                out_list.append({
+                    "item": v.text(dim_key, i),
+                    "impressions": int(imps[i]),
+                    "clicks": int(c) if c is not None else "",
+                    "ctr": f"{r:.2%}" if isinstance(r, float) and r <= 1.0 else "",
+                    "position": round(p, 2) if p is not None else "",
+                    "why_it_matters": "High impressions with low CTR and mid SERP position (opportunity).",
+                    "evidence_ref": v.ref("opportunity filter"),
+                    "confidence": "Medium",
+                })
+            break
+
+    opportunities("queries", "query", data_signals["opportunity_queries"], n=MAX_LIST_ROWS)
+    opportunities("pages", "page", data_signals["opportunity_pages"], n=MAX_LIST_ROWS)
+
+    # breakdowns
+    top_n("countries", "country", data_signals["distribution_breakdowns"]["countries"], n=8)
+    top_n("devices", "device", data_signals["distribution_breakdowns"]["devices"], n=6)
+    top_n("search_appearance", "search_appearance", data_signals["distribution_breakdowns"]["search_appearance"], n=6)
+
+    # trend notes: if chart has date col
+    for kind, v in gsc_tables:
+        if kind != "chart":
+            continue
+        date_key = v.key("date")
+        click_key = v.key("clicks")
+        if date_key is None or click_key is None:
+            continue
+        # note best day by clicks (first day with the maximum)
+        clicks = v.num(click_key)
+        valid = np.flatnonzero(~np.isnan(clicks))
+        has_date = v.has_text(date_key)
+        best = _top_positions(clicks[valid], 1, keep=lambda j: has_date(int(valid[j])))
+        if best:
+            i = int(valid[best[0]])
+            data_signals["trend_notes"].append({
+                "note": f"Highest-click day in the export: {v.text(date_key, i)} ({int(clicks[i])} clicks).",
+                "evidence_ref": v.ref(),
+                "confidence": "Medium",
+            })
+        break
+    # --- Fallbacks for Top Queries / Top Pages ---
+    def _fallback_top(kind: str, out_list: List[Dict[str, Any]], n: int = MAX_LIST_ROWS):
+        if out_list:
+            return
+        for k, v in gsc_tables:
+            if k != kind:
+                continue
+            if not v.headers or not v.n:
+                continue
+
+            dim_key = v.key("dimension")
+            click_key = v.key("clicks")
+            impr_key = v.key("impressions")
+
+            if dim_key is None or click_key is None or impr_key is None:
+                continue
+
+            clicks = v.num(click_key)
+            imps = v.num(impr_key)
+            scored = np.flatnonzero(~(np.isnan(clicks) & np.isnan(imps)))
+            score = np.where(np.isnan(clicks), 0.0, clicks)[scored]
+            for j in _top_positions(score, n):
+                i = int(scored[j])
+                out_list.append({
+                    "item": str(v.cell(dim_key, i)).strip(),
+                    "clicks": int(v.value(click_key, i) or 0),
+                    "impressions": int(v.value(impr_key, i) or 0),
+                    "ctr": "",
+                    "position": "",
+                    "evidence_ref": v.ref(),
+                    "confidence": "High",
+                })
+            break
+
+    _fallback_top("queries", data_signals["top_queries"], n=MAX_LIST_ROWS)
+    _fallback_top("pages", data_signals["top_pages"], n=MAX_LIST_ROWS)
+
+    # --- Explicit last-resort fallback for Top Pages (robust against 'Top pages' headers) ---
+    if not data_signals.get("top_pages"):
+        for k, v in gsc_tables:
+            if k not in ("pages", "unknown"):
+                continue
+            if not v.headers or not v.n:
+                continue
+            dim_key = v.key("page")
+            click_key = v.key("clicks")
+            if dim_key is None or click_key is None:
+                continue
+            impr_key = v.key("impressions")
+            ctr_key = v.key("ctr")
+            pos_key = v.key("position")
+
+            click_sort = _click_sort_values(v, click_key)
+            for i in _top_positions(click_sort, MAX_LIST_ROWS):
+                if not v.text(dim_key, i):
+                    continue
+                data_signals["top_pages"].append(_top_row_item(v, i, dim_key, click_key, impr_key, ctr_key, pos_key))
+
+            # Also derive opportunity pages from the same Pages table if missing
+            if not data_signals.get("opportunity_pages"):
+                try:
+                    # Opportunity heuristic: impressions present, low ctr, mid SERP position
+                    imps = v.num(impr_key)
+                    clicks = v.num(click_key)
+                    pos = v.num(pos_key)
+                    # ctr can be 0-1 or 0-100 depending on source; normalize
+                    ctr = v.num(ctr_key)
+                    ctr_norm = np.where(ctr > 1.0, ctr / 100.0, ctr)
+                    mask = (
+                        ~np.isnan(imps) & ~np.isnan(clicks) & ~np.isnan(pos) & ~np.isnan(ctr_norm)
+                        & (imps >= 100) & (ctr_norm <= 0.03) & (pos >= 8) & (pos <= 20)
+                    )
+                    # same order as the top-pages list: clicks desc, table order on ties
+                    candidates = np.flatnonzero(mask)
+                    has_item = v.has_text(dim_key)
+                    picked = _top_positions(click_sort[candidates], MAX_LIST_ROWS, keep=lambda j: has_item(int(candidates[j])))
+                    for j in picked:
+                        i = int(candidates[j])
+                        data_signals["opportunity_pages"].append({
+                            "item": v.text(dim_key, i),
+                            "impressions": int(imps[i]),
+                            "clicks": int(clicks[i]),
+                            "ctr": f"{float(ctr_norm[i]):.2%}",
+                            "position": round(float(pos[i]), 2),
+                            "why_it_matters": "High impressions with low CTR and mid SERP position (opportunity).",
+                            "evidence_ref": v.ref("opportunity filter"),
+                            "confidence": "Medium",
+                        })
+                except Exception:
+                    pass
+            break
+    # Record source selection so UI can group by reporting document
+    data_signals["_gsc_source"] = best_gsc_file
+
+    # Supplemental KPIs from non-GSC documents (e.g., DashThis PDF exports)
+    supplemental: Dict[str, List[Dict[str, Any]]] = {}
+    for fname, blob in (by_file or {}).items():
+        if best_gsc_file and fname == best_gsc_file:
+            continue
+        # Skip if no tables
+        tbls = blob.get("tables") or []
+        kpis_out: List[Dict[str, Any]] = []
+        for t in tbls:
+            preview = t.get("table") or []
+            # Only try KPI extraction on PDF-derived tables / small tables
+            if t.get("type") not in {"pdf_table", "pdf_table_pymupdf", "pdf_text_table", "csv"} and not str(t.get("type","")).startswith("pdf"):
+                continue
+            src = f"{t.get('filename')} / {t.get('sheet') or 'PDF'}"
+            kpis_out.extend(_extract_kpis_from_table_preview(preview, src))
+        if kpis_out:
+            # Cap at 50 and preserve order
+            supplemental[fname] = kpis_out[:MAX_LIST_ROWS]
+    data_signals["supplemental_kpis_by_source"] = supplemental
+
+    return data_signals
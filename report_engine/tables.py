@@ -0,0 +1,255 @@
+"""Full-fidelity table store: complete parsed tables for computation, separate from UI previews.
+
+Table previews (utils.MAX_TABLE_ROWS stringified rows) are what the UI and the
+prompts see. Signals (GSC totals, top-N lists, opportunities) need every row with
+numeric dtypes intact, so ingestion also registers each parsed DataFrame here under a
+content-derived key ("table_ref" on the table entry) and the signal builders read it
+back with get_table().
+
+Storage is bounded:
+  - Tables are written once as Arrow IPC files under REPORT_CACHE_DIR/tables (a
+    pickle file when pyarrow is not installed); reads memory-map the Arrow file, so a
+    large sheet is paged in by the OS instead of held on the heap.
+  - Tables up to TABLE_STORE_INMEM_MAX_BYTES are also kept in an in-memory LRU
+    capped at TABLE_STORE_MEMORY_BYTES in total.
+  - The directory is trimmed to TABLE_STORE_DISK_MAX_BYTES (oldest first).
+Because the files outlive the process, a parse-cache hit can still resolve its
+table_ref; when a table has been evicted, callers fall back to the preview.
+"""
+
+import hashlib
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from typing import Optional, List, Tuple, Any
+
+from .caching import REPORT_CACHE_DIR, _env_flag
+from .lazy import optional_module
+
+
+TABLE_STORE_VERSION = "1"
+TABLE_STORE_DIR = os.path.join(REPORT_CACHE_DIR, "tables")
+TABLE_STORE_DISK = _env_flag("TABLE_STORE_DISK", True)
+TABLE_STORE_MEMORY_BYTES = int(os.getenv("TABLE_STORE_MEMORY_BYTES", str(128 * 1024 * 1024)) or 128 * 1024 * 1024)
+TABLE_STORE_INMEM_MAX_BYTES = int(os.getenv("TABLE_STORE_INMEM_MAX_BYTES", str(8 * 1024 * 1024)) or 8 * 1024 * 1024)
+TABLE_STORE_DISK_MAX_BYTES = int(os.getenv("TABLE_STORE_DISK_MAX_BYTES", str(1024 * 1024 * 1024)) or 1024 * 1024 * 1024)
+
+
+def _frame_nbytes(df: Any) -> int:
+    try:
+        return int(df.memory_usage(index=True, deep=True).sum())
+    except Exception:
+        return 0
+
+
+def _arrow_safe_frame(df: Any) -> Any:
+    """Copy of df that Arrow can encode: string column names, mixed object columns as str."""
+    pd = optional_module("pandas")
+    out = df.copy()
+    out.columns = [str(c) for c in out.columns]
+    for c in out.columns:
+        col = out[c]
+        if getattr(col, "dtype", None) is not None and col.dtype == object:
+            out[c] = col.map(lambda v: v if (v is None or (pd is not None and pd.isna(v))) else str(v))
+    return out
+
+
+class TableStore:
+    """Bounded store of full DataFrames keyed by content-derived refs (thread-safe)."""
+
+    def __init__(self, root: Optional[str], memory_bytes: int, inmem_max_bytes: int, disk_max_bytes: int):
+        self.root = root
+        self.memory_bytes = int(memory_bytes)
+        self.inmem_max_bytes = int(inmem_max_bytes)
+        self.disk_max_bytes = int(disk_max_bytes)
+        self._mem: "OrderedDict[str, Tuple[Any, int]]" = OrderedDict()
+        self._mem_total = 0
+        self._lock = threading.Lock()
+        self._disk_bytes: Optional[int] = None
+
+    # --- paths ---
+    def _path(self, ref: str, ext: str) -> str:
+        return os.path.join(self.root or "", ref[:2], f"{ref}.{ext}")
+
+    def _existing_path(self, ref: str) -> Optional[str]:
+        if not self.root:
+            return None
+        for ext in ("arrow", "pkl"):
+            p = self._path(ref, ext)
+            if os.path.exists(p):
+                return p
+        return None
+
+    # --- memory tier ---
+    def _remember(self, ref: str, df: Any, nbytes: int, force: bool = False) -> None:
+        if nbytes > self.inmem_max_bytes and not force:
+            return
+        with self._lock:
+            old = self._mem.pop(ref, None)
+            if old is not None:
+                self._mem_total -= old[1]
+            self._mem[ref] = (df, nbytes)
+            self._mem_total += nbytes
+            while self._mem_total > self.memory_bytes and len(self._mem) > 1:
+                _, (_, n) = self._mem.popitem(last=False)
+                self._mem_total -= n
+
+    # --- disk tier ---
+    def _write(self, ref: str, df: Any) -> int:
+        """Persist df; returns bytes written (0 when the table could not be stored)."""
+        if not self.root or self._existing_path(ref):
+            return 0
+        pa = optional_module("pyarrow")
+        os.makedirs(os.path.join(self.root, ref[:2]), exist_ok=True)
+        if pa is not None:
+            path = self._path(ref, "arrow")
+            tmp = f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+            try:
+                table = pa.Table.from_pandas(_arrow_safe_frame(df), preserve_index=False)
+                with pa.OSFile(tmp, "wb") as sink:
+                    with pa.ipc.new_file(sink, table.schema) as writer:
+                        writer.write_table(table)
+                os.replace(tmp, path)
+                return os.path.getsize(path)
+            except Exception:
+                try:
+                    os.remove(tmp)
+                except Exception:
+                    pass
+        path = self._path(ref, "pkl")
+        tmp = f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+        try:
+            df.to_pickle(tmp)
+            os.replace(tmp, path)
+            return os.path.getsize(path)
+        except Exception:
+            try:
+                os.remove(tmp)
+            except Exception:
+                pass
+            return 0
+
+    def _read(self, path: str) -> Any:
+        if path.endswith(".arrow"):
+            pa = optional_module("pyarrow")
+            if pa is None:
+                return None
+            source = pa.memory_map(path, "r")
+            table = pa.ipc.open_file(source).read_all()
+            # Numeric columns without nulls come back as zero-copy views of the mapping.
+            return table.to_pandas(split_blocks=True, self_destruct=True)
+        pd = optional_module("pandas")
+        return pd.read_pickle(path) if pd is not None else None
+
+    def _files(self) -> List[Tuple[float, int, str]]:
+        out = []
+        for dirpath, _, filenames in os.walk(self.root or ""):
+            for fn in filenames:
+                if not fn.endswith((".arrow", ".pkl")):
+                    continue
+                fp = os.path.join(dirpath, fn)
+                try:
+                    st_ = os.stat(fp)
+                    out.append((st_.st_mtime, st_.st_size, fp))
+                except Exception:
+                    continue
+        return out
+
+    def _account(self, written: int) -> None:
+        with self._lock:
+            if self._disk_bytes is None:
+                self._disk_bytes = sum(size for _, size, _ in self._files())
+            else:
+                self._disk_bytes += written
+            if self._disk_bytes <= self.disk_max_bytes:
+                return
+            files = sorted(self._files())
+            total = sum(size for _, size, _ in files)
+            target = int(self.disk_max_bytes * 0.9)
+            for _, size, fp in files:
+                if total <= target:
+                    break
+                try:
+                    os.remove(fp)
+                    total -= size
+                except Exception:
+                    continue
+            self._disk_bytes = total
+
+    # --- public API ---
+    def put(self, ref: str, df: Any) -> str:
+        """Register a full table under ref (idempotent). Returns ref."""
+        nbytes = _frame_nbytes(df)
+        try:
+            written = self._write(ref, df)
+            if written:
+                self._account(written)
+        except Exception:
+            pass
+        # Without a file behind it, memory is the only copy: keep it even if it is large.
+        self._remember(ref, df, nbytes, force=self._existing_path(ref) is None)
+        return ref
+
+    def get(self, ref: Optional[str]) -> Any:
+        """The full DataFrame for ref, or None if it is unknown or was evicted."""
+        if not ref:
+            return None
+        with self._lock:
+            hit = self._mem.get(ref)
+            if hit is not None:
+                self._mem.move_to_end(ref)
+                return hit[0]
+        path = self._existing_path(ref)
+        if not path:
+            return None
+        try:
+            df = self._read(path)
+            os.utime(path, None)
+        except Exception:
+            return None
+        if df is not None:
+            self._remember(ref, df, _frame_nbytes(df))
+        return df
+
+    def has(self, ref: Optional[str]) -> bool:
+        if not ref:
+            return False
+        with self._lock:
+            if ref in self._mem:
+                return True
+        return self._existing_path(ref) is not None
+
+    def clear_memory(self) -> None:
+        with self._lock:
+            self._mem.clear()
+            self._mem_total = 0
+
+
+_TABLE_STORE = TableStore(
+    TABLE_STORE_DIR if TABLE_STORE_DISK else None,
+    TABLE_STORE_MEMORY_BYTES,
+    TABLE_STORE_INMEM_MAX_BYTES,
+    TABLE_STORE_DISK_MAX_BYTES,
+)
+
+
+def table_ref(digest: str, *parts: Any) -> str:
+    """Stable ref for a table: content digest of the upload + its position (sheet, index)."""
+    h = hashlib.sha256()
+    h.update(f"{TABLE_STORE_VERSION}|{digest}".encode("utf-8"))
+    for p in parts:
+        h.update(f"|{p}".encode("utf-8"))
+    return h.hexdigest()
+
+
+def put_table(ref: str, df: Any) -> str:
+    return _TABLE_STORE.put(ref, df)
+
+
+def get_table(ref: Optional[str]) -> Any:
+    return _TABLE_STORE.get(ref)
+
+
+def has_table(ref: Optional[str]) -> bool:
+    return _TABLE_STORE.has(ref)
@@ -0,0 +1,251 @@
+"""Lightweight tracing spans for the pipeline (per stage, file, page and model call).
+
+A trace is started around a user action ("Analyze Data", "Generate draft", a batch
+client) and every instrumented step inside it opens a span:
+
+    with start_trace("analyze") as trace:
+        with span("parse_file", file=name, bytes=len(data)) as sp:
+            ...
+            sp.set(rows=len(df))
+    trace.as_dict()  # JSON-ready: spans with start offset, wall/CPU ms, attributes
+
+The active trace and the current parent span live in contextvars, so nesting follows
+the call stack without passing anything around. Worker threads do not inherit them:
+submit work with submit_in_context(pool, fn, ...) to keep its spans in the trace.
+
+Outside a trace (or with REPORT_TRACING=0) span() returns a shared no-op object, so
+instrumented code costs one contextvar lookup per call. cpu_ms is the CPU time of
+the span's own thread (time.thread_time), not of any workers it waits on.
+"""
+
+import contextvars
+import threading
+import time
+from typing import Dict, Optional, List, Any
+
+from .caching import _env_flag
+
+
+TRACING_ENABLED = _env_flag("REPORT_TRACING", True)
+# Spans beyond this are counted but not kept (large PDFs open several spans per page).
+TRACE_MAX_SPANS = 5000
+
+_CURRENT_TRACE: "contextvars.ContextVar[Optional[Trace]]" = contextvars.ContextVar("report_trace", default=None)
+_CURRENT_SPAN: "contextvars.ContextVar[Optional[Span]]" = contextvars.ContextVar("report_span", default=None)
+
+
+class Span:
+    """One timed step. Attributes (bytes, rows, pages, tokens, ...) are set with set()/add()."""
+
+    __slots__ = ("trace", "name", "span_id", "parent_id", "thread", "attrs", "error",
+                 "_t0", "_cpu0", "start_ms", "wall_ms", "cpu_ms", "_token")
+
+    def __init__(self, trace: "Trace", name: str, parent: Optional["Span"], attrs: Dict[str, Any]):
+        self.trace = trace
+        self.name = name
+        self.span_id = 0
+        self.parent_id = parent.span_id if parent is not None else None
+        self.thread = threading.current_thread().name
+        self.attrs = attrs
+        self.error = ""
+        self.start_ms = 0.0
+        self.wall_ms: Optional[float] = None
+        self.cpu_ms: Optional[float] = None
+        self._token: Any = None
+
+    def set(self, **attrs: Any) -> "Span":
+        self.attrs.update(attrs)
+        return self
+
+    def add(self, key: str, n: float = 1) -> "Span":
+        self.attrs[key] = self.attrs.get(key, 0) + n
+        return self
+
+    def __enter__(self) -> "Span":
+        self._token = _CURRENT_SPAN.set(self)
+        self.trace._open(self)
+        self._cpu0 = time.thread_time()
+        self._t0 = time.perf_counter()
+        self.start_ms = round((self._t0 - self.trace._t0) * 1000.0, 3)
+        return self
+
+    def __exit__(self, exc_type: Any, exc: Any, tb: Any) -> None:
+        self.wall_ms = round((time.perf_counter() - self._t0) * 1000.0, 3)
+        self.cpu_ms = round((time.thread_time() - self._cpu0) * 1000.0, 3)
+        if exc_type is not None:
+            self.error = f"{exc_type.__name__}: {exc}"
+        try:
+            _CURRENT_SPAN.reset(self._token)
+        except ValueError:
+            # Exited in a different context than entered (e.g. a generator); just clear it.
+            _CURRENT_SPAN.set(None)
+
+    def as_dict(self) -> Dict[str, Any]:
+        out = {
+            "id": self.span_id,
+            "parent": self.parent_id,
+            "name": self.name,
+            "start_ms": self.start_ms,
+            "wall_ms": self.wall_ms,
+            "cpu_ms": self.cpu_ms,
+            "thread": self.thread,
+            "attrs": dict(self.attrs),
+        }
+        if self.error:
+            out["error"] = self.error
+        return out
+
+
+class _NoopSpan:
+    """Stand-in returned outside a trace: every operation is a no-op."""
+
+    __slots__ = ()
+
+    def set(self, **attrs: Any) -> "_NoopSpan":
+        return self
+
+    def add(self, key: str, n: float = 1) -> "_NoopSpan":
+        return self
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        return None
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class Trace:
+    """All spans recorded for one action. Thread-safe; spans may come from worker threads."""
+
+    def __init__(self, name: str, **attrs: Any):
+        self.name = name
+        self.attrs = attrs
+        self.started_at = time.strftime("%Y-%m-%dT%H:%M:%S")
+        self.spans: List[Span] = []
+        self.dropped = 0
+        self.wall_ms: Optional[float] = None
+        self._lock = threading.Lock()
+        self._t0 = time.perf_counter()
+        self._token: Any = None
+        self._span_token: Any = None
+
+    def _open(self, sp: Span) -> None:
+        with self._lock:
+            if len(self.spans) >= TRACE_MAX_SPANS:
+                self.dropped += 1
+                return
+            self.spans.append(sp)
+            sp.span_id = len(self.spans)
+
+    def __enter__(self) -> "Trace":
+        self._token = _CURRENT_TRACE.set(self)
+        self._span_token = _CURRENT_SPAN.set(None)
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.wall_ms = round((time.perf_counter() - self._t0) * 1000.0, 3)
+        _CURRENT_SPAN.reset(self._span_token)
+        _CURRENT_TRACE.reset(self._token)
+
+    def as_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            spans = [s.as_dict() for s in self.spans if s.span_id]
+        return {
+            "name": self.name,
+            "attrs": dict(self.attrs),
+            "started_at": self.started_at,
+            "wall_ms": self.wall_ms,
+            "span_count": len(spans),
+            "dropped_spans": self.dropped,
+            "spans": spans,
+        }
+
+
+class _NoopTrace:
+    def __enter__(self) -> None:
+        return None
+
+    def __exit__(self, *exc: Any) -> None:
+        return None
+
+
+def start_trace(name: str, **attrs: Any) -> Any:
+    """Context manager making a new Trace current (yields None when tracing is disabled)."""
+    if not TRACING_ENABLED:
+        return _NoopTrace()
+    return Trace(name, **attrs)
+
+
+def span(name: str, **attrs: Any) -> Any:
+    """Context manager timing one step under the current span (no-op outside a trace)."""
+    trace = _CURRENT_TRACE.get()
+    if trace is None:
+        return _NOOP_SPAN
+    return Span(trace, name, _CURRENT_SPAN.get(), attrs)
+
+
+def current_span() -> Any:
+    """The innermost open span (a no-op span outside a trace), e.g. to attach attributes."""
+    return _CURRENT_SPAN.get() or _NOOP_SPAN
+
+
+def submit_in_context(pool: Any, fn: Any, *args: Any, **kwargs: Any) -> Any:
+    """pool.submit(fn, ...) running fn in a copy of the caller's context (trace and parent span)."""
+    return pool.submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
+
+def waterfall_rows(trace: Dict[str, Any], width: int = 40) -> List[Dict[str, Any]]:
+    """Spans in tree order with depth-indented names and a text timeline bar (for st.dataframe)."""
+    spans = list((trace or {}).get("spans") or [])
+    total = float((trace or {}).get("wall_ms") or 0.0) or max(
+        [(s["start_ms"] + (s["wall_ms"] or 0.0)) for s in spans] or [0.0]
+    )
+    children: Dict[Any, List[Dict[str, Any]]] = {}
+    for s in spans:
+        children.setdefault(s["parent"], []).append(s)
+
+    rows: List[Dict[str, Any]] = []
+
+    def walk(parent: Any, depth: int) -> None:
+        for s in sorted(children.get(parent, []), key=lambda x: (x["start_ms"], x["id"])):
+            start, wall = s["start_ms"], s["wall_ms"] or 0.0
+            a = int(round(start / total * width)) if total else 0
+            b = max(a + 1, int(round((start + wall) / total * width))) if total else 1
+            attrs = s.get("attrs") or {}
+            rows.append({
+                "span": "  " * depth + s["name"],
+                "start_ms": round(start, 1),
+                "wall_ms": round(wall, 1),
+                "cpu_ms": round(s["cpu_ms"] or 0.0, 1),
+                "timeline": " " * a + "█" * (min(b, width) - a),
+                "detail": ", ".join(f"{k}={v}" for k, v in attrs.items()) + (f" [{s['error']}]" if s.get("error") else ""),
+                "thread": s["thread"],
+            })
+            walk(s["id"], depth + 1)
+
+    walk(None, 0)
+    # Spans whose parent was dropped (TRACE_MAX_SPANS) are listed at the end.
+    seen = {s["id"] for s in spans}
+    for orphan_parent in [p for p in children if p is not None and p not in seen]:
+        walk(orphan_parent, 0)
+    return rows
+
+
+def summarize_trace(trace: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Per span name: count and total/max wall ms plus total CPU ms, slowest first."""
+    agg: Dict[str, Dict[str, Any]] = {}
+    for s in (trace or {}).get("spans") or []:
+        a = agg.setdefault(s["name"], {"span": s["name"], "count": 0, "total_ms": 0.0, "max_ms": 0.0, "cpu_ms": 0.0})
+        wall = s["wall_ms"] or 0.0
+        a["count"] += 1
+        a["total_ms"] += wall
+        a["max_ms"] = max(a["max_ms"], wall)
+        a["cpu_ms"] += s["cpu_ms"] or 0.0
+    rows = sorted(agg.values(), key=lambda r: -r["total_ms"])
+    for r in rows:
+        for k in ("total_ms", "max_ms", "cpu_ms"):
+            r[k] = round(r[k], 1)
+    return rows
@@ -0,0 +1,262 @@
+"""Model usage accounting: tokens, latency and estimated cost per call, action and client.
+
+Every Responses API call made through llm._responses_create is recorded into the
+active meter (a contextvar, so screenshot worker threads started with
+tracing.submit_in_context report into the same one):
+
+    with usage_meter("analyze", client="Acme") as meter:
+        build_insight_model(...)
+    meter.summary()        # totals, per-purpose breakdown, estimated cost (USD)
+    append_ledger(meter.summary())   # one JSON line in the local usage ledger
+
+Calls outside a meter are not recorded. Costs are estimates from MODEL_PRICING (USD
+per million input / cached-input / output tokens); override or extend it with the
+MODEL_PRICING_JSON env var, e.g. '{"gpt-5.2": [1.75, 0.175, 14.0]}'.
+"""
+
+import contextvars
+import json
+import os
+import re
+import threading
+import time
+from typing import Dict, Optional, List, Tuple, Any
+
+from .caching import REPORT_CACHE_DIR, _env_flag
+
+
+# USD per 1M tokens: (input, cached input, output). Estimates; check current list prices.
+MODEL_PRICING: Dict[str, Tuple[float, float, float]] = {
+    "gpt-5.2": (1.75, 0.175, 14.0),
+    "gpt-5.1": (1.25, 0.125, 10.0),
+    "gpt-5": (1.25, 0.125, 10.0),
+    "gpt-5-mini": (0.25, 0.025, 2.0),
+    "gpt-5-nano": (0.05, 0.005, 0.4),
+    "gpt-4.1": (2.0, 0.5, 8.0),
+    "gpt-4.1-mini": (0.4, 0.1, 1.6),
+    "gpt-4o": (2.5, 1.25, 10.0),
+    "gpt-4o-mini": (0.15, 0.075, 0.6),
+}
+try:
+    MODEL_PRICING.update({k: tuple(float(x) for x in v) for k, v in json.loads(os.getenv("MODEL_PRICING_JSON") or "{}").items()})
+except Exception:
+    pass
+
+USAGE_LEDGER = _env_flag("USAGE_LEDGER", True)
+USAGE_LEDGER_PATH = os.getenv("USAGE_LEDGER_PATH") or os.path.join(REPORT_CACHE_DIR, "usage-ledger.jsonl")
+
+_CURRENT_METER: "contextvars.ContextVar[Optional[UsageMeter]]" = contextvars.ContextVar("report_usage_meter", default=None)
+_LEDGER_LOCK = threading.Lock()
+# path -> ((path, mtime_ns, size, limit), entries) for read_ledger.
+_LEDGER_READ_CACHE: Dict[str, Tuple[Tuple[Any, ...], List[Dict[str, Any]]]] = {}
+
+
+# Dated snapshot suffix ("gpt-4o-2024-08-06"): priced as the base model.
+_SNAPSHOT_SUFFIX = re.compile(r"-\d{4}-\d{2}-\d{2}$")
+
+
+def _pricing(model: str) -> Optional[Tuple[float, float, float]]:
+    """Price row for a model id; dated snapshots ("gpt-4o-2024-08-06") use their base model's row.
+
+    Any other id without a row of its own (gpt-5.2-pro, a new -mini) is unpriced
+    rather than guessed from a prefix, which would understate its cost.
+    """
+    model = (model or "").strip().lower()
+    if model in MODEL_PRICING:
+        return MODEL_PRICING[model]
+    base = _SNAPSHOT_SUFFIX.sub("", model)
+    return MODEL_PRICING.get(base) if base != model else None
+
+
+def estimate_cost(model: str, input_tokens: int, cached_tokens: int, output_tokens: int) -> Optional[float]:
+    """Estimated USD cost of one call (None when the model has no price row)."""
+    price = _pricing(model)
+    if price is None:
+        return None
+    uncached = max(0, int(input_tokens) - int(cached_tokens))
+    return round((uncached * price[0] + int(cached_tokens) * price[1] + int(output_tokens) * price[2]) / 1_000_000.0, 6)
+
+
+def count_input_images(request_input: Any) -> int:
+    """Number of input_image parts in a Responses API `input` list."""
+    n = 0
+    for msg in request_input or []:
+        content = msg.get("content") if isinstance(msg, dict) else None
+        if isinstance(content, list):
+            n += sum(1 for part in content if isinstance(part, dict) and part.get("type") == "input_image")
+    return n
+
+
+class UsageMeter:
+    """Model calls recorded during one action (analysis, draft, batch client). Thread-safe."""
+
+    def __init__(self, action: str, **labels: Any):
+        self.action = action
+        self.labels = labels
+        self.started_at = time.strftime("%Y-%m-%dT%H:%M:%S")
+        self.calls: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self._token: Any = None
+
+    def record(self, call: Dict[str, Any]) -> None:
+        with self._lock:
+            self.calls.append(call)
+
+    def __enter__(self) -> "UsageMeter":
+        self._token = _CURRENT_METER.set(self)
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        _CURRENT_METER.reset(self._token)
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            calls = [dict(c) for c in self.calls]
+        totals = _empty_totals()
+        by_purpose: Dict[str, Dict[str, Any]] = {}
+        for c in calls:
+            _accumulate(totals, c)
+            _accumulate(by_purpose.setdefault(c.get("purpose") or "other", _empty_totals()), c)
+        return {
+            "action": self.action,
+            **self.labels,
+            "started_at": self.started_at,
+            **totals,
+            "by_purpose": by_purpose,
+            "call_log": calls,
+        }
+
+
+def _empty_totals() -> Dict[str, Any]:
+    return {"calls": 0, "failed_calls": 0, "input_tokens": 0, "cached_tokens": 0, "output_tokens": 0,
+            "images": 0, "latency_s": 0.0, "cost_usd": 0.0, "unpriced_calls": 0}
+
+
+def _accumulate(agg: Dict[str, Any], c: Dict[str, Any]) -> None:
+    agg["calls"] += 1
+    agg["failed_calls"] += 0 if c.get("ok") else 1
+    for k in ("input_tokens", "cached_tokens", "output_tokens", "images"):
+        agg[k] += int(c.get(k) or 0)
+    agg["latency_s"] = round(agg["latency_s"] + float(c.get("latency_s") or 0.0), 3)
+    if c.get("cost_usd") is None:
+        agg["unpriced_calls"] += 1 if c.get("ok") else 0
+    else:
+        agg["cost_usd"] = round(agg["cost_usd"] + c["cost_usd"], 6)
+
+
+def usage_meter(action: str, **labels: Any) -> UsageMeter:
+    """Context manager making a new UsageMeter current; labels (client, model, ...) go into its summary."""
+    return UsageMeter(action, **labels)
+
+
+def record_model_call(purpose: str, model: str, tokens: Dict[str, int], latency_s: float, images: int,
+                      attempts: int = 1, error: str = "") -> None:
+    """Record one Responses call (all attempts) into the active meter, if any."""
+    meter = _CURRENT_METER.get()
+    if meter is None:
+        return
+    input_tokens = int(tokens.get("input_tokens") or 0)
+    cached_tokens = int(tokens.get("cached_tokens") or 0)
+    output_tokens = int(tokens.get("output_tokens") or 0)
+    call = {
+        "purpose": purpose or "other",
+        "model": model,
+        "ok": not error,
+        "attempts": attempts,
+        "input_tokens": input_tokens,
+        "cached_tokens": cached_tokens,
+        "output_tokens": output_tokens,
+        "images": images,
+        "latency_s": round(latency_s, 3),
+        "cost_usd": estimate_cost(model, input_tokens, cached_tokens, output_tokens) if tokens else None,
+    }
+    if tokens and call["cost_usd"] is None:
+        call["unpriced"] = True
+    if error:
+        call["error"] = error
+    meter.record(call)
+
+
+def append_ledger(summary: Dict[str, Any], path: Optional[str] = None) -> Optional[str]:
+    """Append a UsageMeter summary (without its call_log) to the JSONL ledger. Returns the path, or None. Never raises."""
+    if not USAGE_LEDGER or not summary or not summary.get("calls"):
+        return None
+    path = path or USAGE_LEDGER_PATH
+    entry = {k: v for k, v in summary.items() if k != "call_log"}
+    entry["recorded_at"] = time.strftime("%Y-%m-%dT%H:%M:%S")
+    line = (json.dumps(entry, ensure_ascii=False, default=str) + "\n").encode("utf-8")
+    try:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with _LEDGER_LOCK:
+            # One O_APPEND write per entry, so batch worker processes can share the file.
+            fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, line)
+            finally:
+                os.close(fd)
+        return path
+    except Exception:
+        return None
+
+
+def _tail_lines(path: str, limit: int, block: int = 64 * 1024) -> List[bytes]:
+    """The last `limit` lines of a file, reading backwards in blocks from the end."""
+    with open(path, "rb") as fh:
+        end = fh.seek(0, os.SEEK_END)
+        pos, data = end, b""
+        while pos > 0 and data.count(b"\n") <= limit:
+            step = min(block, pos)
+            pos -= step
+            fh.seek(pos)
+            data = fh.read(step) + data
+    lines = data.splitlines()
+    if pos > 0 and lines:
+        lines = lines[1:]  # partial first line
+    return lines[-limit:]
+
+
+def read_ledger(path: Optional[str] = None, limit: int = 5000) -> List[Dict[str, Any]]:
+    """The last `limit` ledger entries (oldest first); unreadable lines are skipped.
+
+    Only the tail of the file is read, and the result is reused until the file's
+    mtime or size changes, so the debug view can call this on every rerun.
+    """
+    path = path or USAGE_LEDGER_PATH
+    limit = max(1, int(limit))
+    try:
+        st = os.stat(path)
+    except OSError:
+        return []
+    key = (path, st.st_mtime_ns, st.st_size, limit)
+    with _LEDGER_LOCK:
+        cached = _LEDGER_READ_CACHE.get(path)
+    if cached is not None and cached[0] == key:
+        return list(cached[1])
+    try:
+        lines = _tail_lines(path, limit)
+    except Exception:
+        return []
+    out: List[Dict[str, Any]] = []
+    for ln in lines:
+        try:
+            out.append(json.loads(ln))
+        except Exception:
+            continue
+    with _LEDGER_LOCK:
+        _LEDGER_READ_CACHE[path] = (key, out)
+    return list(out)
+
+
+def ledger_by_client(entries: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Ledger totals per client (most expensive first)."""
+    agg: Dict[str, Dict[str, Any]] = {}
+    for e in entries or []:
+        name = str(e.get("client") or "(unnamed)")
+        a = agg.setdefault(name, {"client": name, "actions": 0, "calls": 0, "input_tokens": 0, "cached_tokens": 0,
+                                  "output_tokens": 0, "images": 0, "cost_usd": 0.0, "unpriced_calls": 0, "last_run": ""})
+        a["actions"] += 1
+        for k in ("calls", "input_tokens", "cached_tokens", "output_tokens", "images", "unpriced_calls"):
+            a[k] += int(e.get(k) or 0)
+        a["cost_usd"] = round(a["cost_usd"] + float(e.get("cost_usd") or 0.0), 6)
+        a["last_run"] = max(a["last_run"], str(e.get("recorded_at") or ""))
+    return sorted(agg.values(), key=lambda r: -r["cost_usd"])
@@ -0,0 +1,95 @@
+"""Small shared helpers: text normalization, JSON handling and payload size limits."""
+
+import copy
+import json
+import re
+from typing import Optional, Any
+
+
+# ------------------------------
+# Utilities
+# ------------------------------
+def _slugify(value) -> str:
+    """Safe slug for Streamlit keys and IDs."""
+    if value is None:
+        return "none"
+    if isinstance(value, dict):
+        # prefer common label keys if present
+        for k in ("label", "title", "name", "metric", "fact", "note"):
+            v = value.get(k)
+            if isinstance(v, str) and v.strip():
+                value = v
+                break
+        else:
+            value = str(value)
+    elif not isinstance(value, str):
+        value = str(value)
+    value = (value or "").strip().lower()
+    value = re.sub(r"[^a-z0-9]+", "-", value)
+    value = value.strip("-")
+    return value or "item"
+
+def strip_code_fences(s: str) -> str:
+    s = (s or "").strip()
+    if s.startswith("```"):
+        s = re.sub(r"^```[a-zA-Z]*\n", "", s)
+        s = re.sub(r"\n```$", "", s)
+    return s.strip()
+
+def _safe_json_load(s: str) -> Any:
+    s = strip_code_fences(s)
+    try:
+        return json.loads(s)
+    except Exception:
+        m = re.search(r"(\{.*\}|\[.*\])", s, flags=re.S)
+        if not m:
+            return None
+        try:
+            return json.loads(m.group(0))
+        except Exception:
+            return None
+
+
+# Size limits for parsed evidence sent to the model
+MAX_SUPPORTING_TEXT_CHARS = 180_000
+MAX_DOC_CHARS_PER_FILE = 60_000
+MAX_TABLE_ROWS = 80
+MAX_LIST_ROWS = 50  # cap list-style outputs shown in UI / payload
+MAX_TABLE_COLS = 50
+
+def _safe_decode_text(b: bytes) -> str:
+    for enc in ("utf-8", "utf-16", "latin-1"):
+        try:
+            return b.decode(enc)
+        except Exception:
+            continue
+    return b.decode("utf-8", errors="ignore")
+
+def _normalize_ws(s: str) -> str:
+    s = (s or "").replace("\r\n", "\n").replace("\r", "\n")
+    s = re.sub(r"[ \t]+\n", "\n", s)
+    s = re.sub(r"\n{3,}", "\n\n", s)
+    return s.strip()
+
+def _clamp(s: str, n: int) -> str:
+    if not s:
+        return ""
+    return s if len(s) <= n else (s[:n] + "\n\n[TRUNCATED]")
+
+
+def _json_deepcopy(obj: Any) -> Any:
+    try:
+        return json.loads(json.dumps(obj))
+    except Exception:
+        return copy.deepcopy(obj)
+
+def _safe_float(x: Any) -> Optional[float]:
+    try:
+        if x is None:
+            return None
+        s = str(x).strip().replace(",", "")
+        if s == "":
+            return None
+        return float(s)
+    except Exception:
+        return None
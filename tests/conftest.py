@@ -0,0 +1,7 @@
+import os
+import sys
+import tempfile
+
+# Keep the parse/model caches out of the working tree; caching reads this at import.
+os.environ.setdefault("REPORT_CACHE_DIR", tempfile.mkdtemp(prefix="rb-tests-"))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,30 @@
+from report_engine.csv_reader import read_csv_export
+
+
+def test_hash_data_row_stays_in_table():
+    frames, info = read_csv_export(b"Query,Clicks\n#hashtag,1\nx,2\n")
+    assert len(frames) == 1
+    assert frames[0]["Query"].tolist() == ["#hashtag", "x"]
+    assert frames[0]["Clicks"].tolist() == [1, 2]
+    assert info["metadata"] == []
+
+
+def test_comment_blocks_split_sections():
+    raw = (
+        b"# ----------------------------------------\n"
+        b"# Traffic acquisition\n"
+        b"# Start date: 20260101\n"
+        b"# ----------------------------------------\n\n"
+        b"Session source / medium,Sessions\n"
+        b"#promo / email,12\n"
+        b"google / organic,40\n"
+        b"\n# ----------------------------------------\n"
+        b"# Sessions by date\n"
+        b"# ----------------------------------------\n\n"
+        b"Date,Sessions\n"
+        b"20260101,7\n"
+    )
+    frames, info = read_csv_export(raw)
+    assert [f.shape for f in frames] == [(2, 2), (1, 2)]
+    assert frames[0]["Session source / medium"].tolist() == ["#promo / email", "google / organic"]
+    assert info["metadata"] == ["Traffic acquisition", "Start date: 20260101", "Sessions by date"]
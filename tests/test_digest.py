@@ -0,0 +1,27 @@
+from report_engine.digest import build_insight_digest
+
+
+def _insight():
+    rows = [{"Query": f"query {i}", "Clicks": 10 - i} for i in range(6)]
+    return {
+        "data_signals": {
+            "kpis": [{"metric": "Clicks", "value": 120, "delta": "+12%", "period": "Jan 2026", "evidence_ref": ""}],
+            "top_queries": [{"item": "shoes", "clicks": 40, "impressions": 900, "ctr": "", "position": ""}],
+            "source_table_edits": {"gsc.xlsx": {"0": rows}},
+        },
+    }
+
+
+def test_quick_digest_keeps_edited_tables():
+    digest = build_insight_digest(_insight(), "Quick scan")
+    edited = digest["edits"]["gsc.xlsx"]["0"]
+    assert edited["cols"] == ["Query", "Clicks"]
+    assert edited["rows"][0] == ["query 0", 10]
+    assert digest["more"]["edits:gsc.xlsx/0"] == 6 - len(edited["rows"])
+
+
+def test_rows_without_ref_keep_their_ref_slot():
+    digest = build_insight_digest(_insight(), "Standard")
+    assert digest["kpi"] == [["Clicks", 120, "+12%", "Jan 2026", None]]
+    # ctr and position are empty: the row still has all six fields, r last.
+    assert digest["top_q"] == [["shoes", 40, 900, "", "", None]]
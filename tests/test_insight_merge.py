@@ -0,0 +1,57 @@
+from report_engine.insight import _json_deepcopy, _merge_insight_edits
+
+
+def _insight(screens, signals):
+    return {
+        "data_signals": signals,
+        "seo_observations": {"items": []},
+        "screenshot_summaries": screens,
+    }
+
+
+def test_screenshot_edit_survives_new_screenshot():
+    a = {"file_name": "a.png", "note_for_report": "Auto summary of a"}
+    b = {"file_name": "b.png", "note_for_report": "Auto summary of b"}
+    original = _insight([a], {"kpis": []})
+    current = _json_deepcopy(original)
+    current["screenshot_summaries"][0]["note_for_report"] = "Edited note for a"
+    fresh = _insight([_json_deepcopy(a), b], {"kpis": []})
+
+    merged = _merge_insight_edits(original, current, fresh, changes={"added": ["b.png"], "changed": [], "removed": []})
+
+    assert [s["file_name"] for s in merged["screenshot_summaries"]] == ["a.png", "b.png"]
+    assert merged["screenshot_summaries"][0]["note_for_report"] == "Edited note for a"
+    assert merged["screenshot_summaries"][1]["note_for_report"] == "Auto summary of b"
+
+
+def test_replaced_screenshot_takes_fresh_summary():
+    a = {"file_name": "a.png", "note_for_report": "Old summary"}
+    original = _insight([a], {})
+    current = _json_deepcopy(original)
+    current["screenshot_summaries"][0]["note_for_report"] = "Edited"
+    fresh = _insight([{"file_name": "a.png", "note_for_report": "New summary"}], {})
+
+    merged = _merge_insight_edits(original, current, fresh, changes={"added": [], "changed": ["a.png"], "removed": []})
+
+    assert merged["screenshot_summaries"][0]["note_for_report"] == "New summary"
+
+
+def test_per_file_signal_edits_kept_for_unchanged_files():
+    original = _insight([], {"kpis": [{"metric": "Clicks", "value": 10}]})
+    current = _json_deepcopy(original)
+    current["data_signals"]["document_kpis"] = {
+        "ga4.csv": [{"metric": "Sessions", "value": "edited"}],
+        "gsc.xlsx": [{"metric": "Clicks", "value": "edited"}],
+    }
+    current["data_signals"]["source_table_edits"] = {
+        "ga4.csv": {"0": [{"a": "edited"}]},
+        "gsc.xlsx": {"0": [{"b": "edited"}]},
+    }
+    fresh = _insight([], {"kpis": [{"metric": "Clicks", "value": 12}]})
+
+    merged = _merge_insight_edits(original, current, fresh, changes={"added": [], "changed": ["gsc.xlsx"], "removed": []})
+
+    signals = merged["data_signals"]
+    assert signals["kpis"] == [{"metric": "Clicks", "value": 12}]
+    assert signals["document_kpis"] == {"ga4.csv": [{"metric": "Sessions", "value": "edited"}]}
+    assert signals["source_table_edits"] == {"ga4.csv": {"0": [{"a": "edited"}]}}
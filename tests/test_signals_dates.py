@@ -0,0 +1,39 @@
+import io
+
+import pandas as pd
+
+from report_engine.ingest import build_supporting_context
+from report_engine.signals import _build_data_signals
+
+
+class _Upload(io.BytesIO):
+    def __init__(self, name, data):
+        super().__init__(data)
+        self.name = name
+
+
+def _workbook(dates):
+    buf = io.BytesIO()
+    chart = pd.DataFrame({
+        "Date": pd.to_datetime(dates),
+        "Clicks": [120, 340, 210],
+        "Impressions": [4000, 5200, 4800],
+    })
+    with pd.ExcelWriter(buf, engine="openpyxl") as xw:
+        chart.to_excel(xw, sheet_name="Chart", index=False)
+    return buf.getvalue()
+
+
+def _trend_notes(data):
+    sc = build_supporting_context([_Upload("gsc.xlsx", data)])
+    return [n["note"] for n in _build_data_signals(sc)["trend_notes"]]
+
+
+def test_trend_note_shows_date_without_time():
+    notes = _trend_notes(_workbook(["2026-01-29", "2026-01-30", "2026-01-31"]))
+    assert "Highest-click day in the export: 2026-01-30 (340 clicks)." in notes
+
+
+def test_trend_note_keeps_time_when_present():
+    notes = _trend_notes(_workbook(["2026-01-29 08:00", "2026-01-30 09:30", "2026-01-31 10:00"]))
+    assert "Highest-click day in the export: 2026-01-30 09:30:00 (340 clicks)." in notes
@@ -0,0 +1,52 @@
+import json
+
+from report_engine.usage import _tail_lines, append_ledger, estimate_cost, read_ledger, record_model_call, usage_meter
+
+
+def _summary(i):
+    return {"action": "draft", "client": f"Client {i % 3}", "calls": 1, "input_tokens": i, "cost_usd": 0.01}
+
+
+def test_tail_lines_matches_readlines(tmp_path):
+    path = tmp_path / "ledger.jsonl"
+    path.write_text("".join(json.dumps({"i": i, "pad": "x" * (i % 7)}) + "\n" for i in range(200)), encoding="utf-8")
+    expected = path.read_bytes().splitlines()
+    for limit in (1, 7, 50, 199, 200, 500):
+        for block in (16, 33, 4096):
+            assert _tail_lines(str(path), limit, block=block) == expected[-limit:]
+
+
+def test_read_ledger_tails_and_sees_appends(tmp_path):
+    path = str(tmp_path / "ledger.jsonl")
+    assert read_ledger(path) == []
+    for i in range(30):
+        append_ledger(_summary(i), path=path)
+
+    last = read_ledger(path, limit=10)
+    assert [e["input_tokens"] for e in last] == list(range(20, 30))
+
+    append_ledger(_summary(30), path=path)
+    assert [e["input_tokens"] for e in read_ledger(path, limit=10)] == list(range(21, 31))
+
+
+def test_read_ledger_skips_unreadable_lines(tmp_path):
+    path = tmp_path / "ledger.jsonl"
+    path.write_text('{"calls": 1}\nnot json\n{"calls": 2}\n', encoding="utf-8")
+    assert read_ledger(str(path)) == [{"calls": 1}, {"calls": 2}]
+
+
+def test_pricing_only_falls_back_for_dated_snapshots():
+    assert estimate_cost("gpt-4o-2024-08-06", 1_000_000, 0, 0) == estimate_cost("gpt-4o", 1_000_000, 0, 0)
+    assert estimate_cost("gpt-5.2-pro", 1_000_000, 0, 1_000_000) is None
+    assert estimate_cost("gpt-5.2-pro-2025-12-11", 1_000_000, 0, 0) is None
+
+
+def test_unpriced_model_is_flagged_not_guessed():
+    with usage_meter("draft") as meter:
+        record_model_call("draft", "gpt-5.2-pro", {"input_tokens": 1000, "output_tokens": 500}, 1.0, 0)
+        record_model_call("draft", "gpt-5.2", {"input_tokens": 1000, "output_tokens": 500}, 1.0, 0)
+    s = meter.summary()
+    assert s["call_log"][0]["cost_usd"] is None and s["call_log"][0]["unpriced"] is True
+    assert "unpriced" not in s["call_log"][1]
+    assert s["unpriced_calls"] == 1
+    assert s["cost_usd"] == s["call_log"][1]["cost_usd"]